@@ -1,21 +1,20 @@
-"""Agent team definitions using Microsoft AutoGen."""
+"""Agent team definitions using Microsoft AutoGen.
 
-from autogen import ConversableAgent
+Agents are built on first use: importing this module does not import AutoGen
+or LangChain, so API and Celery workers that never talk to an agent skip that
+cost. ``CodeAgent`` and friends remain importable names and resolve through
+``get_agent``.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict
 
 from app.config import settings
+from app.llm_context import ContextBudgetTransform
 
-from .tools_definition import (
-    BrowserAutomationTool,
-    CrushFileSystemTool,
-    DeepReasoningTool,
-    FileManagementTool,
-    FinancialModelingTool,
-    SandboxTool,
-    VoiceProcessingTool,
-    WebIntelligenceTool,
-    google_drive_tool,
-    onedrive_tool,
-)
+from .tool_runtime import parallel_tool_calls_reply
 
 # Build an AutoGen LLM configuration that targets the local llama.cpp server
 _llm_base_url = settings.llm_openai_endpoint.rsplit("/chat/completions", 1)[0]
@@ -30,41 +29,97 @@ LLM_CONFIG = {
 }
 
 
-CodeAgent = ConversableAgent(
-    name="code_agent",
-    system_message="Agent responsible for code execution via crush",
-    description="Interacts with project filesystem using CrushFileSystemTool",
-    tools=[CrushFileSystemTool],
-    llm_config=LLM_CONFIG,
-)
-
-ResearchAgent = ConversableAgent(
-    name="research_agent",
-    system_message="Agent limited to performing web research",
-    llm_config=LLM_CONFIG,
-)
-
-CloudAgent = ConversableAgent(
-    name="cloud_agent",
-    system_message="Agent to interact with cloud storage via OAuth2",
-    tools=[google_drive_tool, onedrive_tool],
-    llm_config=LLM_CONFIG,
-)
-
-BusinessAdvisorAgent = ConversableAgent(
-    name="business_advisor_agent",
-    system_message="Autonomous strategist generating validated business plans",
-    tools=[
-        WebIntelligenceTool,
-        DeepReasoningTool,
-        SandboxTool,
-        FileManagementTool,
-        VoiceProcessingTool,
-        BrowserAutomationTool,
-        FinancialModelingTool,
-    ],
-    llm_config=LLM_CONFIG,
-)
+def _code_agent() -> Dict[str, Any]:
+    from .tools_definition import get_tool
+
+    return {
+        "name": "code_agent",
+        "system_message": "Agent responsible for code execution via crush",
+        "description": "Interacts with project filesystem using CrushFileSystemTool",
+        "tools": [get_tool("CrushFileSystemTool"), get_tool("CrushBatchTool")],
+    }
+
+
+def _research_agent() -> Dict[str, Any]:
+    return {
+        "name": "research_agent",
+        "system_message": "Agent limited to performing web research",
+    }
+
+
+def _cloud_agent() -> Dict[str, Any]:
+    from .tools_definition import google_drive_tool, onedrive_tool
+
+    return {
+        "name": "cloud_agent",
+        "system_message": "Agent to interact with cloud storage via OAuth2",
+        "tools": [google_drive_tool, onedrive_tool],
+    }
+
+
+def _business_advisor_agent() -> Dict[str, Any]:
+    from .tools_definition import get_tool
+
+    return {
+        "name": "business_advisor_agent",
+        "system_message": "Autonomous strategist generating validated business plans",
+        "tools": [
+            get_tool(name)
+            for name in (
+                "WebIntelligenceTool",
+                "DeepReasoningTool",
+                "SandboxTool",
+                "FileManagementTool",
+                "VoiceProcessingTool",
+                "BrowserAutomationTool",
+                "FinancialModelingTool",
+            )
+        ],
+    }
+
+
+_FACTORIES: Dict[str, Callable[[], Dict[str, Any]]] = {
+    "CodeAgent": _code_agent,
+    "ResearchAgent": _research_agent,
+    "CloudAgent": _cloud_agent,
+    "BusinessAdvisorAgent": _business_advisor_agent,
+}
+_agents: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def get_agent(name: str) -> Any:
+    """Return the named agent, constructing it on first use."""
+    agent = _agents.get(name)
+    if agent is not None:
+        return agent
+    with _lock:
+        if name in _agents:
+            return _agents[name]
+        if name not in _FACTORIES:
+            raise KeyError(f"Unknown agent {name}")
+        from autogen import Agent, ConversableAgent
+
+        agent = ConversableAgent(llm_config=LLM_CONFIG, **_FACTORIES[name]())
+        # Execute every tool call of a model turn concurrently instead of one by one
+        agent.register_reply([Agent, None], parallel_tool_calls_reply, position=0)
+        # Group chats resend the whole transcript on every turn; bound it to the
+        # context budget of the local model before each generation.
+        try:  # Capability API is only available in recent AutoGen releases
+            from autogen.agentchat.contrib.capabilities.transform_messages import TransformMessages
+        except Exception:  # pragma: no cover - optional capability
+            TransformMessages = None  # type: ignore
+        if TransformMessages is not None:
+            TransformMessages(transforms=[ContextBudgetTransform()]).add_to_agent(agent)
+        _agents[name] = agent
+        return agent
+
+
+def __getattr__(name: str) -> Any:
+    if name in _FACTORIES:
+        return get_agent(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "CodeAgent",
@@ -72,4 +127,5 @@ __all__ = [
     "CloudAgent",
     "BusinessAdvisorAgent",
     "LLM_CONFIG",
+    "get_agent",
 ]
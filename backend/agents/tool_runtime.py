@@ -0,0 +1,283 @@
+"""Concurrent, cached execution of agent tools.
+
+Every tool registered here runs on a shared thread pool with a per-tool timeout
+and latency accounting; long-running tools get a pool of their own so calls
+left running past their timeout cannot starve the others. Tools flagged as
+deterministic or idempotent memoise their successful results for a TTL. When a model turn requests several tools at once,
+``parallel_tool_calls_reply`` dispatches them together so the turn takes as long
+as the slowest tool instead of the sum of all of them.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Tuple
+
+from backend.app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ToolTimeoutError(TimeoutError):
+    """Raised when a tool does not finish within its time limit."""
+
+
+def _succeeded(value: Any) -> bool:
+    """Whether a result may be cached: tools report failures as ``{"error": ...}``."""
+    return not (isinstance(value, dict) and "error" in value)
+
+
+@dataclass
+class ToolPolicy:
+    """Execution limits for one tool."""
+
+    timeout: float = 30.0
+    ttl: float | None = None  # Cache results for this many seconds when set
+    cacheable: Callable[[Any], bool] = _succeeded  # Results failing this are not cached
+    workers: int | None = None  # Run on a dedicated pool of this size when set
+
+
+@dataclass
+class ToolStats:
+    """Latency and outcome counters for one tool."""
+
+    calls: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    cache_hits: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def observe(self, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "cache_hits": self.cache_hits,
+            "avg_seconds": self.total_seconds / self.calls if self.calls else None,
+            "max_seconds": self.max_seconds,
+        }
+
+
+class ToolRuntime:
+    """Registry that runs tools with timeouts, TTL caching and stats."""
+
+    def __init__(self, max_workers: int | None = None, max_cache_entries: int = 1024) -> None:
+        self._tools: Dict[str, Tuple[Callable[..., Any], ToolPolicy]] = {}
+        self._stats: Dict[str, ToolStats] = {}
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self._cache_lock = threading.Lock()
+        self._max_cache_entries = max_cache_entries
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or settings.tool_workers, thread_name_prefix="agent-tool"
+        )
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+
+    def register(self, name: str, func: Callable[..., Any], policy: ToolPolicy | None = None) -> None:
+        policy = policy or ToolPolicy()
+        self._tools[name] = (func, policy)
+        self._stats.setdefault(name, ToolStats())
+        previous = self._pools.pop(name, None)
+        if previous is not None:
+            previous.shutdown(wait=False)
+        if policy.workers:
+            self._pools[name] = ThreadPoolExecutor(
+                max_workers=policy.workers, thread_name_prefix=f"agent-tool-{name}"
+            )
+
+    def wrap(self, name: str) -> Callable[..., Any]:
+        """Return a function with the tool's signature that runs through the runtime."""
+        func, _ = self._tools[name]
+
+        @functools.wraps(func)
+        def _runner(*args: Any, **kwargs: Any) -> Any:
+            return self.call(name, *args, **kwargs)
+
+        _runner.tool_name = name  # type: ignore[attr-defined]
+        return _runner
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _key(name: str, args: tuple, kwargs: Dict[str, Any]) -> str:
+        return name + ":" + json.dumps([args, kwargs], sort_keys=True, default=str)
+
+    def _cache_get(self, key: str) -> Tuple[bool, Any]:
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._cache[key]
+                return False, None
+            return True, value
+
+    def _cache_put(self, key: str, value: Any, ttl: float) -> None:
+        with self._cache_lock:
+            if len(self._cache) >= self._max_cache_entries:
+                now = time.monotonic()
+                for k in [k for k, (exp, _) in self._cache.items() if exp < now]:
+                    del self._cache[k]
+                if len(self._cache) >= self._max_cache_entries:
+                    self._cache.pop(next(iter(self._cache)))
+            self._cache[key] = (time.monotonic() + ttl, value)
+
+    def clear_cache(self) -> None:
+        with self._cache_lock:
+            self._cache.clear()
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+    def _start(self, name: str, args: tuple, kwargs: Dict[str, Any]) -> Tuple[bool, Any, float]:
+        """Return a cached value or the future of a freshly submitted call."""
+        if name not in self._tools:
+            raise KeyError(f"Unknown tool {name}")
+        func, policy = self._tools[name]
+        if policy.ttl:
+            hit, value = self._cache_get(self._key(name, args, kwargs))
+            if hit:
+                self._stats[name].cache_hits += 1
+                return True, value, 0.0
+        pool = self._pools.get(name, self._pool)
+        return False, pool.submit(self._timed, name, func, args, kwargs), time.perf_counter()
+
+    def _timed(self, name: str, func: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+        """Run ``func`` on a worker thread and record its own execution time."""
+        start = time.perf_counter()
+        try:
+            value = func(*args, **kwargs)
+        except Exception:
+            self._stats[name].observe(time.perf_counter() - start, error=True)
+            raise
+        self._stats[name].observe(time.perf_counter() - start)
+        return value
+
+    def _finish(
+        self, name: str, future: Future, started: float, args: tuple, kwargs: Dict[str, Any]
+    ) -> Any:
+        """Wait for ``future`` until the tool's deadline and record the outcome."""
+        _, policy = self._tools[name]
+        remaining = max(policy.timeout - (time.perf_counter() - started), 0.0)
+        try:
+            value = future.result(timeout=remaining)
+        except FutureTimeout as exc:
+            # The worker thread keeps running; only the caller is released
+            self._stats[name].record_timeout()
+            raise ToolTimeoutError(f"Tool {name} timed out after {policy.timeout}s") from exc
+        if policy.ttl and policy.cacheable(value):
+            self._cache_put(self._key(name, args, kwargs), value, policy.ttl)
+        return value
+
+    def call(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        """Run one tool synchronously, honouring its cache and timeout."""
+        cached, value, started = self._start(name, args, kwargs)
+        return value if cached else self._finish(name, value, started, args, kwargs)
+
+    def run_many(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """Run independent tool calls concurrently; exceptions are returned in place."""
+        pending = []
+        for name, kwargs in calls:
+            try:
+                pending.append((name, kwargs, *self._start(name, (), kwargs)))
+            except Exception as exc:
+                pending.append((name, kwargs, True, exc, 0.0))
+        results: List[Any] = []
+        for name, kwargs, ready, value, started in pending:
+            if ready:
+                results.append(value)
+                continue
+            try:
+                results.append(self._finish(name, value, started, (), kwargs))
+            except Exception as exc:
+                results.append(exc)
+        return results
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: s.as_dict() for name, s in self._stats.items()}
+
+
+tool_runtime = ToolRuntime()
+
+
+def parallel_tool_calls_reply(
+    recipient: Any,
+    messages: List[Dict[str, Any]] | None = None,
+    sender: Any = None,
+    config: Any = None,
+) -> Tuple[bool, Dict[str, Any] | None]:
+    """AutoGen reply function that executes all tool calls of a turn concurrently."""
+    if not messages:
+        return False, None
+    message = messages[-1]
+    tool_calls = message.get("tool_calls")
+    if not tool_calls:
+        return False, None
+
+    function_map = getattr(recipient, "function_map", {}) or {}
+    calls: List[Tuple[str, Dict[str, Any]]] = []
+    for tc in tool_calls:
+        name = tc["function"]["name"]
+        try:
+            arguments = json.loads(tc["function"].get("arguments") or "{}")
+        except ValueError:
+            arguments = None
+        if name not in function_map or not isinstance(arguments, dict):
+            calls.append(("", {}))
+            continue
+        func = function_map[name]
+        # Functions produced by ``ToolRuntime.wrap`` already map to a registered tool
+        runtime_name = getattr(func, "tool_name", None) or name
+        if runtime_name not in tool_runtime._tools:
+            tool_runtime.register(runtime_name, func)
+        calls.append((runtime_name, arguments))
+
+    outputs = tool_runtime.run_many([c for c in calls if c[0]])
+    responses = []
+    out_iter = iter(outputs)
+    for tc, (name, _) in zip(tool_calls, calls):
+        if not name:
+            content = f"Error: invalid call to {tc['function']['name']}"
+        else:
+            result = next(out_iter)
+            if isinstance(result, Exception):
+                content = f"Error: {result}"
+            elif isinstance(result, str):
+                content = result
+            else:
+                content = json.dumps(result, ensure_ascii=False, default=str)
+        responses.append({"tool_call_id": tc.get("id"), "role": "tool", "content": content})
+    return True, {
+        "role": "tool",
+        "tool_responses": responses,
+        "content": "\n\n".join(r["content"] for r in responses),
+    }
+
+
+__all__ = [
+    "ToolPolicy",
+    "ToolRuntime",
+    "ToolTimeoutError",
+    "parallel_tool_calls_reply",
+    "tool_runtime",
+]
@@ -1,32 +1,32 @@
-"""Definitions of tools used by agents."""
+"""Definitions of tools used by agents.
+
+The LangChain ``StructuredTool`` wrappers are built lazily by ``get_tool`` (or
+on attribute access) so importing the plain tool functions stays cheap.
+"""
 
 from __future__ import annotations
 
 import json
 import subprocess
+import threading
 from pathlib import Path
 from typing import Any, Dict, List
 
 import httpx
-from langchain.tools import StructuredTool
 
+from backend.app.cloud_sync import get_engine
 from backend.app.config import settings
+from backend.app.crawler import crawler
 from backend.app.sandbox_manager import SandboxManager
+from backend.app.web_intelligence import SearchError, web_intelligence
 from backend.tools.crush_tool import (
+    CrushBatchInput,
     CrushCommandInput,
+    execute_crush_batch,
     execute_crush_command,
 )
 
-
-# ---------------------------------------------------------------------------
-# Core filesystem interaction via Crush
-# ---------------------------------------------------------------------------
-CrushFileSystemTool = StructuredTool.from_function(
-    func=execute_crush_command,
-    name="crush",
-    description="Safely interact with the project filesystem via crush",
-    args_schema=CrushCommandInput,
-)
+from .tool_runtime import ToolPolicy, tool_runtime
 
 
 # ---------------------------------------------------------------------------
@@ -36,25 +36,10 @@ CrushFileSystemTool = StructuredTool.from_function(
 
 def web_intelligence_tool(query: str) -> Dict[str, Any]:
     """Analyze market trends and competitors using Brave search API."""
-    api_key = settings.brave_api_key
-    if not api_key:
-        return {"error": "BRAVE_API_KEY not configured"}
-    headers = {"Accept": "application/json", "X-Subscription-Token": api_key}
-    params = {"q": query, "count": 3}
-    resp = httpx.get(
-        "https://api.search.brave.com/res/v1/web/search",
-        headers=headers,
-        params=params,
-        timeout=10.0,
-    )
-    if resp.status_code != 200:
-        return {"error": f"search failed: {resp.status_code}"}
-    data = resp.json()
-    results = [
-        {"title": item.get("title"), "url": item.get("url")}
-        for item in data.get("web", {}).get("results", [])
-    ]
-    return {"results": results}
+    try:
+        return {"results": web_intelligence.search(query)}
+    except SearchError as exc:
+        return {"error": str(exc)}
 
 
 def deep_reasoning_engine(topic: str) -> str:
@@ -113,112 +98,152 @@ def voice_processing_tool(audio_path: str) -> str:
     return transcript
 
 
-def browser_automation_tool(url: str, actions: List[str]) -> str:
-    """Automate headless browser tasks like form filling or posting content."""
-    resp = httpx.get(url, timeout=10.0)
-    return f"Fetched {url} with status {resp.status_code}"
+def browser_automation_tool(url: str, actions: List[str]) -> Dict[str, Any]:
+    """Fetch ``url`` and any URLs listed in ``actions`` and return their text."""
+    urls = [url] + [a.strip() for a in actions if a.strip().startswith(("http://", "https://"))]
+    pages = crawler.crawl(urls)
+    return {
+        "pages": [
+            {"url": p.url, "status": p.status, "title": p.title, "text": p.text, "error": p.error}
+            for p in pages
+        ]
+    }
 
 
 def financial_modeling_tool(data: Dict[str, Any]) -> Dict[str, Any]:
-    """Compute investment, revenue projections and ROI scenarios."""
-    cost = float(data.get("cost", 0))
-    revenue = float(data.get("revenue", 0))
-    roi = (revenue - cost) / cost if cost else 0.0
-    return {"investment": cost, "revenue": revenue, "roi": roi}
-
-
-# Convert placeholder functions into StructuredTool instances
-WebIntelligenceTool = StructuredTool.from_function(
-    func=web_intelligence_tool,
-    name="web_intelligence",
-    description="Market trend analysis and competitor research",
-)
-
-DeepReasoningTool = StructuredTool.from_function(
-    func=deep_reasoning_engine,
-    name="deep_reasoning",
-    description="Advanced business reasoning engine",
-)
-
-SandboxTool = StructuredTool.from_function(
-    func=sandbox_execution,
-    name="sandbox",
-    description="Execute tasks inside isolated Docker sandbox",
-)
-
-FileManagementTool = StructuredTool.from_function(
-    func=file_management_tool,
-    name="file_management",
-    description="Manage business plan files and backups",
-)
-
-VoiceProcessingTool = StructuredTool.from_function(
-    func=voice_processing_tool,
-    name="voice_processing",
-    description="Transcribe audio and generate structured notes",
-)
-
-BrowserAutomationTool = StructuredTool.from_function(
-    func=browser_automation_tool,
-    name="browser_automation",
-    description="Automate headless browser workflows",
-)
-
-FinancialModelingTool = StructuredTool.from_function(
-    func=financial_modeling_tool,
-    name="financial_modeling",
-    description="Project costs, revenues, and ROI scenarios",
-)
-
-
-def google_drive_tool(action: str, file_path: str) -> Dict[str, Any]:
-    """Interact with Google Drive using an OAuth2 token."""
-    token = settings.google_api_token
-    if not token:
-        raise RuntimeError("GOOGLE_API_TOKEN not configured")
-    headers = {"Authorization": f"Bearer {token}"}
+    """Compute NPV, IRR, payback, break-even and ROI over scenario grids or Monte Carlo draws.
+
+    ``data`` holds model parameters (``investment``/``cost``, ``revenue``,
+    ``growth``, ``opex_ratio``, ``fixed_costs``, ``discount_rate``) as numbers,
+    lists or distributions, plus optional ``years``, ``mode``, ``samples`` and
+    ``seed``. A bare ``{cost, revenue}`` input keeps its original meaning: one
+    year, with ``investment``, ``revenue`` and ``roi`` at the top level.
+    """
+    from backend.app.financial_engine import LEGACY_INPUT, evaluate, evaluate_legacy
+
+    if set(data) <= LEGACY_INPUT:
+        try:
+            return evaluate_legacy(float(data.get("cost", 0)), float(data.get("revenue", 0)))
+        except (ValueError, TypeError) as exc:
+            return {"error": str(exc)}
+    options = {k: data[k] for k in ("years", "mode", "samples", "seed") if k in data}
+    parameters = {k: v for k, v in data.items() if k not in options}
+    try:
+        return evaluate(parameters, **options)
+    except (ValueError, KeyError, TypeError) as exc:
+        return {"error": str(exc)}
+
+
+# Execution policies: only side-effect free tools are memoised (web_intelligence
+# caches its own results) and long-running tools get a pool of their own
+tool_runtime.register("web_intelligence", web_intelligence_tool, ToolPolicy(timeout=15.0))
+tool_runtime.register("deep_reasoning", deep_reasoning_engine, ToolPolicy(timeout=120.0, workers=4))
+tool_runtime.register("sandbox", sandbox_execution, ToolPolicy(timeout=300.0, workers=2))
+tool_runtime.register("file_management", file_management_tool, ToolPolicy(timeout=10.0))
+tool_runtime.register("voice_processing", voice_processing_tool, ToolPolicy(timeout=600.0, workers=2))
+tool_runtime.register("browser_automation", browser_automation_tool, ToolPolicy(timeout=30.0, ttl=300.0))
+tool_runtime.register("financial_modeling", financial_modeling_tool, ToolPolicy(timeout=10.0, ttl=3600.0))
+
+# StructuredTool specs: attribute name -> (tool name, description)
+_TOOL_SPECS: Dict[str, tuple[str, str]] = {
+    "CrushFileSystemTool": (
+        "crush",
+        "Safely interact with the project filesystem via crush. glob returns matching files "
+        "and directories; it does not descend into symlinked directories",
+    ),
+    "CrushBatchTool": ("crush_batch", "Run many crush filesystem operations in one call"),
+    "WebIntelligenceTool": ("web_intelligence", "Market trend analysis and competitor research"),
+    "DeepReasoningTool": ("deep_reasoning", "Advanced business reasoning engine"),
+    "SandboxTool": ("sandbox", "Execute tasks inside isolated Docker sandbox"),
+    "FileManagementTool": ("file_management", "Manage business plan files and backups"),
+    "VoiceProcessingTool": ("voice_processing", "Transcribe audio and generate structured notes"),
+    "BrowserAutomationTool": ("browser_automation", "Automate headless browser workflows"),
+    "FinancialModelingTool": ("financial_modeling", "Project costs, revenues, and ROI scenarios"),
+}
+_tools: Dict[str, Any] = {}
+_tools_lock = threading.Lock()
+
+
+def get_tool(attr: str) -> Any:
+    """Return the named ``StructuredTool``, creating it on first use."""
+    if attr in _tools:
+        return _tools[attr]
+    with _tools_lock:
+        if attr not in _tools:
+            from langchain.tools import StructuredTool
+
+            name, description = _TOOL_SPECS[attr]
+            if attr == "CrushFileSystemTool":
+                # Core filesystem interaction via Crush
+                tool = StructuredTool.from_function(
+                    func=lambda **kw: execute_crush_command(CrushCommandInput(**kw)),
+                    name=name,
+                    description=description,
+                    args_schema=CrushCommandInput,
+                )
+            elif attr == "CrushBatchTool":
+                tool = StructuredTool.from_function(
+                    func=lambda **kw: execute_crush_batch(CrushBatchInput(**kw)),
+                    name=name,
+                    description=description,
+                    args_schema=CrushBatchInput,
+                )
+            else:
+                tool = StructuredTool.from_function(
+                    func=tool_runtime.wrap(name), name=name, description=description
+                )
+            _tools[attr] = tool
+    return _tools[attr]
+
+
+def __getattr__(attr: str) -> Any:
+    if attr in _TOOL_SPECS:
+        return get_tool(attr)
+    raise AttributeError(f"module {__name__!r} has no attribute {attr!r}")
+
+
+def _cloud_tool(
+    provider: str,
+    action: str,
+    file_path: str,
+    paths: List[str] | None = None,
+    concurrency: int | None = None,
+) -> Dict[str, Any]:
+    engine = get_engine(provider)
     if action == "upload":
-        with open(file_path, "rb") as f:
-            resp = httpx.post(
-                "https://www.googleapis.com/upload/drive/v3/files?uploadType=media",
-                headers=headers,
-                data=f,
-            )
-        resp.raise_for_status()
-        return resp.json()
+        targets = list(paths or []) + ([file_path] if file_path else [])
+        if not targets:
+            raise ValueError("file_path or paths required for upload")
+        return engine.sync(targets, concurrency)
     if action == "list":
-        resp = httpx.get("https://www.googleapis.com/drive/v3/files", headers=headers)
-        resp.raise_for_status()
-        return resp.json()
+        key = "files" if provider == "google" else "value"
+        return {key: list(engine.provider.list())}
     raise ValueError("Unsupported action")
 
 
-def onedrive_tool(action: str, file_path: str) -> Dict[str, Any]:
-    """Interact with OneDrive using an OAuth2 token."""
-    token = settings.onedrive_api_token
-    if not token:
-        raise RuntimeError("ONEDRIVE_API_TOKEN not configured")
-    headers = {"Authorization": f"Bearer {token}"}
-    if action == "upload":
-        with open(file_path, "rb") as f:
-            resp = httpx.put(
-                f"https://graph.microsoft.com/v1.0/me/drive/root:/{Path(file_path).name}:/content",
-                headers=headers,
-                data=f,
-            )
-        resp.raise_for_status()
-        return resp.json()
-    if action == "list":
-        resp = httpx.get(
-            "https://graph.microsoft.com/v1.0/me/drive/root/children", headers=headers
-        )
-        resp.raise_for_status()
-        return resp.json()
-    raise ValueError("Unsupported action")
+def google_drive_tool(
+    action: str,
+    file_path: str = "",
+    paths: List[str] | None = None,
+    concurrency: int | None = None,
+) -> Dict[str, Any]:
+    """Sync files or directories to Google Drive, or list every file, with an OAuth2 token."""
+    return _cloud_tool("google", action, file_path, paths, concurrency)
+
+
+def onedrive_tool(
+    action: str,
+    file_path: str = "",
+    paths: List[str] | None = None,
+    concurrency: int | None = None,
+) -> Dict[str, Any]:
+    """Sync files or directories to OneDrive, or list the drive root, with an OAuth2 token."""
+    return _cloud_tool("onedrive", action, file_path, paths, concurrency)
 
 
 __all__ = [
     "CrushFileSystemTool",
+    "CrushBatchTool",
     "WebIntelligenceTool",
     "DeepReasoningTool",
     "SandboxTool",
@@ -228,4 +253,5 @@ __all__ = [
     "FinancialModelingTool",
     "google_drive_tool",
     "onedrive_tool",
+    "get_tool",
 ]
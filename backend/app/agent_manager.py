@@ -1,34 +1,141 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List
+from typing import Any, Dict, List
 
+from .agent_store import AgentStore, VersionConflict, create_store
+from .config import settings
 from .schemas import AgentState
 
+logger = logging.getLogger(__name__)
+
 
 class AgentManager:
-    """Simple in-memory manager for agent state."""
+    """Agent state on a shared store with a local read-through cache.
 
-    def __init__(self) -> None:
-        self._agents: Dict[str, AgentState] = {}
+    Reads are served from the cache once invalidation is running; every write,
+    from any process, goes to the store as a compare-and-set and announces the
+    agent's name on a Redis channel so the API workers drop their cached copy.
+    """
+
+    def __init__(self, store: AgentStore | None = None) -> None:
+        self.store = store or create_store()
+        self._cache: Dict[str, AgentState] = {}
+        self._active: List[AgentState] | None = None
+        self._caching = False
+        self._listener: threading.Thread | None = None
+        # Bumped by every invalidation: a store read that started before one
+        # may return stale data and must not be cached
+        self._generation = 0
+        self._lock = threading.Lock()
 
     def create(self, name: str, description: str | None = None) -> AgentState:
-        agent = AgentState(name=name, description=description or "")
-        self._agents[name] = agent
+        agent = self.store.put(AgentState(name=name, description=description or ""))
+        self._invalidate(name)
+        return agent
+
+    def get(self, name: str) -> AgentState | None:
+        if self._caching and name in self._cache:
+            return self._cache[name]
+        generation = self._generation
+        agent = self.store.get(name)
+        if self._caching and agent is not None:
+            with self._lock:
+                if generation == self._generation:
+                    self._cache[name] = agent
         return agent
 
     def list_active(self) -> List[AgentState]:
-        return [agent for agent in self._agents.values() if agent.active]
+        active = self._active if self._caching else None
+        if active is None:
+            generation = self._generation
+            active = self.store.list_active()
+            if self._caching:
+                with self._lock:
+                    if generation == self._generation:
+                        self._active = active
+        return active
 
-    def toggle(self, name: str, active: bool) -> AgentState | None:
-        agent = self._agents.get(name)
-        if agent:
-            agent.active = active
-        return agent
+    def update(
+        self, name: str, expected_version: int | None = None, **changes: Any
+    ) -> AgentState | None:
+        """Apply ``changes`` atomically; retry on races unless a version was given."""
+        for _ in range(5):
+            current = self.store.get(name)
+            if current is None:
+                return None
+            if expected_version is not None and current.version != expected_version:
+                raise VersionConflict(name)
+            try:
+                agent = self.store.put(
+                    current.model_copy(update=changes), expected_version=current.version
+                )
+            except VersionConflict:
+                if expected_version is not None:
+                    raise
+                continue
+            self._invalidate(name)
+            return agent
+        raise VersionConflict(name)
+
+    def toggle(self, name: str, active: bool, expected_version: int | None = None) -> AgentState | None:
+        return self.update(name, expected_version, active=active)
 
     def schedule(self, name: str, start_time: datetime) -> AgentState | None:
-        agent = self._agents.get(name)
-        if agent:
-            agent.scheduled = start_time
-        return agent
+        return self.update(name, scheduled=start_time)
+
+    # ------------------------------------------------------------------
+    # Cache invalidation
+    # ------------------------------------------------------------------
+    def _invalidate(self, name: str) -> None:
+        # Writers such as the Celery workers never cache themselves but must
+        # still evict the API workers' copies
+        if self._caching:
+            self._drop(name)
+        try:
+            from .progress import redis_client
+
+            redis_client().publish(settings.agent_cache_channel, name)
+        except Exception as exc:  # pragma: no cover - broker unavailable
+            logger.warning("Could not publish agent invalidation: %s", exc)
+
+    def _drop(self, name: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._cache.pop(name, None)
+            self._active = None
+
+    def start_cache(self) -> None:
+        """Enable the read-through cache and listen for invalidations."""
+        if self._listener is not None:
+            return
+        self._listener = threading.Thread(target=self._listen, name="agent-cache", daemon=True)
+        self._listener.start()
+
+    def _listen(self) -> None:  # pragma: no cover - long-running network loop
+        from .progress import redis_client
+
+        while True:
+            try:
+                pubsub = redis_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(settings.agent_cache_channel)
+                # Anything cached before the subscription may have missed updates
+                with self._lock:
+                    self._generation += 1
+                    self._cache.clear()
+                    self._active = None
+                self._caching = True
+                for message in pubsub.listen():
+                    data = message.get("data")
+                    self._drop(data.decode() if isinstance(data, bytes) else str(data))
+            except Exception as exc:
+                logger.warning("Agent cache invalidation disconnected: %s", exc)
+            # Serve reads from the store until the subscription is back
+            self._caching = False
+            time.sleep(2.0)
 
 
 manager = AgentManager()
@@ -0,0 +1,213 @@
+"""Storage backends for agent state.
+
+Every backend keeps a version number per agent that is bumped on each write;
+``put`` with ``expected_version`` is a compare-and-set that raises
+:class:`VersionConflict` when another writer got there first. Each backend
+also keeps a secondary index of active agents so listing them costs
+O(active) rather than O(agents).
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .config import settings
+from .schemas import AgentState
+
+
+class VersionConflict(Exception):
+    """Raised when an agent changed since the version the caller read."""
+
+
+class AgentStore:
+    """Interface shared by the agent-state backends."""
+
+    def get(self, name: str) -> AgentState | None:
+        raise NotImplementedError
+
+    def put(self, agent: AgentState, expected_version: int | None = None) -> AgentState:
+        """Write ``agent`` and return it with its new version.
+
+        With ``expected_version`` the write only succeeds if the stored
+        version still matches (0 meaning "does not exist yet").
+        """
+        raise NotImplementedError
+
+    def list_active(self) -> List[AgentState]:
+        raise NotImplementedError
+
+
+class MemoryAgentStore(AgentStore):
+    """Process-local store; suitable for a single worker and for tests."""
+
+    def __init__(self) -> None:
+        self._agents: Dict[str, AgentState] = {}
+        self._active: set[str] = set()
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> AgentState | None:
+        agent = self._agents.get(name)
+        return agent.model_copy() if agent else None
+
+    def put(self, agent: AgentState, expected_version: int | None = None) -> AgentState:
+        with self._lock:
+            current = self._agents.get(agent.name)
+            version = current.version if current else 0
+            if expected_version is not None and version != expected_version:
+                raise VersionConflict(agent.name)
+            stored = agent.model_copy(update={"version": version + 1})
+            self._agents[agent.name] = stored
+            if stored.active:
+                self._active.add(agent.name)
+            else:
+                self._active.discard(agent.name)
+        return stored.model_copy()
+
+    def list_active(self) -> List[AgentState]:
+        return [self._agents[name].model_copy() for name in sorted(self._active)]
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agents (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    active INTEGER NOT NULL,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_agents_active ON agents (name) WHERE active = 1;
+"""
+
+
+class SQLiteAgentStore(AgentStore):
+    """Store shared by every process on the host through one SQLite file."""
+
+    def __init__(self, db_path: str | Path | None = None) -> None:
+        self.db_path = Path(db_path or settings.agents_db)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _load(data: str, version: int) -> AgentState:
+        return AgentState.model_validate({**json.loads(data), "version": version})
+
+    def get(self, name: str) -> AgentState | None:
+        row = self._conn().execute(
+            "SELECT data, version FROM agents WHERE name = ?", (name,)
+        ).fetchone()
+        return self._load(*row) if row else None
+
+    def put(self, agent: AgentState, expected_version: int | None = None) -> AgentState:
+        data = agent.model_dump_json(exclude={"version"})
+        conn = self._conn()
+        with conn:
+            if expected_version is None:
+                row = conn.execute(
+                    "INSERT INTO agents (name, data, active, version) VALUES (?, ?, ?, 1)"
+                    " ON CONFLICT (name) DO UPDATE SET data = excluded.data,"
+                    " active = excluded.active, version = agents.version + 1 RETURNING version",
+                    (agent.name, data, int(agent.active)),
+                ).fetchone()
+            elif expected_version == 0:
+                try:
+                    row = conn.execute(
+                        "INSERT INTO agents (name, data, active, version) VALUES (?, ?, ?, 1)"
+                        " RETURNING version",
+                        (agent.name, data, int(agent.active)),
+                    ).fetchone()
+                except sqlite3.IntegrityError as exc:
+                    raise VersionConflict(agent.name) from exc
+            else:
+                row = conn.execute(
+                    "UPDATE agents SET data = ?, active = ?, version = version + 1"
+                    " WHERE name = ? AND version = ? RETURNING version",
+                    (data, int(agent.active), agent.name, expected_version),
+                ).fetchone()
+                if row is None:
+                    raise VersionConflict(agent.name)
+        return agent.model_copy(update={"version": row[0]})
+
+    def list_active(self) -> List[AgentState]:
+        rows = self._conn().execute(
+            "SELECT data, version FROM agents INDEXED BY idx_agents_active"
+            " WHERE active = 1 ORDER BY name"
+        ).fetchall()
+        return [self._load(*row) for row in rows]
+
+
+class RedisAgentStore(AgentStore):
+    """Store shared by every API replica and Celery worker through Redis."""
+
+    ACTIVE_KEY = "agents:active"
+
+    def __init__(self, client: Any = None) -> None:
+        if client is None:
+            from .progress import redis_client
+
+            client = redis_client()
+        self.client = client
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return f"agent:{name}"
+
+    def get(self, name: str) -> AgentState | None:
+        raw = self.client.get(self._key(name))
+        return AgentState.model_validate_json(raw) if raw else None
+
+    def put(self, agent: AgentState, expected_version: int | None = None) -> AgentState:
+        from redis.exceptions import WatchError
+
+        key = self._key(agent.name)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    raw = pipe.get(key)
+                    version = AgentState.model_validate_json(raw).version if raw else 0
+                    if expected_version is not None and version != expected_version:
+                        pipe.unwatch()
+                        raise VersionConflict(agent.name)
+                    stored = agent.model_copy(update={"version": version + 1})
+                    pipe.multi()
+                    pipe.set(key, stored.model_dump_json())
+                    if stored.active:
+                        pipe.sadd(self.ACTIVE_KEY, agent.name)
+                    else:
+                        pipe.srem(self.ACTIVE_KEY, agent.name)
+                    pipe.execute()
+                    return stored
+                except WatchError:
+                    if expected_version is not None:
+                        raise VersionConflict(agent.name)
+                    # Unconditional write: retry against the newer version
+
+    def list_active(self) -> List[AgentState]:
+        members = self.client.smembers(self.ACTIVE_KEY)
+        names = sorted(n.decode() if isinstance(n, bytes) else n for n in members)
+        if not names:
+            return []
+        raws = self.client.mget([self._key(n) for n in names])
+        return [AgentState.model_validate_json(raw) for raw in raws if raw]
+
+
+def create_store(backend: str | None = None) -> AgentStore:
+    backend = backend or settings.agent_store
+    if backend == "redis":
+        return RedisAgentStore()
+    if backend == "memory":
+        return MemoryAgentStore()
+    return SQLiteAgentStore()
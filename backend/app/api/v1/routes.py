@@ -1,26 +1,35 @@
 import base64
-import json
+import hashlib
 import subprocess
-import tempfile
+import uuid
+from dataclasses import asdict
 from pathlib import Path
 from typing import Any
 
-import httpx
 from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.responses import FileResponse
+from fastapi.routing import APIRoute
+from fastapi.concurrency import run_in_threadpool
 
 from ...config import settings
 from ...agent_manager import manager
+from ...agent_store import VersionConflict
+from ...scheduler import activation_scheduler
 from ...chat_manager import save_message, load_history
 from ...sandbox_manager import SandboxManager
-from ...transcriber import transcribe_file, AUDIO_VIDEO_EXTS
+from ...sandbox_logs import LogNotFound, sandbox_logs
 from ...schemas import (
     AgentCreate,
     AgentToggle,
     AgentSchedule,
     AgentState,
     WebIntelligenceRequest,
+    WebIntelligenceBatchRequest,
+    CrawlRequest,
+    FinancialModelRequest,
     FileSyncRequest,
     CloudFileRequest,
+    RetentionRunRequest,
     VoiceProcessRequest,
     VoiceNote,
     VoiceNoteCreate,
@@ -34,22 +43,40 @@ from ...schemas import (
     SandboxRunRequest,
     SandboxRunResponse,
     PlanGenerateRequest,
+    PlanJob,
+    PlanListResponse,
+    PlanSummary,
     ImplementationPlan,
     StepUpdate,
     LLMConfig,
     LLMConfigUpdate,
     LLMUploadResponse,
+    LocalModel,
+    ModelActivateRequest,
+    ModelActivateResponse,
     UserRegister,
     UserLogin,
 )
 from ...voice_notes import list_notes, add_note, update_note, delete_note
+from ... import voice_pipeline
 from ...voice_agenda import list_items, add_item, update_item, delete_item
-from ...business_advisor import create_plan, update_step, generate_plan
+from ...business_advisor import create_plan, update_step
+from ...plan_jobs import cached_plan, request_cancel
+from ...plan_store import PLAN_STATUSES, plan_repository
 from ...users import register_user, authenticate_user
 from ...llm_client import llm_client
+from ...llm_router import llm_router
+from ...model_registry import model_registry
 from ...agents.tools_definition import google_drive_tool, onedrive_tool
+from ...agents.tool_runtime import tool_runtime
+from ...ws_manager import ws_manager
+from ...event_bus import event_bus
+from ...crawler import crawler
+from ...retention import get_engine as retention_engine
+from ...profiling import ProfileNotFound, ProfiledRoute, profile_store
+from ...web_intelligence import SearchError, web_intelligence as web_search
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute if settings.profiling_enabled else APIRoute)
 
 
 @router.get("/health", summary="Health check")
@@ -78,7 +105,7 @@ def auth_login(payload: UserLogin) -> dict[str, str]:
 
 @router.post("/agents/create", summary="Create new agent", response_model=AgentState)
 def create_agent(payload: AgentCreate) -> AgentState:
-    """Register a new agent in memory."""
+    """Register a new agent in the shared agent store."""
     return manager.create(payload.name, payload.description)
 
 
@@ -91,7 +118,10 @@ def list_active_agents() -> list[AgentState]:
 @router.post("/agents/toggle", summary="Toggle agent state", response_model=AgentState)
 def toggle_agent(payload: AgentToggle) -> AgentState:
     """Enable or disable an agent."""
-    agent = manager.toggle(payload.name, payload.active)
+    try:
+        agent = manager.toggle(payload.name, payload.active, payload.version)
+    except VersionConflict as exc:
+        raise HTTPException(status_code=409, detail="Agent was modified concurrently") from exc
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     return agent
@@ -103,35 +133,111 @@ def schedule_agent(payload: AgentSchedule) -> AgentState:
     agent = manager.schedule(payload.name, payload.start_time)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
+    activation_scheduler.schedule(payload.name, payload.start_time)
     return agent
 
 
+@router.delete("/agents/schedule/{name}", summary="Cancel scheduled activation", response_model=AgentState)
+def unschedule_agent(name: str) -> AgentState:
+    """Clear an agent's activation time and drop its pending activation."""
+    agent = manager.update(name, scheduled=None)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    activation_scheduler.cancel(name)
+    return agent
+
+
+@router.get("/agents/tools/stats", summary="Agent tool latency and cache stats")
+def agent_tool_stats() -> dict[str, dict[str, Any]]:
+    """Return per-tool call counts, latency, timeouts and cache hits."""
+    return tool_runtime.stats()
+
+
+@router.get("/ws/stats", summary="WebSocket fan-out stats")
+def ws_stats() -> dict[str, int]:
+    """Return connection, topic, queued and dropped message counts."""
+    return ws_manager.stats()
+
+
+@router.get("/events/stats", summary="Progress event bus stats")
+def event_bus_stats() -> dict[str, Any]:
+    """Return published, delivered and dropped counts plus delivery lag."""
+    return event_bus.stats()
+
+
+@router.get("/admin/profiles", summary="List captured request profiles")
+def admin_profiles(limit: int = 50) -> list[dict[str, Any]]:
+    """Return the newest captured profiles with their duration and stage breakdown."""
+    return profile_store.list(max(1, min(limit, 500)))
+
+
+@router.get("/admin/profiles/{profile_id}", summary="Request profile summary")
+def admin_profile(profile_id: str) -> dict[str, Any]:
+    """Return one profile's metadata, stages and top functions by cumulative time."""
+    try:
+        return profile_store.get(profile_id)
+    except ProfileNotFound as exc:
+        raise HTTPException(status_code=404, detail="Profile not found") from exc
+
+
+@router.get("/admin/profiles/{profile_id}/download", summary="Download request profile")
+def admin_profile_download(profile_id: str) -> FileResponse:
+    """Return the ``pstats`` file, e.g. for ``snakeviz`` or ``python -m pstats``."""
+    try:
+        path = profile_store.profile_path(profile_id)
+    except ProfileNotFound as exc:
+        raise HTTPException(status_code=404, detail="Profile not found") from exc
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+
 @router.post("/web-intelligence", summary="Web intelligence search")
 def web_intelligence(req: WebIntelligenceRequest) -> dict[str, Any]:
-    """Perform a simple Brave search for the given query."""
-    api_key = settings.brave_api_key
-    if not api_key:
+    """Perform a cached Brave search for the given query."""
+    try:
+        return {"results": web_search.search(req.query, req.count)}
+    except SearchError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+
+
+@router.post("/web-intelligence/batch", summary="Batch web intelligence search")
+def web_intelligence_batch(req: WebIntelligenceBatchRequest) -> dict[str, dict[str, Any]]:
+    """Run several searches concurrently; failures are reported per query."""
+    if not settings.brave_api_key:
         raise HTTPException(status_code=503, detail="BRAVE_API_KEY not configured")
-    headers = {"Accept": "application/json", "X-Subscription-Token": api_key}
-    params = {"q": req.query, "count": 3}
-    resp = httpx.get(
-        "https://api.search.brave.com/res/v1/web/search", headers=headers, params=params, timeout=10.0
-    )
-    if resp.status_code != 200:
-        raise HTTPException(status_code=resp.status_code, detail="Search API error")
-    data = resp.json()
-    results = [
-        {"title": item.get("title"), "url": item.get("url")}
-        for item in data.get("web", {}).get("results", [])
-    ]
-    return {"results": results}
+    return web_search.search_many(req.queries, req.count)
+
+
+@router.post("/web-intelligence/crawl", summary="Fetch pages and extract their text")
+async def web_intelligence_crawl(req: CrawlRequest) -> dict[str, list[dict[str, Any]]]:
+    """Fetch the given URLs concurrently, politely per domain, with conditional GETs."""
+    pages = await crawler.fetch_many(req.urls)
+    return {"pages": [asdict(p) for p in pages]}
+
+
+@router.get("/web-intelligence/stats", summary="Web search cache and rate-limit stats")
+def web_intelligence_stats() -> dict[str, Any]:
+    """Return cache hits, coalesced requests, upstream calls and throttling time."""
+    return web_search.stats()
+
+
+@router.post("/financial/model", summary="Vectorised financial scenario analysis")
+def financial_model(req: FinancialModelRequest) -> dict[str, Any]:
+    """Return NPV, IRR, payback, break-even and ROI statistics over all scenarios."""
+    from ...financial_engine import evaluate  # Deferred: NumPy is only needed here
+
+    try:
+        return evaluate(
+            req.parameters, req.years, req.mode, req.samples, req.seed, req.percentiles
+        )
+    except (ValueError, KeyError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @router.post("/llm/chat", summary="Generic LLM chat completion")
 def llm_chat(req: LLMChatRequest) -> dict[str, str]:
     """Forward messages to the configured LLM provider and return its reply."""
     try:
-        reply = llm_client.chat([m.dict() for m in req.messages])
+        reply = llm_client.chat([m.dict() for m in req.messages], project_id=req.project_id)
     except Exception as exc:  # pragma: no cover - provider errors
         raise HTTPException(status_code=500, detail="LLM provider error") from exc
     return {"response": reply}
@@ -145,6 +251,12 @@ def llm_get_config() -> LLMConfig:
     )
 
 
+@router.get("/llm/endpoints", summary="LLM endpoint health and latency")
+def llm_endpoints() -> list[dict[str, Any]]:
+    """Return health, circuit state and latency histograms per LLM endpoint."""
+    return llm_router.stats()
+
+
 @router.post("/llm/config", summary="Update LLM configuration", response_model=LLMConfig)
 def llm_update_config(cfg: LLMConfigUpdate) -> LLMConfig:
     """Update provider, model or endpoint for the LLM client."""
@@ -155,35 +267,63 @@ def llm_update_config(cfg: LLMConfigUpdate) -> LLMConfig:
 
 
 @router.post("/llm/upload", summary="Upload new local model", response_model=LLMUploadResponse)
-async def llm_upload_model(file: UploadFile = File(...)) -> LLMUploadResponse:
-    """Receive a .gguf model file and store it under the models directory."""
+async def llm_upload_model(file: UploadFile = File(...), activate: bool = True) -> LLMUploadResponse:
+    """Receive a .gguf model file, store it under the models directory and activate it."""
     filename = Path(file.filename).name
     if not filename.endswith(".gguf"):
         raise HTTPException(status_code=400, detail="Model must be a .gguf file")
     models_dir = Path(settings.models_dir)
     models_dir.mkdir(parents=True, exist_ok=True)
     dest = models_dir / filename
-    content = await file.read()
-    with open(dest, "wb") as f:
-        f.write(content)
-    llm_client.update_config(model=str(dest))
+    tmp = dest.with_suffix(".part")
+    digest = hashlib.sha256()
+    with open(tmp, "wb") as f:
+        while chunk := await file.read(1 << 20):
+            digest.update(chunk)
+            f.write(chunk)
+    tmp.replace(dest)
+    model_registry.record_hash(dest, digest.hexdigest())
+    if activate:
+        try:
+            await run_in_threadpool(model_registry.activate, filename)
+        except Exception as exc:
+            raise HTTPException(status_code=502, detail=f"Model activation failed: {exc}") from exc
     return LLMUploadResponse(path=str(dest))
 
 
+@router.get("/llm/models", summary="List local models", response_model=list[LocalModel])
+def llm_list_models() -> list[LocalModel]:
+    """Return GGUF models with size, quantisation, hash and usage stats."""
+    return [LocalModel(**m) for m in model_registry.list_models()]
+
+
+@router.post(
+    "/llm/models/activate", summary="Hot swap local model", response_model=ModelActivateResponse
+)
+def llm_activate_model(req: ModelActivateRequest) -> ModelActivateResponse:
+    """Preload and warm a model on a standby server, then switch traffic to it."""
+    try:
+        return ModelActivateResponse(**model_registry.activate(req.name))
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except Exception as exc:
+        raise HTTPException(status_code=502, detail=f"Model activation failed: {exc}") from exc
+
+
 @router.post("/cloud/google", summary="Google Drive action")
 def cloud_google(req: CloudFileRequest) -> dict[str, Any]:
-    """Upload or list files on Google Drive using a stored OAuth token."""
+    """Sync files to Google Drive or list all of its files using a stored OAuth token."""
     try:
-        return google_drive_tool(req.action, req.file_path or "")
+        return google_drive_tool(req.action, req.file_path or "", req.paths, req.concurrency)
     except Exception as exc:  # pragma: no cover - network errors
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
 
 @router.post("/cloud/onedrive", summary="OneDrive action")
 def cloud_onedrive(req: CloudFileRequest) -> dict[str, Any]:
-    """Upload or list files on OneDrive using a stored OAuth token."""
+    """Sync files to OneDrive or list its root folder using a stored OAuth token."""
     try:
-        return onedrive_tool(req.action, req.file_path or "")
+        return onedrive_tool(req.action, req.file_path or "", req.paths, req.concurrency)
     except Exception as exc:  # pragma: no cover
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
@@ -202,23 +342,37 @@ def file_sync(req: FileSyncRequest) -> dict[str, str]:
     return {"status": "synced", "path": str(path)}
 
 
+@router.post("/files/retention", summary="Apply backup retention policies")
+def file_retention(req: RetentionRunRequest) -> dict[str, Any]:
+    """Delete expired files per policy (a dry run by default) and report bytes reclaimed."""
+    try:
+        reports = retention_engine().run(req.policies, req.dry_run, req.max_age_days)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {
+        "policies": reports,
+        "files_deleted": sum(r["files_deleted"] for r in reports),
+        "bytes_reclaimed": sum(r["bytes_reclaimed"] for r in reports),
+    }
+
+
+@router.get("/files/retention/stats", summary="Retention footprint and totals")
+def file_retention_stats() -> dict[str, Any]:
+    """Return indexed files and bytes per policy plus lifetime deletions."""
+    return retention_engine().stats()
+
+
 @router.post(
     "/chat/save", summary="Save chat message", response_model=ChatHistoryResponse
 )
 def chat_save(req: ChatSaveRequest) -> ChatHistoryResponse:
-    """Persist a chat message for a project."""
-    if req.message.media_url:
-        try:
-            resp = httpx.get(req.message.media_url, timeout=10.0)
-            resp.raise_for_status()
-            suffix = Path(req.message.media_url).suffix
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                tmp.write(resp.content)
-                tmp_path = Path(tmp.name)
-            if tmp_path.suffix.lower() in AUDIO_VIDEO_EXTS:
-                req.message.transcript = transcribe_file(tmp_path)
-        except Exception as exc:
-            raise HTTPException(status_code=400, detail="Media URL transcription failed") from exc
+    """Persist a chat message for a project.
+
+    Audio/video attachments and media URLs are transcribed in the background;
+    the message is returned with ``transcript_status="pending"`` and a
+    ``chat_transcript`` event is published on ``chat:<project_id>`` once the
+    transcript has been written back into the history.
+    """
     try:
         messages = save_message(req.project_id, req.message)
     except ValueError as exc:  # project_id invalid
@@ -240,23 +394,124 @@ def chat_history(project_id: str) -> ChatHistoryResponse:
 
 @router.post("/sandbox/run", summary="Run task in isolated sandbox", response_model=SandboxRunResponse)
 def sandbox_run(req: SandboxRunRequest) -> SandboxRunResponse:
-    """Execute a task inside an ephemeral Docker container and return progress logs."""
+    """Execute a task inside an ephemeral Docker container and return progress logs.
+
+    Progress is published on ``sandbox:<sandbox_id>`` while the run executes;
+    clients pass their own ``sandbox_id`` to subscribe before sending the
+    request. A new id is generated when none is given.
+    """
+    job_id = req.sandbox_id or uuid.uuid4().hex
+    if req.sandbox_id:
+        try:
+            sandbox_logs.info(job_id)
+        except LogNotFound:
+            pass
+        else:  # Starting the run would replace that job's stored log
+            raise HTTPException(status_code=409, detail="Sandbox id already used")
     manager = SandboxManager()
-    logs = manager.run_task(req.task)
-    return SandboxRunResponse(logs=logs)
+    logs = manager.run_task(req.task, job_id)
+    return SandboxRunResponse(logs=logs, job_id=job_id)
+
+
+@router.get("/sandbox/logs", summary="List stored sandbox logs")
+def sandbox_logs_list(limit: int = 50) -> list[dict[str, Any]]:
+    """Return the most recent sandbox jobs with their log sizes."""
+    return sandbox_logs.list(max(1, min(limit, 500)))
+
+
+@router.get("/sandbox/logs/{job_id}", summary="Sandbox log metadata")
+def sandbox_log_info(job_id: str) -> dict[str, Any]:
+    """Return status, sizes and line count of a job's stored log."""
+    try:
+        return sandbox_logs.info(job_id)
+    except LogNotFound as exc:
+        raise HTTPException(status_code=404, detail="Log not found") from exc
+
+
+@router.get("/sandbox/logs/{job_id}/tail", summary="Last lines of a sandbox log")
+def sandbox_log_tail(job_id: str, lines: int = 100) -> dict[str, Any]:
+    """Return the last ``lines`` lines, decompressing only the final chunks."""
+    lines = max(1, min(lines, 10000))
+    try:
+        return {"job_id": job_id, "lines": sandbox_logs.tail(job_id, lines)}
+    except LogNotFound as exc:
+        raise HTTPException(status_code=404, detail="Log not found") from exc
+
+
+@router.get("/sandbox/logs/{job_id}/range", summary="Byte range of a sandbox log")
+def sandbox_log_range(job_id: str, start: int = 0, end: int | None = None) -> dict[str, Any]:
+    """Return raw log bytes ``[start, end)`` as text (at most 4 MiB per request)."""
+    try:
+        data = sandbox_logs.read_range(job_id, start, end)
+    except LogNotFound as exc:
+        raise HTTPException(status_code=404, detail="Log not found") from exc
+    return {
+        "job_id": job_id,
+        "start": start,
+        "end": start + len(data),
+        "text": data.decode("utf-8", errors="replace"),
+    }
 
 
 @router.post(
     "/business-advisor/generate",
     summary="Generate business plan",
-    response_model=ImplementationPlan,
+    response_model=PlanJob,
 )
-def business_advisor_generate(req: PlanGenerateRequest) -> ImplementationPlan:
-    """Invoke Business Advisor Agent to create a plan from a topic."""
+def business_advisor_generate(req: PlanGenerateRequest) -> PlanJob:
+    """Queue a Business Advisor plan generation job for a topic.
+
+    Topics that were already answered return the cached plan immediately;
+    otherwise each chat round is streamed to ``/ws/progress`` under the job id.
+    """
+    from ...celery_app import generate_plan_task
+
     try:
-        return generate_plan(req.topic)
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail="Plan generation failed") from exc
+        plan = cached_plan(req.topic)
+    except Exception:  # pragma: no cover - cache unavailable, generate anyway
+        plan = None
+    if plan is not None:
+        return PlanJob(status="completed", cached=True, plan=plan)
+    result = generate_plan_task.delay(req.topic)
+    return PlanJob(job_id=result.id, status="pending")
+
+
+@router.get(
+    "/business-advisor/jobs/{job_id}",
+    summary="Plan generation job status",
+    response_model=PlanJob,
+)
+def business_advisor_job(job_id: str) -> PlanJob:
+    """Return the state of a plan generation job and its plan once finished."""
+    from ...celery_app import celery_app
+
+    result = celery_app.AsyncResult(job_id)
+    state = result.state
+    if state == "SUCCESS":
+        data = result.result or {}
+        if data.get("status") == "cancelled":
+            return PlanJob(job_id=job_id, status="cancelled")
+        return PlanJob(
+            job_id=job_id, status="completed", plan=ImplementationPlan(**data["plan"])
+        )
+    if state == "FAILURE":
+        return PlanJob(job_id=job_id, status="failed", error=str(result.result))
+    if state == "REVOKED":
+        return PlanJob(job_id=job_id, status="cancelled")
+    if state == "PROGRESS":
+        meta = result.info or {}
+        return PlanJob(job_id=job_id, status="running", round=meta.get("round"))
+    return PlanJob(job_id=job_id, status="running" if state == "STARTED" else "pending")
+
+
+@router.delete("/business-advisor/jobs/{job_id}", summary="Cancel plan generation job")
+def business_advisor_cancel(job_id: str) -> dict[str, str]:
+    """Cancel a queued job or stop a running one after its current round."""
+    from ...celery_app import celery_app
+
+    request_cancel(job_id)
+    celery_app.control.revoke(job_id)
+    return {"status": "cancelling"}
 
 
 @router.post(
@@ -269,6 +524,38 @@ def business_advisor_plan(plan: ImplementationPlan) -> ImplementationPlan:
     return create_plan(plan)
 
 
+@router.get(
+    "/business-advisor/plans",
+    summary="List implementation plans",
+    response_model=PlanListResponse,
+)
+def business_advisor_plans(
+    status: str | None = None, limit: int = 50, offset: int = 0
+) -> PlanListResponse:
+    """Return stored plans newest first, optionally filtered by status."""
+    if status is not None and status not in PLAN_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    limit = max(1, min(limit, 500))
+    offset = max(offset, 0)
+    items, total = plan_repository.list_plans(status, limit, offset)
+    return PlanListResponse(
+        items=[PlanSummary(**i) for i in items], total=total, limit=limit, offset=offset
+    )
+
+
+@router.get(
+    "/business-advisor/plans/{plan_id}",
+    summary="Get implementation plan",
+    response_model=ImplementationPlan,
+)
+def business_advisor_plan_detail(plan_id: str) -> ImplementationPlan:
+    """Return a stored plan with the state of every step."""
+    plan = plan_repository.get(plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return plan
+
+
 @router.post(
     "/business-advisor/check",
     summary="Report step outcome",
@@ -284,69 +571,33 @@ def business_advisor_check(payload: StepUpdate) -> dict[str, str]:
 
 @router.post("/voice-agent/process", summary="Process voice input")
 def voice_agent_process(req: VoiceProcessRequest) -> dict[str, Any]:
-    """Transcribe audio and analyze attachments with local LFM2-VL-1.6B."""
-    voice_dir = Path(settings.voice_agent_dir)
-    voice_dir.mkdir(parents=True, exist_ok=True)
-    stored: dict[str, str] = {}
-
-    # Persist optional ZIP attachment
-    if req.zip_base64 and req.zip_name:
-        zip_path = voice_dir / Path(req.zip_name).name
-        with open(zip_path, "wb") as f:
-            f.write(base64.b64decode(req.zip_base64))
-        stored["zip_path"] = str(zip_path)
-
-    transcript = ""
-    media_path: Path | None = None
-    if req.media_base64 and req.media_filename:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(req.media_filename).suffix) as tmp:
-            tmp.write(base64.b64decode(req.media_base64))
-            media_path = Path(tmp.name)
-    elif req.media_url:
-        try:
-            resp = httpx.get(req.media_url, timeout=10.0)
-            resp.raise_for_status()
-            with tempfile.NamedTemporaryFile(delete=False, suffix=Path(req.media_url).suffix) as tmp:
-                tmp.write(resp.content)
-                media_path = Path(tmp.name)
-        except Exception as exc:
-            raise HTTPException(status_code=400, detail="Media download failed") from exc
-    elif req.audio_path:
-        media_path = Path(req.audio_path)
-
-    if media_path and media_path.suffix.lower() in AUDIO_VIDEO_EXTS:
-        try:
-            transcript = transcribe_file(media_path)
-            stored["transcript"] = transcript
-        except Exception as exc:
-            raise HTTPException(status_code=500, detail="Transcription failed") from exc
+    """Queue transcription and LFM2-VL-1.6B analysis of voice input.
+
+    Returns the pending note and analysis ids at once; progress is published
+    on ``voice:<note_id>`` and the result is written back into the note.
+    """
+    return voice_pipeline.start(
+        media_path=req.audio_path,
+        media_url=req.media_url,
+        media_base64=req.media_base64,
+        media_filename=req.media_filename,
+        zip_name=req.zip_name,
+        zip_base64=req.zip_base64,
+    )
 
-    # Load Business Advisor Agent profile
-    agent_path = Path(__file__).resolve().parents[4] / "agents" / "experts" / "business-advisor.json"
-    with open(agent_path, "r", encoding="utf-8") as f:
-        agent_cfg = json.load(f)
-    system_prompt = agent_cfg.get("prompt", "")
 
-    messages = [{"role": "system", "content": system_prompt}]
-    if transcript:
-        messages.append({"role": "user", "content": transcript})
-    if stored.get("zip_path"):
-        messages.append({"role": "user", "content": f"Analiza el archivo {stored['zip_path']}"})
+@router.get("/voice-agent/analysis/{analysis_id}", summary="Voice analysis status")
+def voice_agent_analysis(analysis_id: str) -> dict[str, Any]:
+    """Return the state of a queued voice analysis and its result once finished."""
+    from ...celery_app import celery_app
 
-    try:
-        llm_resp = httpx.post(
-            settings.llm_openai_endpoint,
-            json={"model": "lfm2-vl-1.6b", "messages": messages},
-            timeout=30.0,
-        )
-        llm_resp.raise_for_status()
-        analysis = llm_resp.json()["choices"][0]["message"]["content"]
-    except Exception as exc:  # pragma: no cover - network failures
-        raise HTTPException(status_code=502, detail="LLM request failed") from exc
-
-    sandbox = SandboxManager()
-    logs = sandbox.run_task("Procesar entrada de voz")
-    return {"status": "processed", **stored, "analysis": analysis, "logs": logs}
+    result = celery_app.AsyncResult(analysis_id)
+    state = result.state
+    if state == "SUCCESS":
+        return {"analysis_id": analysis_id, "status": "completed", **(result.result or {})}
+    if state == "FAILURE":
+        return {"analysis_id": analysis_id, "status": "failed", "error": str(result.result)}
+    return {"analysis_id": analysis_id, "status": "running" if state == "STARTED" else "pending"}
 
 
 @router.get("/voice-agent/notes", summary="List voice notes", response_model=list[VoiceNote])
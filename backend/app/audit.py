@@ -1,15 +1,324 @@
-from datetime import datetime
+"""Structured, buffered audit log.
+
+Events are queued and written as JSON lines by a background thread that
+batches writes and fsyncs on an interval. Every process appends to its own
+active segment, named by host and PID since PIDs repeat across containers,
+which is rotated by size or age into gzip files made of independent blocks;
+each rotated segment gets a small index of per-block time ranges so
+time-range queries only decompress the blocks they need::
+
+    python -m app.audit --since 2025-01-01T00:00:00 --plan 3f2a...
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any, Dict, Iterator, List
 
 from .config import settings
 
+logger = logging.getLogger(__name__)
+
 _audit_dir = Path(settings.audit_dir)
 _audit_dir.mkdir(parents=True, exist_ok=True)
-_log_file = _audit_dir / "audit.log"
+
+# Containers sharing the audit volume all run their server as a low PID, so the
+# owner of an active segment is identified by host as well
+_HOST = re.sub(r"[^A-Za-z0-9-]", "-", socket.gethostname()) or "localhost"
+
+# Records per independently decompressible gzip block of a rotated segment
+BLOCK_RECORDS = 1000
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def _valid(line: str) -> bool:
+    """Whether ``line`` is a complete record (a crash can truncate the tail)."""
+    try:
+        return "t" in json.loads(line)
+    except ValueError:
+        return False
+
+
+class AuditLogger:
+    """Queue-backed JSON-lines writer with rotation and segment indexes."""
+
+    def __init__(self, directory: Path = _audit_dir) -> None:
+        self.directory = directory
+        self.active_path = directory / f"audit.{_HOST}_{os.getpid()}.jsonl"
+        self._queue: "queue.SimpleQueue[Dict[str, Any] | None]" = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._flushed = threading.Condition()
+        self._written = 0
+        self._enqueued = 0
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def log(self, message: str, **fields: Any) -> None:
+        now = time.time()
+        record = {"t": now, "ts": _iso(now), "event": message}
+        record.update({k: v for k, v in fields.items() if v is not None})
+        self._ensure_started()
+        with self._flushed:
+            self._enqueued += 1
+        self._queue.put(record)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Block until every event logged so far has been written."""
+        with self._flushed:
+            target = self._enqueued
+            self._flushed.wait_for(lambda: self._written >= target, timeout=timeout)
+
+    def close(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=10.0)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+    def _run(self) -> None:
+        try:
+            self._rotate_orphans()
+        except Exception:
+            logger.exception("Could not rotate orphaned audit segments")
+        f = None
+        started = time.time()
+        last_sync = time.monotonic()
+        running = True
+        while running:
+            batch: List[Dict[str, Any]] = []
+            try:
+                item = self._queue.get(timeout=settings.audit_flush_interval)
+                while True:
+                    if item is None:
+                        running = False
+                        break
+                    batch.append(item)
+                    if len(batch) >= 512:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            # A failing disk must not kill the writer: the batch is logged as
+            # lost and the segment reopened on the next pass
+            try:
+                if f is None or f.closed:
+                    f = open(self.active_path, "a", encoding="utf-8")
+                    started = self._segment_start()
+                if batch:
+                    f.write("".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in batch))
+                    f.flush()
+                now = time.monotonic()
+                if batch and (now - last_sync >= settings.audit_flush_interval or not running):
+                    os.fsync(f.fileno())
+                    last_sync = now
+                if f.tell() >= settings.audit_max_bytes or (
+                    f.tell() and time.time() - started >= settings.audit_rotate_seconds
+                ):
+                    os.fsync(f.fileno())
+                    f.close()
+                    self._rotate()
+            except Exception:
+                logger.exception("Audit writer failed, %d events may be lost", len(batch))
+                if f is not None and not f.closed:
+                    try:
+                        f.close()
+                    except OSError:
+                        pass
+            finally:
+                with self._flushed:
+                    self._written += len(batch)
+                    self._flushed.notify_all()
+        if f is not None and not f.closed:
+            os.fsync(f.fileno())
+            f.close()
+
+    def _segment_start(self) -> float:
+        try:
+            with open(self.active_path, "r", encoding="utf-8") as f:
+                return float(json.loads(f.readline())["t"])
+        except (OSError, ValueError, KeyError):
+            return time.time()
+
+    def _rotate_orphans(self) -> None:
+        """Compress active segments left behind by processes that have exited.
+
+        Liveness can only be checked for processes on this host, so segments
+        of other containers are left to those containers.
+        """
+        for path in self.directory.glob("audit.*.jsonl"):
+            host, _, pid_text = path.name.split(".")[1].rpartition("_")
+            try:
+                pid = int(pid_text)
+            except ValueError:
+                continue
+            if (host or _HOST) != _HOST or path == self.active_path:
+                continue
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                self._rotate(path)
+            except PermissionError:
+                continue
+
+    def _rotate(self, path: Path | None = None) -> None:
+        """Compress an active segment into indexed gzip blocks."""
+        path = path or self.active_path
+        lines = [l for l in path.read_text(encoding="utf-8").splitlines() if _valid(l)]
+        if not lines:
+            path.unlink()
+            return
+        first_t = json.loads(lines[0])["t"]
+        owner = path.name.split(".")[1]
+        stamp = datetime.fromtimestamp(first_t, tz=timezone.utc).strftime("%Y%m%dT%H%M%S.%f")
+        name, n = f"audit-{stamp}-{owner}", 0
+        while (self.directory / f"{name}.idx.json").exists():
+            n += 1
+            name = f"audit-{stamp}-{owner}-{n}"
+        segment = self.directory / f"{name}.jsonl.gz"
+        blocks = []
+        with open(segment, "wb") as out:
+            for i in range(0, len(lines), BLOCK_RECORDS):
+                chunk = lines[i:i + BLOCK_RECORDS]
+                data = gzip.compress(("\n".join(chunk) + "\n").encode("utf-8"))
+                blocks.append(
+                    {
+                        "start": json.loads(chunk[0])["t"],
+                        "end": json.loads(chunk[-1])["t"],
+                        "offset": out.tell(),
+                        "length": len(data),
+                        "count": len(chunk),
+                    }
+                )
+                out.write(data)
+        index = {
+            "segment": segment.name,
+            "start": blocks[0]["start"],
+            "end": blocks[-1]["end"],
+            "count": len(lines),
+            "blocks": blocks,
+        }
+        (self.directory / f"{name}.idx.json").write_text(json.dumps(index), encoding="utf-8")
+        path.unlink()
+        self._apply_retention()
+
+    def _apply_retention(self) -> None:
+        indexes = sorted(self.directory.glob("audit-*.idx.json"))
+        for idx in indexes[: max(len(indexes) - settings.audit_keep_segments, 0)]:
+            segment = idx.with_name(idx.name.replace(".idx.json", ".jsonl.gz"))
+            segment.unlink(missing_ok=True)
+            idx.unlink(missing_ok=True)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def query(
+        self,
+        since: float | None = None,
+        until: float | None = None,
+        **filters: Any,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield records in ``[since, until]`` matching every field filter."""
+        lo = since if since is not None else float("-inf")
+        hi = until if until is not None else float("inf")
+
+        def _match(record: Dict[str, Any]) -> bool:
+            return lo <= record["t"] <= hi and all(
+                str(record.get(k)) == str(v) for k, v in filters.items() if v is not None
+            )
+
+        for idx_path in sorted(self.directory.glob("audit-*.idx.json")):
+            index = json.loads(idx_path.read_text(encoding="utf-8"))
+            if index["end"] < lo or index["start"] > hi:
+                continue
+            with open(self.directory / index["segment"], "rb") as f:
+                for block in index["blocks"]:
+                    if block["end"] < lo or block["start"] > hi:
+                        continue
+                    f.seek(block["offset"])
+                    for line in gzip.decompress(f.read(block["length"])).splitlines():
+                        record = json.loads(line)
+                        if _match(record):
+                            yield record
+        for active in sorted(self.directory.glob("audit.*.jsonl")):
+            with open(active, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:  # Partially written tail line
+                        continue
+                    if _match(record):
+                        yield record
+
+
+audit_logger = AuditLogger()
+
+
+def log_event(
+    message: str,
+    *,
+    plan_id: str | None = None,
+    step: int | None = None,
+    user: str | None = None,
+    **fields: Any,
+) -> None:
+    """Queue an audit event; it is written asynchronously by the audit thread."""
+    audit_logger.log(message, plan_id=plan_id, step=step, user=user, **fields)
+
+
+def _parse_time(value: str | None) -> float | None:
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Query the audit log")
+    parser.add_argument("--since", help="ISO timestamp (UTC if no offset)")
+    parser.add_argument("--until", help="ISO timestamp (UTC if no offset)")
+    parser.add_argument("--plan", dest="plan_id")
+    parser.add_argument("--step", type=int)
+    parser.add_argument("--user")
+    args = parser.parse_args(argv)
+    for record in audit_logger.query(
+        _parse_time(args.since),
+        _parse_time(args.until),
+        plan_id=args.plan_id,
+        step=args.step,
+        user=args.user,
+    ):
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return 0
 
 
-def log_event(message: str) -> None:
-    """Append an event with timestamp to the audit log."""
-    ts = datetime.utcnow().isoformat()
-    with open(_log_file, "a", encoding="utf-8") as f:
-        f.write(f"{ts} {message}\n")
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,61 +1,227 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-from pathlib import Path
+import logging
+import os
+import time
 from typing import Any, Dict, List
 
-import httpx
 from celery import Celery
+from celery.signals import task_postrun, task_prerun, worker_process_init
+from kombu import Queue
 
 from .config import settings
+from .metrics import TASK_SECONDS, start_http_server
+
+# Each queue is consumed by its own worker service (see docker-compose.yml),
+# so quick interactive tasks never wait behind LLM rounds, web research or
+# transcriptions.
+INTERACTIVE = "interactive"
+LLM = "llm"
+TRANSCRIPTION = "transcription"
+MAINTENANCE = "maintenance"
+QUEUES = (INTERACTIVE, LLM, TRANSCRIPTION, MAINTENANCE)
+
+# Redis priorities: 0 is served first within a queue, 9 last
+PRIORITY_HIGH = 0
+PRIORITY_DEFAULT = 5
+PRIORITY_LOW = 9
+
+logger = logging.getLogger(__name__)
 
 celery_app = Celery(
     "onwrk_ai",
     broker=settings.redis_url,
     backend=settings.redis_url,
 )
+celery_app.conf.update(
+    task_queues=[Queue(name, routing_key=name) for name in QUEUES],
+    task_default_queue=INTERACTIVE,
+    task_default_priority=PRIORITY_DEFAULT,
+    broker_transport_options={
+        "priority_steps": list(range(10)),
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    },
+    result_expires=settings.celery_result_expires,
+    worker_prefetch_multiplier=settings.celery_prefetch_multiplier,
+)
+
+
+@worker_process_init.connect
+def _init_worker_process(**_kwargs: Any) -> None:
+    """Pin the pool process to its CPUs and start its metrics endpoint.
+
+    With ``WORKER_CPUS_PER_PROCESS`` set, pool process ``i`` gets the ``i``-th
+    block of the CPUs the worker may use, so concurrent transcriptions do not
+    contend for cores and whisper.cpp sizes its thread count to the block.
+    With ``WORKER_METRICS_PORT`` set, it serves its metrics on that port + ``i``.
+    """
+    from billiard.process import current_process
+
+    index = getattr(current_process(), "index", 0) or 0
+    per_process = settings.worker_cpus_per_process
+    if per_process > 0 and hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        blocks = max(len(cpus) // per_process, 1)
+        first = (index % blocks) * per_process
+        block = cpus[first:first + per_process] or cpus
+        os.sched_setaffinity(0, block)
+        logger.info("Worker process %s pinned to CPUs %s", os.getpid(), block)
+    if settings.metrics_enabled and settings.worker_metrics_port:
+        try:
+            start_http_server(settings.worker_metrics_port + index)
+        except OSError as exc:
+            logger.warning("Worker metrics endpoint unavailable: %s", exc)
+
+
+_task_started: Dict[str, float] = {}
 
 
-@celery_app.task
+@task_prerun.connect
+def _task_started_at(task_id: str = "", **_kwargs: Any) -> None:
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _task_finished(task_id: str = "", task: Any = None, state: str | None = None, **_kwargs: Any) -> None:
+    started = _task_started.pop(task_id, None)
+    if started is not None and settings.metrics_enabled:
+        TASK_SECONDS.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+@celery_app.task(queue=LLM)
 def web_intelligence_task(query: str) -> List[Dict[str, Any]]:
     """Run a Brave web search asynchronously."""
-    api_key = settings.brave_api_key
-    if not api_key:
-        return []
-    headers = {"Accept": "application/json", "X-Subscription-Token": api_key}
-    params = {"q": query, "count": 3}
-    resp = httpx.get(
-        "https://api.search.brave.com/res/v1/web/search",
-        headers=headers,
-        params=params,
-        timeout=10.0,
-    )
-    if resp.status_code != 200:
+    from .web_intelligence import SearchError, web_intelligence
+
+    try:
+        return web_intelligence.search(query)
+    except SearchError:
         return []
-    data = resp.json()
-    return [
-        {"title": item.get("title"), "url": item.get("url")}
-        for item in data.get("web", {}).get("results", [])
-    ]
-
-
-@celery_app.task
-def cleanup_backups(days: int = 7) -> int:
-    """Remove backup files older than the given number of days."""
-    cutoff = datetime.utcnow() - timedelta(days=days)
-    base = Path(settings.frontend_backup_dir)
-    count = 0
-    for path in base.glob("*"):
-        if path.is_file() and datetime.fromtimestamp(path.stat().st_mtime) < cutoff:
-            path.unlink()
-            count += 1
-    return count
-
-
-@celery_app.task
+
+
+@celery_app.task(queue=MAINTENANCE, priority=PRIORITY_LOW, ignore_result=True)
+def cleanup_backups(days: int | None = None, dry_run: bool = False) -> int:
+    """Apply every retention policy; ``days`` replaces their age limits.
+
+    Returns the number of files removed (or that would be, with ``dry_run``).
+    """
+    from .retention import get_engine
+
+    reports = get_engine().run(dry_run=dry_run, max_age_days=days)
+    return sum(r["files_deleted"] for r in reports)
+
+
+@celery_app.task(queue=INTERACTIVE, priority=PRIORITY_HIGH, ignore_result=True)
 def activate_agent(name: str) -> bool:
-    """Activate an agent by name."""
+    """Activate an agent by name; sent with an ETA when ``SCHEDULER_MODE=celery``."""
     from .agent_manager import manager
 
-    agent = manager.toggle(name, True)
+    agent = manager.update(name, active=True, scheduled=None)
     return agent is not None
+
+
+# Long-running: acknowledged only once done, and requeued rather than acked when
+# the worker process dies, so a crashed worker's plan is redelivered
+@celery_app.task(bind=True, queue=LLM, acks_late=True, reject_on_worker_lost=True)
+def generate_plan_task(self, topic: str) -> Dict[str, Any]:
+    """Run the Business Advisor group chat, streaming each round as progress."""
+    from .business_advisor import generate_plan
+    from .plan_jobs import PlanCancelled, cache_plan, is_cancelled
+    from .progress import publish_progress
+
+    job_id = self.request.id
+    channel = f"job:{job_id}"
+
+    def _on_round(round_no: int, speaker: str, message: Dict[str, Any]) -> None:
+        content = message.get("content") or ""
+        self.update_state(state="PROGRESS", meta={"round": round_no, "speaker": speaker})
+        publish_progress(
+            {
+                "type": "plan_round",
+                "job_id": job_id,
+                "round": round_no,
+                "speaker": speaker,
+                "content": content if isinstance(content, str) else str(content),
+            },
+            channel,
+        )
+        if is_cancelled(job_id):
+            raise PlanCancelled(job_id)
+
+    try:
+        plan = generate_plan(topic, on_round=_on_round)
+    except PlanCancelled:
+        publish_progress({"type": "plan_cancelled", "job_id": job_id}, channel)
+        return {"status": "cancelled"}
+    except Exception as exc:
+        publish_progress({"type": "plan_failed", "job_id": job_id, "error": str(exc)}, channel)
+        raise
+    cache_plan(topic, plan)
+    publish_progress({"type": "plan_completed", "job_id": job_id}, channel)
+    return {"status": "completed", "plan": plan.model_dump()}
+
+
+@celery_app.task(bind=True, queue=TRANSCRIPTION, acks_late=True, ignore_result=True)
+def transcribe_chat_media(self, project_id: str, message_id: str, source: str) -> None:
+    """Transcribe a chat attachment or media URL and write it into the history."""
+    from .chat_manager import set_transcript
+    from .progress import publish_progress
+    from .transcriber import transcribe_source
+
+    try:
+        transcript: str | None = transcribe_source(source)
+        status = "completed"
+    except Exception as exc:
+        logger.warning("Transcription of %s failed: %s", source, exc)
+        transcript, status = None, "failed"
+    set_transcript(project_id, message_id, transcript, status)
+    publish_progress(
+        {
+            "type": "chat_transcript",
+            "project_id": project_id,
+            "message_id": message_id,
+            "transcript_id": self.request.id,
+            "status": status,
+            "transcript": transcript,
+        },
+        f"chat:{project_id}",
+    )
+
+
+@celery_app.task(queue=TRANSCRIPTION, acks_late=True, ignore_result=True)
+def transcribe_voice_note(note_id: str, source: str, remove_source: bool = False) -> str:
+    """First voice stage: transcribe the media into the note; feeds ``analyze_voice_note``."""
+    from . import voice_pipeline
+    from .transcriber import transcribe_source
+
+    try:
+        transcript = transcribe_source(source)
+    except Exception as exc:
+        voice_pipeline.failed(note_id, "transcription", str(exc))
+        raise
+    voice_pipeline.transcribed(note_id, transcript)
+    if remove_source:
+        # Only once transcribed: a failed or redelivered run still needs the upload
+        try:
+            os.unlink(source)
+        except FileNotFoundError:
+            pass
+    return transcript
+
+
+# Tracks STARTED so GET /voice-agent/analysis/{id} can tell running from queued
+@celery_app.task(queue=LLM, acks_late=True, track_started=True)
+def analyze_voice_note(transcript: str, note_id: str, zip_path: str | None = None) -> Dict[str, Any]:
+    """Second voice stage: Business Advisor analysis and sandbox run, written into the note."""
+    from . import voice_pipeline
+    from .voice_notes import update_note
+
+    try:
+        result = voice_pipeline.analyze(transcript, zip_path)
+    except Exception as exc:
+        voice_pipeline.failed(note_id, "analysis", str(exc))
+        raise
+    update_note(note_id, analysis=result["analysis"], status="completed")
+    voice_pipeline.notify(note_id, {"type": "voice_analysis", **result})
+    return {"note_id": note_id, "transcript": transcript, **result}
@@ -1,15 +1,15 @@
 import base64
-import json
 import re
+import uuid
 from pathlib import Path
-from typing import List
-codex/create-complete-backend-for-onwrk-ai
-=======
+from typing import Any, Dict, List
+
+import httpx
 
-main
 from .config import settings
+from .json_store import read_json, update_json
 from .schemas import ChatMessage
-from .transcriber import transcribe_file, AUDIO_VIDEO_EXTS
+from .transcriber import AUDIO_VIDEO_EXTS
 
 _base = Path(settings.frontend_backup_dir) / "chat"
 _base.mkdir(parents=True, exist_ok=True)
@@ -22,13 +22,16 @@ def _sanitize_project_id(project_id: str) -> str:
 
 
 def save_message(project_id: str, message: ChatMessage) -> List[ChatMessage]:
-    """Persist a chat message to a project's history."""
+    """Persist a chat message to a project's history.
+
+    Media (an audio/video attachment or ``media_url``, judged by its file
+    extension) is transcribed by a
+    Celery worker: the message is stored with ``transcript_status="pending"``
+    and the transcript is written back into the history when it is ready.
+    """
     project_id = _sanitize_project_id(project_id)
     path = _base / f"{project_id}.json"
-    if path.exists():
-        data = json.loads(path.read_text())
-    else:
-        data = []
+    media: str | None = None
 
     if message.attachment_base64 and message.attachment_name:
         attach_dir = _base / project_id
@@ -40,21 +43,51 @@ def save_message(project_id: str, message: ChatMessage) -> List[ChatMessage]:
         with open(file_path, "wb") as f:
             f.write(base64.b64decode(message.attachment_base64))
         if file_path.suffix.lower() in AUDIO_VIDEO_EXTS:
-            try:
-                message.transcript = transcribe_file(file_path)
-            except Exception:
-                message.transcript = None
+            media = str(file_path.resolve())
+    if (
+        media is None
+        and message.media_url
+        and not message.transcript
+        and Path(httpx.URL(message.media_url).path).suffix.lower() in AUDIO_VIDEO_EXTS
+    ):
+        media = message.media_url
+    if media is not None:
+        message.transcript_id = uuid.uuid4().hex
+        message.transcript_status = "pending"
+
+    def _append(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        data.append(message.model_dump(mode="json"))
+        return list(data)
 
-    data.append(message.dict())
-    path.write_text(json.dumps(data, default=str))
+    data = update_json(path, [], _append)
+    if media is not None:
+        from .celery_app import transcribe_chat_media
+
+        transcribe_chat_media.apply_async(
+            (project_id, message.id, media), task_id=message.transcript_id
+        )
     return [ChatMessage(**m) for m in data]
 
 
+def set_transcript(
+    project_id: str, message_id: str, transcript: str | None, status: str
+) -> bool:
+    """Write a finished (or failed) transcription back into the history."""
+    path = _base / f"{_sanitize_project_id(project_id)}.json"
+
+    def _apply(data: List[Dict[str, Any]]) -> bool:
+        for entry in data:
+            if entry.get("id") == message_id:
+                entry["transcript"] = transcript
+                entry["transcript_status"] = status
+                return True
+        return False
+
+    return update_json(path, [], _apply)
+
+
 def load_history(project_id: str) -> List[ChatMessage]:
     """Return stored chat history for a project."""
     project_id = _sanitize_project_id(project_id)
-    path = _base / f"{project_id}.json"
-    if not path.exists():
-        return []
-    data = json.loads(path.read_text())
+    data = read_json(_base / f"{project_id}.json", [])
     return [ChatMessage(**m) for m in data]
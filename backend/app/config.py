@@ -12,24 +12,155 @@ class Settings(BaseSettings):
         "http://llama-cpp:8080/v1/chat/completions", env="LLAMA_CPP_OPENAI_ENDPOINT"
     )
     llm_provider: str = Field("local", env="LLM_PROVIDER")
+    llm_endpoints: str = Field(
+        "", env="LLM_ENDPOINTS", description="Extra comma separated llama.cpp replicas"
+    )
+    llm_fallback_openai: bool = Field(True, env="LLM_FALLBACK_OPENAI")
+    llm_hedge_requests: bool = Field(False, env="LLM_HEDGE_REQUESTS")
+    llm_timeout: float = Field(60.0, env="LLM_TIMEOUT")
+    llm_health_interval: float = Field(10.0, env="LLM_HEALTH_INTERVAL")
+    llm_breaker_failures: int = Field(3, env="LLM_BREAKER_FAILURES")
+    llm_breaker_reset: float = Field(30.0, env="LLM_BREAKER_RESET")
     models_dir: str = Field("models", env="MODELS_DIR")
+    llama_server_bin: str = Field("llama-server", env="LLAMA_SERVER_BIN")
+    llama_server_args: str = Field("--n-gpu-layers 999", env="LLAMA_SERVER_ARGS")
+    llama_standby_host: str = Field("127.0.0.1", env="LLAMA_STANDBY_HOST")
+    llama_standby_ports: str = Field(
+        "8091,8092", env="LLAMA_STANDBY_PORTS", description="Ports alternated by hot swaps"
+    )
+    llama_load_timeout: float = Field(300.0, env="LLAMA_LOAD_TIMEOUT")
     openai_api_key: str | None = Field(None, env="OPENAI_API_KEY")
     openai_model: str = Field("gpt-4o-mini", env="OPENAI_MODEL")
+    llm_context_tokens: int = Field(4096, env="LLM_CONTEXT_TOKENS")
+    llm_context_budgets: str = Field(
+        "openai=128000",
+        env="LLM_CONTEXT_BUDGETS",
+        description="Comma separated provider[:model]=tokens overrides",
+    )
+    llm_reply_tokens: int = Field(512, env="LLM_REPLY_TOKENS")
+    llm_tokenizer_path: str | None = Field(None, env="LLM_TOKENIZER_PATH")
     redis_url: str = Field("redis://redis:6379/0", env="REDIS_URL")
+    celery_result_expires: int = Field(
+        24 * 3600, env="CELERY_RESULT_EXPIRES", description="Seconds task results stay in Redis"
+    )
+    celery_prefetch_multiplier: int = Field(
+        1, env="CELERY_PREFETCH_MULTIPLIER", description="Default; worker services override it"
+    )
+    progress_channel: str = Field("onwrk:progress", env="PROGRESS_CHANNEL")
+    ws_queue_size: int = Field(100, env="WS_QUEUE_SIZE")
+    ws_slow_policy: str = Field(
+        "coalesce", env="WS_SLOW_POLICY", description="drop or coalesce when a client lags"
+    )
+    event_queue_size: int = Field(10000, env="EVENT_QUEUE_SIZE")
+    event_batch_size: int = Field(256, env="EVENT_BATCH_SIZE")
+    plan_cache_ttl: int = Field(7 * 24 * 3600, env="PLAN_CACHE_TTL")
     chroma_url: str = Field("http://chromadb:8000", env="CHROMA_URL")
     frontend_backup_dir: str = Field("frontend-backup", env="FRONTEND_BACKUP_DIR")
     voice_agent_dir: str = Field(
         "frontend-backup/voice-agent", env="VOICE_AGENT_DIR", description="Storage for voice agent data"
     )
     brave_api_key: str | None = Field(None, env="BRAVE_API_KEY")
+    brave_api_url: str = Field("https://api.search.brave.com/res/v1", env="BRAVE_API_URL")
+    brave_rate_per_second: float = Field(
+        1.0, env="BRAVE_RATE_PER_SECOND", description="Requests per second allowed by the Brave plan"
+    )
+    brave_burst: int = Field(1, env="BRAVE_BURST")
+    web_search_ttl: int = Field(900, env="WEB_SEARCH_TTL")
+    web_search_cache_size: int = Field(1024, env="WEB_SEARCH_CACHE_SIZE")
+    web_search_redis_cache: bool = Field(False, env="WEB_SEARCH_REDIS_CACHE")
+    web_search_timeout: float = Field(10.0, env="WEB_SEARCH_TIMEOUT")
+    crawl_cache_dir: str = Field("logs/crawl-cache", env="CRAWL_CACHE_DIR")
+    crawl_concurrency: int = Field(16, env="CRAWL_CONCURRENCY")
+    crawl_domain_delay: float = Field(
+        1.0, env="CRAWL_DOMAIN_DELAY", description="Seconds between requests to the same host"
+    )
+    crawl_timeout: float = Field(15.0, env="CRAWL_TIMEOUT")
+    crawl_fresh_seconds: int = Field(300, env="CRAWL_FRESH_SECONDS")
+    crawl_max_bytes: int = Field(2 * 1024 * 1024, env="CRAWL_MAX_BYTES")
+    crawl_max_chars: int = Field(20000, env="CRAWL_MAX_CHARS")
+    crawl_user_agent: str = Field("OnwrkAI-Research/0.1", env="CRAWL_USER_AGENT")
+    finance_max_scenarios: int = Field(2_000_000, env="FINANCE_MAX_SCENARIOS")
+    tool_workers: int = Field(8, env="TOOL_WORKERS", description="Thread pool size for agent tools")
     whisper_cpp_bin: str = Field("whispercpp", env="WHISPER_CPP_BIN")
     whisper_cpp_model: str = Field("ggml-base.en.bin", env="WHISPER_CPP_MODEL")
+    whisper_threads: int = Field(
+        0, env="WHISPER_THREADS", description="0 uses every CPU the worker process may run on"
+    )
+    media_max_bytes: int = Field(512 * 1024 * 1024, env="MEDIA_MAX_BYTES")
+    voice_analysis_timeout: float = Field(120.0, env="VOICE_ANALYSIS_TIMEOUT")
+    worker_cpus_per_process: int = Field(
+        0,
+        env="WORKER_CPUS_PER_PROCESS",
+        description="Pin each Celery worker process to this many CPUs (0 disables)",
+    )
     google_api_token: str | None = Field(None, env="GOOGLE_API_TOKEN")
     onedrive_api_token: str | None = Field(None, env="ONEDRIVE_API_TOKEN")
+    google_drive_api_url: str = Field(
+        "https://www.googleapis.com/drive/v3", env="GOOGLE_DRIVE_API_URL"
+    )
+    google_drive_upload_url: str = Field(
+        "https://www.googleapis.com/upload/drive/v3", env="GOOGLE_DRIVE_UPLOAD_URL"
+    )
+    graph_api_url: str = Field("https://graph.microsoft.com/v1.0", env="GRAPH_API_URL")
+    cloud_chunk_size: int = Field(
+        10 * 1024 * 1024,
+        env="CLOUD_CHUNK_SIZE",
+        description="Upload chunk bytes, rounded down to 256 KiB (Drive) or 320 KiB (Graph)",
+    )
+    cloud_upload_concurrency: int = Field(4, env="CLOUD_UPLOAD_CONCURRENCY")
+    cloud_max_retries: int = Field(6, env="CLOUD_MAX_RETRIES")
+    cloud_backoff_base: float = Field(0.5, env="CLOUD_BACKOFF_BASE")
+    cloud_manifest_dir: str = Field("audit/cloud-sync", env="CLOUD_MANIFEST_DIR")
     sandbox_image: str = Field("python:3.11-slim", env="SANDBOX_IMAGE")
     logs_dir: str = Field("logs", env="LOGS_DIR")
+    sandbox_logs_db: str = Field("audit/sandbox_logs.sqlite3", env="SANDBOX_LOGS_DB")
+    sandbox_log_codec: str = Field(
+        "auto", env="SANDBOX_LOG_CODEC", description="auto (zstd if installed), zstd or gzip"
+    )
+    sandbox_log_chunk_size: int = Field(256 * 1024, env="SANDBOX_LOG_CHUNK_SIZE")
+    sandbox_log_max_bytes: int = Field(64 * 1024 * 1024, env="SANDBOX_LOG_MAX_BYTES")
+    sandbox_log_keep_jobs: int = Field(500, env="SANDBOX_LOG_KEEP_JOBS")
+    sandbox_log_max_total_bytes: int = Field(1024 ** 3, env="SANDBOX_LOG_MAX_TOTAL_BYTES")
+    sandbox_log_max_age_days: float = Field(14, env="SANDBOX_LOG_MAX_AGE_DAYS")
     audit_dir: str = Field("audit", env="AUDIT_DIR")
+    audit_flush_interval: float = Field(1.0, env="AUDIT_FLUSH_INTERVAL")
+    audit_max_bytes: int = Field(16 * 1024 * 1024, env="AUDIT_MAX_BYTES")
+    audit_rotate_seconds: int = Field(24 * 3600, env="AUDIT_ROTATE_SECONDS")
+    audit_keep_segments: int = Field(60, env="AUDIT_KEEP_SEGMENTS")
+    plans_db: str = Field("audit/plans.sqlite3", env="PLANS_DB")
+    agent_store: str = Field("sqlite", env="AGENT_STORE", description="sqlite, redis or memory")
+    agents_db: str = Field("audit/agents.sqlite3", env="AGENTS_DB")
+    agent_cache_channel: str = Field("onwrk:agents", env="AGENT_CACHE_CHANNEL")
+    schedules_db: str = Field("audit/schedules.sqlite3", env="SCHEDULES_DB")
+    scheduler_mode: str = Field(
+        "local", env="SCHEDULER_MODE", description="local (in-process) or celery (ETA tasks)"
+    )
+    retention_db: str = Field("audit/retention.sqlite3", env="RETENTION_DB")
+    retention_batch_size: int = Field(500, env="RETENTION_BATCH_SIZE")
+    retention_policies: str | None = Field(
+        None, env="RETENTION_POLICIES", description="JSON list replacing the built-in policies"
+    )
     auth_db: str = Field("auth/users.json", env="AUTH_DB")
+    metrics_enabled: bool = Field(
+        True, env="METRICS_ENABLED", description="Record request/stage timings and serve /metrics"
+    )
+    profiling_enabled: bool = Field(
+        False, env="PROFILING_ENABLED", description="Allow per-request cProfile capture"
+    )
+    profile_header: str = Field("X-Profile", env="PROFILE_HEADER")
+    profile_sample_rate: float = Field(
+        0.0, env="PROFILE_SAMPLE_RATE", description="Share of requests profiled without the header"
+    )
+    profile_slow_ms: float = Field(
+        1000.0, env="PROFILE_SLOW_MS", description="Sampled requests faster than this are discarded"
+    )
+    profile_dir: str = Field("logs/profiles", env="PROFILE_DIR")
+    profile_keep: int = Field(200, env="PROFILE_KEEP")
+    worker_metrics_port: int = Field(
+        0,
+        env="WORKER_METRICS_PORT",
+        description="First port for Celery pool processes' metrics endpoints (0 disables)",
+    )
 
 
 settings = Settings()
@@ -0,0 +1,282 @@
+"""Concurrent page fetching and text extraction for the research agents.
+
+``Crawler.fetch_many`` fetches a batch of URLs with bounded concurrency and
+per-domain politeness (one request at a time per host, spaced by
+``CRAWL_DOMAIN_DELAY``). Bodies are streamed through an incremental decoder
+into :class:`TextExtractor`, so text is produced as bytes arrive and large
+pages are cut off at ``CRAWL_MAX_BYTES`` without being buffered. Extracted
+pages are cached on disk with their ``ETag``/``Last-Modified`` validators and
+revalidated with conditional GETs; a ``304`` reuses the cached text.
+
+URLs come from API callers and agents, so every request, redirects included,
+is refused unless its host resolves only to public addresses.
+"""
+from __future__ import annotations
+
+import asyncio
+import codecs
+import hashlib
+import ipaddress
+import json
+import logging
+import re
+import socket
+import threading
+import time
+from dataclasses import asdict, dataclass
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+from urllib.parse import urlsplit
+
+import httpx
+
+from .config import settings
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+_SKIP_TAGS = {"script", "style", "noscript", "template", "svg"}
+_BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "tr", "table", "section", "article",
+    "header", "footer", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre",
+}
+_CHARSET_RE = re.compile(r"charset=([\w-]+)", re.I)
+_SPACE_RE = re.compile(r"[ \t\r\f\v]+")
+
+
+class UnsafeURL(httpx.RequestError):
+    """The URL's host resolves to a private, loopback or link-local address."""
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def _guard(request: httpx.Request) -> None:
+    """httpx request hook: refuse hosts that resolve to non-public addresses.
+
+    Hooks also run for every redirect hop, so a public page cannot bounce the
+    crawler into the internal network.
+    """
+    host = request.url.host
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, request.url.port or 443, type=socket.SOCK_STREAM
+        )
+    except socket.gaierror:
+        return  # Unresolvable: the connection attempt reports the error
+    if not infos or not all(_is_public(info[4][0]) for info in infos):
+        raise UnsafeURL(f"refusing to fetch non-public address {host}", request=request)
+
+
+class TextExtractor(HTMLParser):
+    """Incremental HTML-to-text converter; call ``feed`` as chunks arrive."""
+
+    def __init__(self, max_chars: int) -> None:
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.title = ""
+        self._parts: List[str] = []
+        self._size = 0
+        self._skip = 0
+        self._in_title = False
+
+    @property
+    def full(self) -> bool:
+        return self._size >= self.max_chars
+
+    def handle_starttag(self, tag: str, attrs: Any) -> None:
+        if tag == "title":
+            self._in_title = True
+        elif tag in _SKIP_TAGS:
+            self._skip += 1
+        elif tag in _BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "title":
+            self._in_title = False
+        elif tag in _SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+        elif tag in _BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_data(self, data: str) -> None:
+        if self._in_title:
+            self.title += data
+        elif not self._skip and not self.full:
+            self._parts.append(data)
+            self._size += len(data)
+
+    def text(self) -> str:
+        lines = (_SPACE_RE.sub(" ", line).strip() for line in "".join(self._parts).split("\n"))
+        return "\n".join(line for line in lines if line)[: self.max_chars]
+
+
+@dataclass
+class Page:
+    url: str
+    status: int = 0
+    title: str = ""
+    text: str = ""
+    etag: str | None = None
+    last_modified: str | None = None
+    fetched_at: float = 0.0
+    from_cache: bool = False
+    error: str | None = None
+
+
+class PageCache:
+    """Extracted pages and their validators, one JSON file per URL."""
+
+    def __init__(self, directory: str | Path | None = None) -> None:
+        self.directory = Path(directory or settings.crawl_cache_dir)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, url: str) -> Path:
+        return self.directory / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    def get(self, url: str) -> Page | None:
+        try:
+            return Page(**json.loads(self._path(url).read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def put(self, page: Page) -> None:
+        path = self._path(page.url)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(page), ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+
+
+class Crawler:
+    """Polite, bounded-concurrency fetcher with conditional revalidation."""
+
+    def __init__(self, cache: PageCache | None = None) -> None:
+        self.cache = cache or PageCache()
+        self._next_slot: Dict[str, float] = {}
+        self._slot_lock = threading.Lock()
+
+    async def fetch_many(self, urls: Iterable[str]) -> List[Page]:
+        """Fetch every URL (duplicates once) and return pages in input order."""
+        urls = list(urls)
+        unique = list(dict.fromkeys(urls))
+        semaphore = asyncio.Semaphore(settings.crawl_concurrency)
+        domain_locks: Dict[str, asyncio.Lock] = {}
+        limits = httpx.Limits(max_connections=settings.crawl_concurrency)
+        async with httpx.AsyncClient(
+            timeout=settings.crawl_timeout,
+            follow_redirects=True,
+            limits=limits,
+            headers={"User-Agent": settings.crawl_user_agent},
+            event_hooks={"request": [_guard]},
+        ) as client:
+
+            async def _one(url: str) -> Page:
+                host = urlsplit(url).netloc.lower()
+                lock = domain_locks.setdefault(host, asyncio.Lock())
+                # Take the host lock first: queued requests for a busy host
+                # must not hold concurrency slots other hosts could use
+                async with lock:
+                    async with semaphore:
+                        return await self._fetch(client, url, host)
+
+            pages = await asyncio.gather(*(_one(u) for u in unique))
+        by_url = dict(zip(unique, pages))
+        return [by_url[u] for u in urls]
+
+    def crawl(self, urls: Iterable[str]) -> List[Page]:
+        """Synchronous wrapper for tools and Celery tasks."""
+        urls = list(urls)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.fetch_many(urls))
+        # Called from inside a loop: run the crawl on a private loop in a thread
+        result: List[Page] = []
+        worker = threading.Thread(target=lambda: result.extend(asyncio.run(self.fetch_many(urls))))
+        worker.start()
+        worker.join()
+        return result
+
+    async def _wait_turn(self, host: str) -> None:
+        """Space requests to the same host by ``CRAWL_DOMAIN_DELAY`` across batches."""
+        with self._slot_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + settings.crawl_domain_delay
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _fetch(self, client: httpx.AsyncClient, url: str, host: str) -> Page:
+        if urlsplit(url).scheme not in ("http", "https"):
+            return Page(url=url, error="unsupported URL scheme")
+        cached = self.cache.get(url)
+        fresh = cached and time.time() - cached.fetched_at < settings.crawl_fresh_seconds
+        if cached and cached.status == 200 and fresh:
+            cached.from_cache = True
+            record_cache("crawl", True)
+            return cached
+        headers: Dict[str, str] = {}
+        if cached and cached.status == 200:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        await self._wait_turn(host)
+        try:
+            async with client.stream("GET", url, headers=headers) as resp:
+                if resp.status_code == 304 and cached:
+                    cached.fetched_at = time.time()
+                    cached.from_cache = True
+                    self.cache.put(cached)
+                    record_cache("crawl", True)
+                    return cached
+                record_cache("crawl", False)
+                page = Page(
+                    url=url,
+                    status=resp.status_code,
+                    etag=resp.headers.get("ETag"),
+                    last_modified=resp.headers.get("Last-Modified"),
+                    fetched_at=time.time(),
+                )
+                if resp.status_code == 200:
+                    page.title, page.text = await self._extract(resp)
+                    self.cache.put(page)
+                return page
+        except httpx.HTTPError as exc:
+            return Page(url=url, error=str(exc) or exc.__class__.__name__)
+
+    @staticmethod
+    async def _extract(resp: httpx.Response) -> tuple[str, str]:
+        content_type = resp.headers.get("Content-Type", "")
+        match = _CHARSET_RE.search(content_type)
+        try:
+            decoder = codecs.getincrementaldecoder(match.group(1) if match else "utf-8")("replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        extractor = TextExtractor(settings.crawl_max_chars)
+        is_html = "html" in content_type or not content_type
+        received = 0
+        plain: List[str] = []
+        async for chunk in resp.aiter_bytes():
+            received += len(chunk)
+            text = decoder.decode(chunk)
+            if is_html:
+                extractor.feed(text)
+            else:
+                plain.append(text)
+            if received >= settings.crawl_max_bytes or extractor.full:
+                break
+        if not is_html:
+            return "", "".join(plain)[: settings.crawl_max_chars]
+        extractor.feed(decoder.decode(b"", final=True))
+        extractor.close()
+        return extractor.title.strip(), extractor.text()
+
+
+crawler = Crawler()
@@ -0,0 +1,157 @@
+"""Thread-safe bus for progress events produced by synchronous code.
+
+Sandbox runs, tools and route handlers executing in the thread pool cannot
+await ``ws_manager`` coroutines, and WebSocket objects belong to the server's
+event loop. :meth:`EventBus.publish` only appends to a locked deque and, when
+the deque was empty, schedules one drain on the bound loop with
+``call_soon_threadsafe``; the drain hands whole batches to ``ws_manager`` and
+records how long events waited. Every event is also forwarded to the Redis
+progress channel from a background thread, so the publisher never waits on
+Redis: other API replicas relay it to their clients, and processes without a
+bound loop (Celery workers, scripts) rely on that path alone.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+from .config import settings
+from .progress import REPLICA, publish_progress
+from .ws_manager import BROADCAST, ws_manager
+
+logger = logging.getLogger(__name__)
+
+
+class EventBus:
+    """Deliver events from any thread into the main loop in batches."""
+
+    def __init__(self, max_pending: int | None = None, batch_size: int | None = None) -> None:
+        self.max_pending = max_pending or settings.event_queue_size
+        self.batch_size = batch_size or settings.event_batch_size
+        self._pending: Deque[Tuple[float, str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._scheduled = False
+        self._forward: "queue.Queue[Tuple[str, Any, str | None]]" = queue.Queue(self.max_pending)
+        self._forwarder: threading.Thread | None = None
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.forward_dropped = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.lag_last = 0.0
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Deliver events into ``loop``; call once from the server's startup."""
+        self._loop = loop
+
+    def unbind(self) -> None:
+        self._loop = None
+
+    def publish(self, topic: str, message: str | Dict[str, Any]) -> None:
+        """Queue ``message`` for ``topic``; never blocks and never raises."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            if self._relay(topic, message, None):
+                with self._lock:
+                    self.published += 1
+            return
+        # Tagged so this replica's relay skips what it delivers locally
+        self._relay(topic, message, REPLICA)
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append((time.monotonic(), topic, message))
+            self.published += 1
+            if self._scheduled:
+                return
+            self._scheduled = True
+        try:
+            loop.call_soon_threadsafe(self._drain)
+        except RuntimeError:  # Loop closed between the check and the call
+            with self._lock:
+                self._scheduled = False
+
+    def _relay(self, topic: str, message: str | Dict[str, Any], origin: str | None) -> bool:
+        """Hand an event to the Redis forwarder thread, dropping it when full."""
+        if self._forwarder is None:
+            with self._lock:
+                if self._forwarder is None:
+                    self._forwarder = threading.Thread(
+                        target=self._run_forwarder, name="event-bus-relay", daemon=True
+                    )
+                    self._forwarder.start()
+        try:
+            self._forward.put_nowait((topic, message, origin))
+        except queue.Full:
+            with self._lock:
+                self.forward_dropped += 1
+                if origin is None:  # Nothing else will deliver it
+                    self.dropped += 1
+            return False
+        return True
+
+    def _run_forwarder(self) -> None:
+        while True:
+            topic, message, origin = self._forward.get()
+            publish_progress(message, topic, origin)
+
+    def broadcast(self, message: str | Dict[str, Any]) -> None:
+        self.publish(BROADCAST, message)
+
+    def _drain(self) -> None:
+        """Runs on the loop: deliver one batch and reschedule if more remain."""
+        with self._lock:
+            count = min(len(self._pending), self.batch_size)
+            batch = [self._pending.popleft() for _ in range(count)]
+            more = bool(self._pending)
+            self._scheduled = more
+        now = time.monotonic()
+        for enqueued, topic, message in batch:
+            try:
+                ws_manager.publish(topic, message)
+            except Exception:  # A bad payload must not stall the rest of the batch
+                logger.exception("Could not deliver event for topic %s", topic)
+            lag = now - enqueued
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+        if batch:
+            self.lag_last = now - batch[-1][0]
+            self.delivered += len(batch)
+            self.batches += 1
+            self.max_batch = max(self.max_batch, len(batch))
+        if more:
+            if self._loop is not None:
+                # Yield between batches so a burst cannot starve other callbacks
+                self._loop.call_soon(self._drain)
+            else:
+                with self._lock:
+                    self._scheduled = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "forward_dropped": self.forward_dropped,
+            # Without a loop the forwarder is the only delivery path
+            "pending": len(self._pending) if self._loop is not None else self._forward.qsize(),
+            "forward_pending": self._forward.qsize(),
+            "batches": self.batches,
+            "max_batch": self.max_batch,
+            "lag_avg_ms": round(1000 * self.lag_total / self.delivered, 3) if self.delivered else 0.0,
+            "lag_max_ms": round(1000 * self.lag_max, 3),
+            "lag_last_ms": round(1000 * self.lag_last, 3),
+        }
+
+
+event_bus = EventBus()
@@ -0,0 +1,266 @@
+"""Vectorised multi-year financial scenarios.
+
+Each scenario is an initial ``investment`` followed by ``years`` of cash flow
+``revenue * (1 + growth)**(t-1) * (1 - opex_ratio) - fixed_costs``, discounted
+at ``discount_rate``. Parameters can be scalars, lists (swept as a cartesian
+grid, or sampled uniformly in Monte Carlo mode) or distributions such as
+``{"dist": "normal", "mean": 1e5, "std": 2e4}``. All scenarios are evaluated
+as NumPy arrays in chunks, so millions of scenarios fit in one call::
+
+    evaluate({"investment": 50000, "revenue": {"dist": "triangular",
+              "low": 8000, "mode": 15000, "high": 30000}}, samples=100_000)
+"""
+from __future__ import annotations
+
+import math
+import time
+from typing import Any, Dict, List, Mapping, Sequence
+
+import numpy as np
+
+from .config import settings
+
+PARAMETERS: Dict[str, float] = {
+    "investment": 0.0,
+    "revenue": 0.0,
+    "growth": 0.0,
+    "opex_ratio": 0.0,
+    "fixed_costs": 0.0,
+    "discount_rate": 0.1,
+}
+# Names accepted from the original single-scenario tool input
+_ALIASES = {"cost": "investment"}
+LEGACY_INPUT = frozenset({"cost", "revenue"})
+METRICS = ("npv", "irr", "payback_years", "break_even_revenue", "roi")
+_CHUNK = 100_000
+
+
+def _sample(spec: Any, n: int, rng: np.random.Generator) -> np.ndarray:
+    if isinstance(spec, Mapping):
+        dist = spec.get("dist", "normal")
+        if dist == "normal":
+            return rng.normal(spec["mean"], spec["std"], n)
+        if dist == "uniform":
+            return rng.uniform(spec["low"], spec["high"], n)
+        if dist == "triangular":
+            return rng.triangular(spec["low"], spec["mode"], spec["high"], n)
+        if dist == "lognormal":
+            return rng.lognormal(spec["mean"], spec["sigma"], n)
+        raise ValueError(f"Unknown distribution: {dist}")
+    if isinstance(spec, Sequence) and not isinstance(spec, str):
+        return rng.choice(np.asarray(spec, dtype=float), n)
+    return np.full(n, float(spec))
+
+
+def build_scenarios(
+    parameters: Mapping[str, Any],
+    mode: str | None = None,
+    samples: int = 10_000,
+    seed: int | None = None,
+) -> Dict[str, np.ndarray]:
+    """Expand ``parameters`` into one array per parameter, all of equal length."""
+    params: Dict[str, Any] = dict(PARAMETERS)
+    for key, value in parameters.items():
+        key = _ALIASES.get(key, key)
+        if key not in PARAMETERS:
+            raise ValueError(f"Unknown parameter: {key}")
+        params[key] = value
+    has_dist = any(isinstance(v, Mapping) for v in params.values())
+    mode = mode or ("monte_carlo" if has_dist else "grid")
+    limit = settings.finance_max_scenarios
+    if mode == "monte_carlo":
+        if samples > limit:
+            raise ValueError(f"At most {limit} scenarios per call")
+        rng = np.random.default_rng(seed)
+        return {k: _sample(v, samples, rng) for k, v in params.items()}
+    if mode != "grid":
+        raise ValueError(f"Unknown mode: {mode}")
+    if has_dist:
+        raise ValueError("Distributions require mode 'monte_carlo'")
+    axes = {k: np.atleast_1d(np.asarray(v, dtype=float)) for k, v in params.items()}
+    total = math.prod(len(a) for a in axes.values())
+    if total > limit:
+        raise ValueError(f"Grid has {total} scenarios; at most {limit} per call")
+    mesh = np.meshgrid(*axes.values(), indexing="ij")
+    return {k: m.ravel() for k, m in zip(axes, mesh)}
+
+
+def cash_flows(s: Mapping[str, np.ndarray], years: int) -> np.ndarray:
+    """``(n, years + 1)`` cash flows; column 0 is the initial investment."""
+    t = np.arange(years, dtype=float)
+    revenue = s["revenue"][:, None] * (1.0 + s["growth"][:, None]) ** t
+    flows = np.empty((len(s["revenue"]), years + 1))
+    flows[:, 0] = -s["investment"]
+    flows[:, 1:] = revenue * (1.0 - s["opex_ratio"][:, None]) - s["fixed_costs"][:, None]
+    return flows
+
+
+def _npv(flows: np.ndarray, rate: np.ndarray) -> np.ndarray:
+    """Horner evaluation in ``1 / (1 + rate)``: one multiply-add per year, no powers."""
+    x = 1.0 / (1.0 + rate)
+    acc = flows[:, -1].copy()
+    for t in range(flows.shape[1] - 2, -1, -1):
+        acc *= x
+        acc += flows[:, t]
+    return acc
+
+
+def _irr(flows: np.ndarray, iterations: int = 50) -> np.ndarray:
+    """Vectorised bisection on ``(-99%, 1000%]``; NaN where NPV never changes sign."""
+    n = len(flows)
+    lo = np.full(n, -0.99)
+    hi = np.full(n, 10.0)
+    f_lo = _npv(flows, lo)
+    valid = np.sign(f_lo) != np.sign(_npv(flows, hi))
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        f_mid = _npv(flows, mid)
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo = np.where(left, mid, lo)
+        f_lo = np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+    return np.where(valid, (lo + hi) / 2, np.nan)
+
+
+def _payback(flows: np.ndarray) -> np.ndarray:
+    """Fractional years until cumulative cash flow turns non-negative."""
+    cumulative = np.cumsum(flows, axis=1)
+    reached = cumulative >= 0
+    first = reached.argmax(axis=1)
+    rows = np.arange(len(flows))
+    previous = cumulative[rows, np.maximum(first - 1, 0)]
+    step = flows[rows, first]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(first > 0, -previous / step, 0.0)
+    return np.where(reached.any(axis=1), np.maximum(first - 1, 0) + fraction, np.nan)
+
+
+def _break_even_revenue(s: Mapping[str, np.ndarray], years: int) -> np.ndarray:
+    """First-year revenue at which NPV is exactly zero (NPV is linear in revenue)."""
+    t = np.arange(1, years + 1, dtype=float)
+    discount = (1.0 + s["discount_rate"][:, None]) ** -t
+    annuity = discount.sum(axis=1)
+    grown = ((1.0 + s["growth"][:, None]) ** (t - 1) * discount).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (s["investment"] + s["fixed_costs"] * annuity) / ((1.0 - s["opex_ratio"]) * grown)
+
+
+def compute_metrics(s: Mapping[str, np.ndarray], years: int) -> Dict[str, np.ndarray]:
+    """Every metric for every scenario, evaluated in memory-bounded chunks."""
+    n = len(s["revenue"])
+    out = {m: np.empty(n) for m in METRICS}
+    for start in range(0, n, _CHUNK):
+        part = {k: v[start:start + _CHUNK] for k, v in s.items()}
+        flows = cash_flows(part, years)
+        end = start + len(flows)
+        out["npv"][start:end] = _npv(flows, part["discount_rate"])
+        out["irr"][start:end] = _irr(flows)
+        out["payback_years"][start:end] = _payback(flows)
+        out["break_even_revenue"][start:end] = _break_even_revenue(part, years)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out["roi"][start:end] = flows[:, 1:].sum(axis=1) / part["investment"] - 1.0
+    return out
+
+
+def summarize(values: np.ndarray, percentiles: Sequence[float]) -> Dict[str, Any]:
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return {"count": 0}
+    return {
+        "count": int(len(finite)),
+        "mean": float(finite.mean()),
+        "std": float(finite.std()),
+        "min": float(finite.min()),
+        "max": float(finite.max()),
+        "percentiles": {
+            f"p{p:g}": float(v) for p, v in zip(percentiles, np.percentile(finite, percentiles))
+        },
+    }
+
+
+def evaluate(
+    parameters: Mapping[str, Any],
+    years: int = 5,
+    mode: str | None = None,
+    samples: int = 10_000,
+    seed: int | None = None,
+    percentiles: Sequence[float] = (5, 25, 50, 75, 95),
+) -> Dict[str, Any]:
+    """Evaluate all scenarios and return per-metric statistics.
+
+    Raises ``ValueError`` for unknown parameters, modes or oversized requests.
+    """
+    if not 1 <= years <= 100:
+        raise ValueError("years must be between 1 and 100")
+    start = time.perf_counter()
+    scenarios = build_scenarios(parameters, mode, samples, seed)
+    metrics = compute_metrics(scenarios, years)
+    n = len(metrics["npv"])
+    result: Dict[str, Any] = {
+        "scenarios": n,
+        "years": years,
+        "probability_npv_positive": float((metrics["npv"] > 0).mean()),
+        "metrics": {m: summarize(v, percentiles) for m, v in metrics.items()},
+    }
+    best = int(np.nanargmax(metrics["npv"]))
+    result["best_scenario"] = _scenario(scenarios, metrics, best)
+    if n == 1:
+        result["scenario"] = result["best_scenario"]
+    result["elapsed_ms"] = round(1000 * (time.perf_counter() - start), 3)
+    return result
+
+
+def evaluate_legacy(cost: float, revenue: float) -> Dict[str, Any]:
+    """The original single-scenario tool result, extended with every metric.
+
+    The first version of the tool compared one ``cost`` with one ``revenue``,
+    which is a one-year horizon; its ``investment``/``revenue``/``roi`` keys
+    are kept at the top level::
+
+        >>> evaluate_legacy(100.0, 150.0)["roi"]
+        0.5
+    """
+    cost, revenue = float(cost), float(revenue)
+    result = evaluate({"investment": cost, "revenue": revenue}, years=1)
+    result.update(investment=cost, revenue=revenue, roi=(revenue - cost) / cost if cost else 0.0)
+    return result
+
+
+def _scenario(
+    scenarios: Mapping[str, np.ndarray], metrics: Mapping[str, np.ndarray], i: int
+) -> Dict[str, float | None]:
+    row = {k: float(v[i]) for k, v in scenarios.items()}
+    for m, v in metrics.items():
+        row[m] = float(v[i]) if np.isfinite(v[i]) else None
+    return row
+
+
+def evaluate_python(parameters: Mapping[str, float], years: int) -> List[float]:
+    """Reference scalar implementation (NPV, IRR, payback) used by the benchmark."""
+    p = {**PARAMETERS, **parameters}
+    flows = [-p["investment"]] + [
+        p["revenue"] * (1 + p["growth"]) ** t * (1 - p["opex_ratio"]) - p["fixed_costs"]
+        for t in range(years)
+    ]
+
+    def npv(rate: float) -> float:
+        return sum(cf / (1 + rate) ** t for t, cf in enumerate(flows))
+
+    lo, hi = -0.99, 10.0
+    irr = math.nan
+    if (npv(lo) > 0) != (npv(hi) > 0):
+        for _ in range(60):
+            mid = (lo + hi) / 2
+            if (npv(mid) > 0) == (npv(lo) > 0):
+                lo = mid
+            else:
+                hi = mid
+        irr = (lo + hi) / 2
+    payback, cumulative = math.nan, 0.0
+    for t, cf in enumerate(flows):
+        if cumulative + cf >= 0:
+            payback = 0.0 if t == 0 else t - 1 + -cumulative / cf
+            break
+        cumulative += cf
+    return [npv(p["discount_rate"]), irr, payback]
+
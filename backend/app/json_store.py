@@ -0,0 +1,54 @@
+"""Small JSON documents shared between the API and Celery workers.
+
+Chat histories and voice notes are rewritten by API requests and by workers
+writing back transcripts, so every read-modify-write holds an exclusive
+``flock`` on a sidecar ``.lock`` file and the document is replaced
+atomically; readers never see a half-written file.
+"""
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, TypeVar
+
+from .metrics import span
+
+T = TypeVar("T")
+
+
+@contextmanager
+def locked(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on ``path`` across processes."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def read_json(path: Path, default: Any) -> Any:
+    with span("storage_read"):
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return default
+
+
+def write_json(path: Path, data: Any) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, default=str), encoding="utf-8")
+    tmp.replace(path)
+
+
+def update_json(path: Path, default: Any, fn: Callable[[Any], T]) -> T:
+    """Apply ``fn`` to the document in place under the lock and save it."""
+    with span("storage_update"), locked(path):
+        data = read_json(path, default)
+        result = fn(data)
+        write_json(path, data)
+        return result
@@ -2,25 +2,60 @@ from __future__ import annotations
 
 """Utility to access local or external LLM providers via a unified API."""
 
-from typing import List, Dict
-
-import httpx
+import threading
+from typing import List, Dict, NamedTuple
 
 from .config import settings
+from .llm_context import ContextManager, context_manager
+from .llm_router import LLMRouter, llm_router
+from .metrics import span
+
+# Prompt appended to older turns to condense them into rolling context
+_SUMMARY_REQUEST = {
+    "role": "user",
+    "content": (
+        "Resume la conversación anterior en pocas frases, conservando hechos, "
+        "decisiones y tareas pendientes."
+    ),
+}
+
 
-try:  # Optional imports so the backend can run without these packages installed
-    from openai import OpenAI  # type: ignore
-except Exception:  # pragma: no cover - library is optional
-    OpenAI = None  # type: ignore
+class ClientConfig(NamedTuple):
+    """Immutable snapshot of the provider, model and endpoint in use."""
+
+    provider: str
+    model: str
+    endpoint: str
 
 
 class LLMClient:
     """Small helper that routes chat completions to the configured provider."""
 
-    def __init__(self) -> None:
-        self.provider = settings.llm_provider.lower()
-        self.model = settings.llm_model
-        self.endpoint = settings.llm_openai_endpoint
+    def __init__(
+        self, context: ContextManager | None = None, router: LLMRouter | None = None
+    ) -> None:
+        self._config = ClientConfig(
+            settings.llm_provider.lower(), settings.llm_model, settings.llm_openai_endpoint
+        )
+        self._lock = threading.Lock()
+        self.context = context or context_manager
+        self.router = router or llm_router
+
+    @property
+    def config(self) -> ClientConfig:
+        return self._config
+
+    @property
+    def provider(self) -> str:
+        return self._config.provider
+
+    @property
+    def model(self) -> str:
+        return self._config.model
+
+    @property
+    def endpoint(self) -> str:
+        return self._config.endpoint
 
     def update_config(
         self,
@@ -28,33 +63,45 @@ class LLMClient:
         model: str | None = None,
         endpoint: str | None = None,
     ) -> None:
-        """Update runtime configuration for the client."""
-        if provider:
-            self.provider = provider.lower()
-            settings.llm_provider = provider
-        if model:
-            self.model = model
-            settings.llm_model = model
-        if endpoint:
-            self.endpoint = endpoint
-            settings.llm_openai_endpoint = endpoint
-
-    def chat(self, messages: List[Dict[str, str]]) -> str:
-        """Generate a chat completion using the selected provider."""
-        if self.provider == "openai" and OpenAI and settings.openai_api_key:
-            client = OpenAI(api_key=settings.openai_api_key)
-            resp = client.chat.completions.create(
-                model=settings.openai_model,
-                messages=messages,
+        """Update runtime configuration for the client.
+
+        The new values are published as a single snapshot so in-flight requests
+        never observe a model from one configuration and an endpoint from another.
+        """
+        with self._lock:
+            current = self._config
+            self._config = ClientConfig(
+                provider.lower() if provider else current.provider,
+                model or current.model,
+                endpoint or current.endpoint,
             )
-            return resp.choices[0].message.content or ""
-
-        # Default: local llama.cpp OpenAI‑compatible endpoint
-        payload = {"model": self.model, "messages": messages}
-        resp = httpx.post(self.endpoint, json=payload, timeout=60.0)
-        resp.raise_for_status()
-        data = resp.json()
-        return data["choices"][0]["message"]["content"]
+            if endpoint:
+                self.router.set_primary(endpoint)
+            if provider:
+                settings.llm_provider = provider
+            if model:
+                settings.llm_model = model
+            if endpoint:
+                settings.llm_openai_endpoint = endpoint
+
+    def chat(self, messages: List[Dict[str, str]], project_id: str | None = None) -> str:
+        """Generate a chat completion, keeping the prompt within the context budget."""
+        config = self._config
+        model = settings.openai_model if config.provider == "openai" else config.model
+        fitted = self.context.fit(
+            messages,
+            config.provider,
+            model,
+            project_id=project_id,
+            summarize=lambda msgs: self._complete(msgs + [_SUMMARY_REQUEST], config),
+        )
+        return self._complete(fitted, config)
+
+    def _complete(self, messages: List[Dict[str, str]], config: ClientConfig) -> str:
+        """Send ``messages`` unchanged through the endpoint router."""
+        prefer = "openai" if config.provider == "openai" else "llama"
+        with span("llm"):
+            return self.router.complete(messages, config.model, prefer=prefer)
 
 
 llm_client = LLMClient()
@@ -0,0 +1,328 @@
+"""Context-window budgeting for chat completions.
+
+Long conversations are trimmed to a per provider/model token budget before they
+reach the LLM: the system prompt and the most recent turns are kept verbatim
+(sliding window) and everything older is folded into a rolling summary that is
+cached per project so it only has to be extended with the newly evicted turns.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from .config import settings
+
+try:  # Optional: exact token counts from a local HuggingFace tokenizer.json
+    from tokenizers import Tokenizer  # type: ignore
+except Exception:  # pragma: no cover - library is optional
+    Tokenizer = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+Message = Dict[str, Any]
+Summarizer = Callable[[List[Message]], str]
+
+# Overhead of the chat template around every message (role markers, separators)
+_MESSAGE_OVERHEAD = 4
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_PROJECT_RE = re.compile(r"[a-zA-Z0-9_-]+")
+SUMMARY_PREFIX = "Resumen de la conversación previa:\n"
+
+
+class TokenCounter:
+    """Count tokens with a local tokenizer, falling back to an estimate."""
+
+    def __init__(self, tokenizer_path: str | None = None) -> None:
+        self._tokenizer = None
+        if tokenizer_path and Tokenizer is not None and Path(tokenizer_path).exists():
+            try:
+                self._tokenizer = Tokenizer.from_file(tokenizer_path)
+            except Exception:  # pragma: no cover - corrupt tokenizer file
+                logger.warning("Could not load tokenizer %s, using estimate", tokenizer_path)
+
+    def count_text(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        # BPE vocabularies split long words into ~4 character pieces
+        return sum(max(1, (len(tok) + 3) // 4) for tok in _TOKEN_RE.findall(text))
+
+    def count_message(self, message: Message) -> int:
+        content = message.get("content")
+        if content is not None and not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False, default=str)
+        extra = message.get("tool_calls") or message.get("function_call")
+        tokens = self.count_text(content or "") + _MESSAGE_OVERHEAD
+        if extra:
+            tokens += self.count_text(json.dumps(extra, ensure_ascii=False, default=str))
+        return tokens
+
+    def count(self, messages: List[Message]) -> int:
+        return sum(self.count_message(m) for m in messages)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Keep the tail of ``text`` so that it fits in ``max_tokens``."""
+        if self.count_text(text) <= max_tokens:
+            return text
+        lo, hi = 0, len(text)
+        while lo < hi:  # smallest cut whose tail fits
+            mid = (lo + hi) // 2
+            if self.count_text(text[mid:]) <= max_tokens:
+                hi = mid
+            else:
+                lo = mid + 1
+        return text[lo:]
+
+
+def _parse_budgets(raw: str) -> Dict[str, int]:
+    """Parse ``provider[:model]=tokens`` pairs separated by commas."""
+    budgets: Dict[str, int] = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        key, _, value = item.rpartition("=")
+        try:
+            budgets[key.strip().lower()] = int(value)
+        except ValueError:
+            logger.warning("Ignoring invalid context budget entry %r", item)
+    return budgets
+
+
+def _unit_end(messages: List[Message], start: int) -> int:
+    """End index of the turn starting at ``start``.
+
+    An assistant message that calls tools is only valid together with the
+    ``tool`` (or legacy ``function``) replies that follow it, so the call and
+    its replies form one unit that is kept or dropped as a whole.
+    """
+    end = start + 1
+    head = messages[start]
+    if head.get("role") == "assistant" and (head.get("tool_calls") or head.get("function_call")):
+        while end < len(messages) and messages[end].get("role") in ("tool", "function"):
+            end += 1
+    return end
+
+
+def _units(messages: List[Message]) -> List[List[Message]]:
+    """Split ``messages`` into turns, keeping tool calls with their replies."""
+    units, start = [], 0
+    while start < len(messages):
+        end = _unit_end(messages, start)
+        units.append(messages[start:end])
+        start = end
+    return units
+
+
+def _digest(messages: List[Message]) -> str:
+    raw = json.dumps(
+        [(m.get("role"), m.get("content")) for m in messages], ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """Rolling summaries keyed by project, persisted next to the chat history."""
+
+    def __init__(self, base_dir: Path, max_anonymous: int = 128) -> None:
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._max_anonymous = max_anonymous
+
+    def _path(self, project_id: str) -> Path | None:
+        if not _PROJECT_RE.fullmatch(project_id):
+            return None
+        return self.base_dir / f"{project_id}.summary.json"
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        path = self._path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            record = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._memory[key] = record
+        return record
+
+    def put(self, key: str, record: Dict[str, Any], persist: bool) -> None:
+        with self._lock:
+            self._memory[key] = record
+            self._memory.move_to_end(key)
+            while len(self._memory) > self._max_anonymous:
+                self._memory.popitem(last=False)
+        path = self._path(key) if persist else None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(path)
+
+
+class ContextManager:
+    """Bound prompt size with a sliding window plus rolling summaries."""
+
+    def __init__(
+        self,
+        counter: TokenCounter | None = None,
+        default_budget: int | None = None,
+        budgets: Dict[str, int] | None = None,
+        reply_tokens: int | None = None,
+        summary_ratio: float = 0.25,
+        cache: SummaryCache | None = None,
+    ) -> None:
+        self.counter = counter or TokenCounter(settings.llm_tokenizer_path)
+        self.default_budget = default_budget or settings.llm_context_tokens
+        self.budgets = budgets if budgets is not None else _parse_budgets(settings.llm_context_budgets)
+        self.reply_tokens = settings.llm_reply_tokens if reply_tokens is None else reply_tokens
+        self.summary_ratio = summary_ratio
+        self.cache = cache or SummaryCache(Path(settings.frontend_backup_dir) / "chat" / "summaries")
+
+    def budget_for(self, provider: str, model: str | None = None) -> int:
+        """Prompt budget for a provider/model pair, excluding the reply reserve."""
+        provider = provider.lower()
+        candidates = [provider]
+        if model:
+            name = Path(model).name.lower()
+            candidates = [f"{provider}:{name}", f"{provider}:{model.lower()}", name, provider]
+        total = next((self.budgets[c] for c in candidates if c in self.budgets), self.default_budget)
+        return max(total - self.reply_tokens, 64)
+
+    def fit(
+        self,
+        messages: List[Message],
+        provider: str,
+        model: str | None = None,
+        project_id: str | None = None,
+        summarize: Summarizer | None = None,
+    ) -> List[Message]:
+        """Return ``messages`` trimmed so that they fit the context budget."""
+        budget = self.budget_for(provider, model)
+        if self.counter.count(messages) <= budget:
+            return list(messages)
+
+        lead = 0
+        while lead < len(messages) and messages[lead].get("role") == "system":
+            lead += 1
+        system, turns = list(messages[:lead]), list(messages[lead:])
+        if not turns:  # Only system prompts: keep the tail of the last one
+            return self._squeeze(system[-1:], budget)
+
+        system_tokens = self.counter.count(system)
+        summary_budget = int(budget * self.summary_ratio) if summarize else 0
+        window_budget = budget - system_tokens - summary_budget
+
+        units = _units(turns)
+        cut, used = len(units), 0
+        while cut > 0:
+            cost = self.counter.count(units[cut - 1])
+            if used + cost > window_budget and cut < len(units):
+                break
+            used += cost
+            cut -= 1
+        window = [m for unit in units[cut:] for m in unit]
+        older = [m for unit in units[:cut] for m in unit]
+
+        result = system
+        if older and summarize:
+            # The summariser runs on the same provider/model, so its prompt
+            # chunks are bounded by this budget too
+            summary = self._summary(older, project_id, summarize, summary_budget, budget)
+            if summary:
+                result = system + [{"role": "system", "content": SUMMARY_PREFIX + summary}]
+        return self._squeeze(result + window, budget)
+
+    def _squeeze(self, messages: List[Message], budget: int) -> List[Message]:
+        """Drop or truncate from the oldest turn until the budget is met."""
+        messages = [dict(m) for m in messages]
+        while len(messages) > 1 and self.counter.count(messages) > budget:
+            idx = next((i for i, m in enumerate(messages) if m.get("role") != "system"), 0)
+            end = _unit_end(messages, idx)
+            if end >= len(messages):
+                break
+            del messages[idx:end]
+        overflow = self.counter.count(messages) - budget
+        last = messages[-1]
+        if overflow > 0 and isinstance(last.get("content"), str):
+            keep = self.counter.count_text(last["content"]) - overflow
+            last["content"] = self.counter.truncate(last["content"], max(keep, 1))
+        return messages
+
+    def _summary(
+        self,
+        older: List[Message],
+        project_id: str | None,
+        summarize: Summarizer,
+        max_tokens: int,
+        prompt_budget: int,
+    ) -> str:
+        key = project_id or f"anon:{_digest(older[:1])}"
+        record = self.cache.get(key) or {}
+        covered = int(record.get("covered", 0))
+        summary = record.get("summary", "")
+        if covered > len(older) or record.get("digest") != _digest(older[:covered]):
+            covered, summary = 0, ""  # History was edited or belongs to another chat
+        if covered == len(older) and summary:
+            return summary
+
+        # Fold evicted turns into the summary in chunks that fit the budget
+        pending = _units(older[covered:])
+        chunk_budget = max(prompt_budget - max_tokens, 64)
+        try:
+            while pending:
+                chunk, size, taken = [], 0, 0
+                for unit in pending:
+                    cost = self.counter.count(unit)
+                    if chunk and size + cost > chunk_budget:
+                        break
+                    chunk.extend(unit)
+                    size += cost
+                    taken += 1
+                pending = pending[taken:]
+                prompt: List[Message] = []
+                if summary:
+                    prompt.append({"role": "system", "content": SUMMARY_PREFIX + summary})
+                prompt.extend(chunk)
+                summary = self.counter.truncate(summarize(prompt).strip(), max_tokens)
+                covered += len(chunk)
+        except Exception as exc:  # pragma: no cover - provider errors
+            logger.warning("Conversation summary failed, falling back to window: %s", exc)
+            if not summary:
+                return ""
+        self.cache.put(
+            key,
+            {"covered": covered, "digest": _digest(older[:covered]), "summary": summary},
+            persist=project_id is not None,
+        )
+        return summary
+
+
+class ContextBudgetTransform:
+    """AutoGen ``TransformMessages`` transform that applies the context budget."""
+
+    def __init__(self, manager: ContextManager | None = None, provider: str = "local") -> None:
+        self.manager = manager or context_manager
+        self.provider = provider
+
+    def apply_transform(self, messages: List[Message]) -> List[Message]:
+        return self.manager.fit(messages, self.provider, settings.llm_model)
+
+    def get_logs(self, pre_transform_messages: List[Message], post_transform_messages: List[Message]) -> tuple[str, bool]:
+        before = self.manager.counter.count(pre_transform_messages)
+        after = self.manager.counter.count(post_transform_messages)
+        if after < before:
+            return f"Context trimmed from {before} to {after} tokens.", True
+        return "Context within budget.", False
+
+
+context_manager = ContextManager()
@@ -0,0 +1,367 @@
+"""Multi-endpoint routing for chat completions.
+
+Requests are spread over several llama.cpp replicas weighted by their recent
+latency, endpoints that keep failing are skipped by a circuit breaker, and an
+optional hedged request is sent to a second endpoint when the first one has not
+answered by its p95 latency. OpenAI is used as the last resort when configured.
+"""
+from __future__ import annotations
+
+import bisect
+import functools
+import importlib.util
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+from .config import settings
+
+
+def _openai_available() -> bool:
+    """Check for the optional OpenAI SDK without importing it."""
+    return importlib.util.find_spec("openai") is not None
+
+
+@functools.lru_cache(maxsize=4)
+def _openai_client(api_key: str) -> Any:
+    from openai import OpenAI  # Deferred: heavy optional SDK
+
+    return OpenAI(api_key=api_key)
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+class NoEndpointAvailable(RuntimeError):
+    """Raised when every endpoint is unhealthy, open or failed."""
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram with an EWMA for load balancing."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS, alpha: float = 0.2) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.ewma: float | None = None
+        self._alpha = alpha
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += 1
+            self.sum += seconds
+            if self.ewma is None:
+                self.ewma = seconds
+            else:
+                self.ewma += self._alpha * (seconds - self.ewma)
+
+    def percentile(self, q: float) -> float | None:
+        """Upper bucket bound below which ``q`` of the observations fall."""
+        with self._lock:
+            if not self.total:
+                return None
+            rank, seen = q * self.total, 0
+            for idx, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank:
+                    return self.buckets[idx] if idx < len(self.buckets) else self.buckets[-1] * 2
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts))
+            count, total, ewma = self.total, self.sum, self.ewma
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "ewma": ewma,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "buckets": buckets,
+        }
+
+
+class CircuitBreaker:
+    """Classic closed/open/half-open breaker driven by consecutive failures."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = "closed"
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def ready(self) -> bool:
+        """Whether a request could currently pass, without claiming the trial slot."""
+        if self.state == "open":
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return not (self.state == "half_open" and self._trial_running)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.state = "closed"
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class Endpoint:
+    """A single chat completion backend (llama.cpp replica or OpenAI)."""
+
+    def __init__(self, name: str, url: str, kind: str = "llama") -> None:
+        self.name = name
+        self.url = url
+        self.kind = kind
+        self.healthy = True
+        self.in_flight = 0
+        self.latency = LatencyHistogram()
+        self.breaker = CircuitBreaker(settings.llm_breaker_failures, settings.llm_breaker_reset)
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    @property
+    def health_url(self) -> str:
+        return self.url.split("/v1/", 1)[0].rstrip("/") + "/health"
+
+    def available(self) -> bool:
+        return self.healthy and self.breaker.ready()
+
+    def begin(self) -> None:
+        """Count a request as in flight; weighting and draining read the counter."""
+        with self._lock:
+            self.in_flight += 1
+
+    def end(self, failed: bool = False) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if failed:
+                self.errors += 1
+
+    def weight(self) -> float:
+        # Unknown latency gets an optimistic guess so new replicas receive traffic
+        latency = self.latency.ewma if self.latency.ewma is not None else 0.5
+        return 1.0 / (max(latency, 0.01) * (1 + self.in_flight))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "url": self.url,
+            "kind": self.kind,
+            "healthy": self.healthy,
+            "circuit": self.breaker.state,
+            "in_flight": self.in_flight,
+            "errors": self.errors,
+            "latency": self.latency.snapshot(),
+        }
+
+
+class LLMRouter:
+    """Route chat completions across endpoints with fallback and hedging."""
+
+    def __init__(self, endpoints: List[Endpoint] | None = None) -> None:
+        self._lock = threading.Lock()
+        self.endpoints: List[Endpoint] = endpoints if endpoints is not None else self._from_settings()
+        self.hedge = settings.llm_hedge_requests
+        self.fallback_openai = settings.llm_fallback_openai
+        self.timeout = settings.llm_timeout
+        self._http = httpx.Client(timeout=self.timeout)
+        self._pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-router")
+        self._health_thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        # Callbacks receiving (model, seconds, completion_tokens) per success
+        self.observers: List[Callable[[str, float, int], None]] = []
+
+    @staticmethod
+    def _from_settings() -> List[Endpoint]:
+        urls = [settings.llm_openai_endpoint]
+        urls += [u.strip() for u in settings.llm_endpoints.split(",") if u.strip()]
+        endpoints = [Endpoint(f"llama-{i}", url) for i, url in enumerate(dict.fromkeys(urls))]
+        if settings.openai_api_key and _openai_available():
+            endpoints.append(Endpoint("openai", "https://api.openai.com/v1/chat/completions", "openai"))
+        return endpoints
+
+    # ------------------------------------------------------------------
+    # Endpoint management
+    # ------------------------------------------------------------------
+    def replace_endpoints(self, urls: List[str]) -> None:
+        """Swap the llama.cpp endpoint list atomically, keeping known stats."""
+        with self._lock:
+            known = {ep.url: ep for ep in self.endpoints}
+            local = [
+                known.get(url) or Endpoint(f"llama-{i}", url)
+                for i, url in enumerate(dict.fromkeys(urls))
+            ]
+            self.endpoints = local + [ep for ep in self.endpoints if ep.kind != "llama"]
+
+    def route_only(self, url: str) -> List[Endpoint]:
+        """Make ``url`` the only llama.cpp endpoint.
+
+        Used when the served model changes: every other replica still runs the
+        previous model. Returns the removed endpoints, whose ``in_flight``
+        counters tell when their last requests have finished.
+        """
+        with self._lock:
+            removed = [ep for ep in self.endpoints if ep.kind == "llama" and ep.url != url]
+        self.replace_endpoints([url])
+        return removed
+
+    def set_primary(self, url: str) -> None:
+        """Make ``url`` the first llama.cpp endpoint."""
+        with self._lock:
+            urls = [ep.url for ep in self.endpoints if ep.kind == "llama" and ep.url != url]
+        self.replace_endpoints([url] + urls)
+
+    def check_health(self) -> None:
+        """Probe every llama.cpp endpoint's ``/health`` route once."""
+        for ep in list(self.endpoints):
+            if ep.kind != "llama":
+                continue
+            try:
+                ep.healthy = self._http.get(ep.health_url, timeout=2.0).status_code == 200
+            except httpx.HTTPError:
+                ep.healthy = False
+
+    def start_health_checks(self, interval: float | None = None) -> None:
+        """Probe endpoints periodically from a daemon thread."""
+        if self._health_thread is not None:
+            return
+        interval = interval or settings.llm_health_interval
+
+        def _loop() -> None:
+            while not self._stop.wait(interval):
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=_loop, name="llm-health", daemon=True)
+        self._health_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [ep.stats() for ep in list(self.endpoints)]
+
+    # ------------------------------------------------------------------
+    # Request path
+    # ------------------------------------------------------------------
+    def _candidates(self, prefer: str | None) -> List[Endpoint]:
+        """Order available endpoints: preferred kind, then latency-weighted draw.
+
+        When no endpoint passes its health check, the ones whose circuit would
+        still let a request through are tried anyway: a failed probe should
+        not turn away requests a replica might still serve.
+        """
+        eligible = [
+            ep
+            for ep in list(self.endpoints)
+            if ep.kind != "openai" or prefer == "openai" or self.fallback_openai
+        ]
+        pool = [ep for ep in eligible if ep.available()]
+        if not pool:
+            pool = [ep for ep in eligible if ep.breaker.ready()]
+        ordered: List[Endpoint] = []
+        for kind in (prefer, "llama", "openai"):
+            group = [ep for ep in pool if ep.kind == kind and ep not in ordered]
+            while group:
+                pick = random.choices(group, weights=[ep.weight() for ep in group])[0]
+                ordered.append(pick)
+                group.remove(pick)
+        return ordered
+
+    def _call(self, ep: Endpoint, messages: List[Dict[str, Any]], model: str) -> str:
+        if not ep.breaker.allow():
+            raise NoEndpointAvailable(f"circuit open for {ep.name}")
+        ep.begin()
+        start = time.perf_counter()
+        try:
+            if ep.kind == "openai":
+                client = _openai_client(settings.openai_api_key)
+                resp = client.chat.completions.create(model=settings.openai_model, messages=messages)
+                reply = resp.choices[0].message.content or ""
+                tokens = resp.usage.completion_tokens if resp.usage else 0
+            else:
+                resp = self._http.post(ep.url, json={"model": model, "messages": messages})
+                resp.raise_for_status()
+                data = resp.json()
+                reply = data["choices"][0]["message"]["content"]
+                tokens = int((data.get("usage") or {}).get("completion_tokens", 0))
+        except Exception:
+            ep.end(failed=True)
+            ep.breaker.record_failure()
+            raise
+        ep.end()
+        elapsed = time.perf_counter() - start
+        ep.latency.observe(elapsed)
+        ep.breaker.record_success()
+        for observer in self.observers:
+            observer(settings.openai_model if ep.kind == "openai" else model, elapsed, tokens)
+        return reply
+
+    def complete(
+        self, messages: List[Dict[str, Any]], model: str, prefer: str | None = None
+    ) -> str:
+        """Return the first successful completion across the candidate endpoints."""
+        candidates = self._candidates(prefer)
+        if not candidates:
+            raise NoEndpointAvailable("No LLM endpoint available")
+        last_exc: Exception | None = None
+        pending: Dict[Future, Endpoint] = {}
+        queue = list(candidates)
+        while queue or pending:
+            if not pending:
+                ep = queue.pop(0)
+                pending[self._pool.submit(self._call, ep, messages, model)] = ep
+            deadline = None
+            first = next(iter(pending.values()))
+            if self.hedge and queue and len(pending) == 1:
+                deadline = first.latency.percentile(0.95) if first.latency.total >= 20 else None
+            done, _ = wait(pending, timeout=deadline or self.timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if deadline is not None and queue:
+                    ep = queue.pop(0)
+                    logger.info("Hedging LLM request on %s after %.2fs", ep.name, deadline)
+                    pending[self._pool.submit(self._call, ep, messages, model)] = ep
+                    continue
+                last_exc = TimeoutError("LLM request timed out")
+                pending.clear()  # Abandon the slow call and fall back
+                continue
+            for fut in done:
+                ep = pending.pop(fut)
+                try:
+                    return fut.result()
+                except Exception as exc:
+                    logger.warning("LLM endpoint %s failed: %s", ep.name, exc)
+                    last_exc = exc
+        raise NoEndpointAvailable("All LLM endpoints failed") from last_exc
+
+
+llm_router = LLMRouter()
@@ -1,11 +1,33 @@
+import asyncio
+
 from fastapi import FastAPI, WebSocket
+from fastapi.responses import PlainTextResponse
 from starlette.websockets import WebSocketDisconnect
 from .config import settings
 from .api.v1.routes import router as api_router
-from .scheduler import start_scheduler
+from .agent_manager import manager
+from .scheduler import start_scheduler, stop_scheduler
+from .llm_router import llm_router
+from .model_registry import model_registry
+from .event_bus import event_bus
+from .metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    MetricsMiddleware,
+    collect_api_backlogs,
+    collect_queue_depths,
+    registry as metrics_registry,
+)
+from .profiling import ProfilingMiddleware
+from .progress import relay_progress
 from .ws_manager import ws_manager
 
 app = FastAPI(title="Onwrk-AI Backend", version="0.1.0")
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    metrics_registry.on_collect(collect_queue_depths)
+    metrics_registry.on_collect(collect_api_backlogs)
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
 
 
 @app.get("/", summary="Root")
@@ -14,21 +36,48 @@ def root() -> dict[str, str]:
     return {"message": "Onwrk-AI backend running"}
 
 
+@app.get("/metrics", summary="Prometheus metrics", include_in_schema=False)
+def metrics() -> PlainTextResponse:
+    """Request, stage, cache and queue metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 app.include_router(api_router, prefix="/api/v1")
 
 
 @app.websocket("/ws/progress")
-async def progress_ws(websocket: WebSocket) -> None:
-    """WebSocket endpoint that streams progress events to clients."""
-    await ws_manager.connect(websocket)
+async def progress_ws(websocket: WebSocket, topics: str = "") -> None:
+    """WebSocket endpoint that streams progress events to clients.
+
+    Subscribe with ``?topics=job:<id>,sandbox:*`` or by sending
+    ``{"action": "subscribe", "topic": "project:<id>"}``.
+    """
+    await ws_manager.connect(websocket, [t.strip() for t in topics.split(",") if t.strip()])
     try:
         while True:
-            await websocket.receive_text()
+            await ws_manager.handle_command(websocket, await websocket.receive_text())
     except WebSocketDisconnect:
+        pass
+    finally:
         ws_manager.disconnect(websocket)
 
 
 @app.on_event("startup")
 async def _startup() -> None:  # pragma: no cover - scheduler side effect
     """Start background services when the API boots."""
+    event_bus.bind(asyncio.get_running_loop())
+    if settings.agent_store != "memory":
+        manager.start_cache()
     start_scheduler()
+    llm_router.start_health_checks()
+    app.state.progress_relay = asyncio.create_task(relay_progress())
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:  # pragma: no cover - process side effect
+    """Stop processes started on behalf of the API."""
+    event_bus.unbind()
+    stop_scheduler()
+    llm_router.stop()
+    model_registry.shutdown()
+    app.state.progress_relay.cancel()
@@ -0,0 +1,449 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms live in one :data:`registry` and are rendered
+by ``GET /metrics``. Labelled children are created once and cached, so the hot
+path is a dict lookup plus a short locked update; modules that record on every
+call can bind a child up front with ``metric.labels(...)``.
+
+* ``span("llm")`` times a stage, counts its errors and tracks how many are in
+  flight; ``@timed("storage")`` does the same for a whole function.
+* :class:`MetricsMiddleware` records per-route request latency.
+* ``record_cache("web_search", hit)`` feeds the cache hit ratios.
+* Values owned by other components (Celery queue depths, WebSocket and event
+  bus backlogs) are read when the metrics are scraped.
+
+Celery pool processes keep their own registry; with ``WORKER_METRICS_PORT``
+set each one serves it over HTTP (see :func:`start_http_server`).
+"""
+from __future__ import annotations
+
+import functools
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple, TypeVar
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds; covers cache lookups (ms) up to long transcriptions (minutes)
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+    120.0, 300.0,
+)
+
+F = TypeVar("F", bound=Callable[..., Any])
+Sample = Tuple[str, Tuple[Tuple[str, str], ...], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _CounterValue:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Metric:
+    """A named metric family; ``labels(...)`` returns the child for one label set."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> Any:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def clear(self) -> None:
+        """Drop every child, e.g. before re-reading values owned elsewhere."""
+        with self._lock:
+            self._children = {}
+
+    def samples(self) -> Iterator[Sample]:
+        for values, child in list(self._children.items()):
+            yield from self._child_samples(tuple(zip(self.labelnames, values)), child)
+
+    def _child_samples(self, labels: Tuple[Tuple[str, str], ...], child: Any) -> Iterator[Sample]:
+        yield self.name, labels, child.value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterValue:
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeValue:
+        return _GaugeValue()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _child_samples(
+        self, labels: Tuple[Tuple[str, str], ...], child: _HistogramValue
+    ) -> Iterator[Sample]:
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            yield f"{self.name}_bucket", labels + (("le", _format_value(bound)),), cumulative
+        yield f"{self.name}_sum", labels, total
+        yield f"{self.name}_count", labels, count
+
+
+class Registry:
+    """Metric families plus callbacks that refresh gauges at scrape time."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def on_collect(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """Run ``fn`` before every render; failures are logged and skipped."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception as exc:
+                logger.warning("Metrics collector %s failed: %s", fn.__name__, exc)
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests being served")
+STAGE_SECONDS = registry.histogram(
+    "stage_duration_seconds", "Time spent in a processing stage", ("stage",)
+)
+STAGE_IN_FLIGHT = registry.gauge("stage_in_flight", "Stage executions in progress", ("stage",))
+STAGE_ERRORS = registry.counter(
+    "stage_errors_total", "Stage executions that raised", ("stage",)
+)
+CACHE_REQUESTS = registry.counter(
+    "cache_requests_total", "Cache lookups by outcome", ("cache", "result")
+)
+CACHE_HIT_RATIO = registry.gauge(
+    "cache_hit_ratio", "Share of lookups served from the cache since start", ("cache",)
+)
+QUEUE_DEPTH = registry.gauge("celery_queue_depth", "Messages waiting in a Celery queue", ("queue",))
+TASK_SECONDS = registry.histogram(
+    "celery_task_duration_seconds", "Celery task run time", ("task", "state")
+)
+WS_CONNECTIONS = registry.gauge("ws_connections", "Open progress WebSocket connections")
+WS_QUEUED = registry.gauge("ws_queued_messages", "Messages queued for slow WebSocket clients")
+EVENTS_PENDING = registry.gauge("event_bus_pending", "Progress events waiting for delivery")
+
+
+# Set by the request profiler to collect {stage: [calls, seconds]} for one request
+request_stages: ContextVar[Dict[str, List[float]] | None] = ContextVar("request_stages", default=None)
+
+
+class _Span:
+    __slots__ = ("stage", "_seconds", "_in_flight", "_start")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self._seconds = STAGE_SECONDS.labels(stage)
+        self._in_flight = STAGE_IN_FLIGHT.labels(stage)
+
+    def __enter__(self) -> "_Span":
+        self._in_flight.inc()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, *_exc: Any) -> None:
+        elapsed = time.perf_counter() - self._start
+        self._seconds.observe(elapsed)
+        self._in_flight.dec()
+        if exc_type is not None:
+            STAGE_ERRORS.labels(self.stage).inc()
+        stages = request_stages.get()
+        if stages is not None:
+            entry = stages.setdefault(self.stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage: str) -> Any:
+    """Context manager timing one execution of ``stage``."""
+    return _Span(stage) if settings.metrics_enabled or settings.profiling_enabled else _NO_SPAN
+
+
+def timed(stage: str) -> Callable[[F], F]:
+    """Decorator form of :func:`span` for a whole function."""
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(stage):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+@registry.on_collect
+def _collect_cache_ratios() -> None:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), child in list(CACHE_REQUESTS._children.items()):
+        totals.setdefault(cache, [0.0, 0.0])[result == "hit"] += child.value
+    for cache, (misses, hits) in totals.items():
+        CACHE_HIT_RATIO.labels(cache).set(hits / (hits + misses) if hits + misses else 0.0)
+
+
+def collect_queue_depths() -> None:
+    """Read Celery queue lengths from the Redis broker, priority sub-queues included."""
+    from .celery_app import QUEUES, celery_app
+    from .progress import redis_client
+
+    # kombu keeps priority N > 0 of queue "q" in the list "q<sep>N"; the
+    # separator and steps come from the transport options (kombu defaults)
+    options = celery_app.conf.broker_transport_options
+    steps = options.get("priority_steps", [0, 3, 6, 9])
+    sep = options.get("sep", "\x06\x16")
+    pipe = redis_client().pipeline(transaction=False)
+    for queue in QUEUES:
+        for step in steps:
+            pipe.llen(f"{queue}{sep}{step}" if step else queue)
+    lengths = iter(pipe.execute())
+    for queue in QUEUES:
+        QUEUE_DEPTH.labels(queue).set(sum(next(lengths) for _ in steps))
+
+
+def collect_api_backlogs() -> None:
+    """Copy the WebSocket manager's and event bus's backlog counters."""
+    from .event_bus import event_bus
+    from .ws_manager import ws_manager
+
+    ws = ws_manager.stats()
+    WS_CONNECTIONS.set(ws["connections"])
+    WS_QUEUED.set(ws["queued"])
+    EVENTS_PENDING.set(event_bus.stats()["pending"])
+
+
+_PARAM_RE = re.compile(r"{(\w+)}")
+
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """The matched route's path template, e.g. ``/api/v1/chat/history/{project_id}``.
+
+    Labelling by template keeps one series per endpoint instead of one per
+    URL. Routers included with a prefix may store only their own part of the
+    template, so the prefix is recovered from the concrete path.
+    """
+    template = getattr(scope.get("route"), "path_format", None)
+    if template is None:
+        return "unmatched"
+    params = scope.get("path_params") or {}
+    concrete = _PARAM_RE.sub(lambda m: str(params.get(m.group(1), m.group(0))), template)
+    path = scope["path"]
+    if path.endswith(concrete) and len(path) > len(concrete):
+        return path[: len(path) - len(concrete)] + template
+    return template
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency per method, route template and status."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            HTTP_SECONDS.labels(scope["method"], route_template(scope), str(status)).observe(
+                time.perf_counter() - start
+            )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802 - http.server naming
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args: Any) -> None:
+        return None
+
+
+def start_http_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve :data:`registry` from a daemon thread (for processes without the API)."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,319 @@
+"""Registry of local GGUF models with preloading and hot swapping.
+
+Models found under ``models_dir`` are described by size, quantisation and
+SHA-256. Activating a model starts a standby ``llama-server`` on a spare port,
+waits for it to load, warms it with a probe prompt and only then points the
+router and LLM client at it, so the first user request after a switch does not
+pay the load cost. Every endpoint still serving the previous model leaves the
+rotation at once, and the previous managed instance is stopped once it drains.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import shutil
+import struct
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List
+
+import httpx
+
+from .config import settings
+from .llm_client import LLMClient, llm_client
+from .llm_router import Endpoint, LLMRouter, llm_router
+
+logger = logging.getLogger(__name__)
+
+GGUF_MAGIC = b"GGUF"
+# llama.cpp ``general.file_type`` values
+FILE_TYPES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 7: "Q8_0", 8: "Q5_0", 9: "Q5_1",
+    10: "Q2_K", 11: "Q3_K_S", 12: "Q3_K_M", 13: "Q3_K_L", 14: "Q4_K_S", 15: "Q4_K_M",
+    16: "Q5_K_S", 17: "Q5_K_M", 18: "Q6_K", 19: "IQ2_XXS", 20: "IQ2_XS", 21: "Q2_K_S",
+    22: "IQ3_XS", 23: "IQ3_XXS", 24: "IQ1_S", 25: "IQ4_NL", 26: "IQ3_S", 27: "IQ3_M",
+    28: "IQ2_S", 29: "IQ2_M", 30: "IQ4_XS", 31: "IQ1_M", 32: "BF16",
+}
+_QUANT_RE = re.compile(r"(?i)(?:^|[-_.])((?:i?q\d(?:_[a-z0-9]+)*)|f16|f32|bf16)(?=[-_.]|$)")
+# GGUF value type -> struct format for scalar types
+_SCALARS = {0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i", 6: "<f", 7: "<?", 10: "<Q", 11: "<q", 12: "<d"}
+_STRING, _ARRAY = 8, 9
+_PROBE = [{"role": "user", "content": "Hola"}]
+
+
+def _read_string(f: BinaryIO) -> str:
+    (length,) = struct.unpack("<Q", f.read(8))
+    return f.read(length).decode("utf-8", errors="replace")
+
+
+def _read_value(f: BinaryIO, vtype: int) -> Any:
+    if vtype in _SCALARS:
+        fmt = _SCALARS[vtype]
+        return struct.unpack(fmt, f.read(struct.calcsize(fmt)))[0]
+    if vtype == _STRING:
+        return _read_string(f)
+    if vtype == _ARRAY:
+        item_type, count = struct.unpack("<IQ", f.read(12))
+        if item_type in _SCALARS:  # Skip fixed-size arrays without decoding
+            f.seek(struct.calcsize(_SCALARS[item_type]) * count, 1)
+        else:
+            for _ in range(count):
+                _read_value(f, item_type)
+        return None
+    raise ValueError(f"Unknown GGUF value type {vtype}")
+
+
+def read_gguf_metadata(path: Path) -> Dict[str, Any]:
+    """Return the ``general.*`` metadata of a GGUF file (empty if unreadable)."""
+    meta: Dict[str, Any] = {}
+    try:
+        with open(path, "rb") as f:
+            if f.read(4) != GGUF_MAGIC:
+                return meta
+            version, _tensors, kv_count = struct.unpack("<IQQ", f.read(20))
+            meta["gguf_version"] = version
+            for _ in range(kv_count):
+                key = _read_string(f)
+                (vtype,) = struct.unpack("<I", f.read(4))
+                value = _read_value(f, vtype)
+                if key.startswith("general.") and value is not None:
+                    meta[key] = value
+                if "general.file_type" in meta and "general.name" in meta:
+                    break
+    except (OSError, struct.error, ValueError) as exc:
+        logger.warning("Could not parse GGUF header of %s: %s", path, exc)
+    return meta
+
+
+def quantization_of(path: Path, meta: Dict[str, Any] | None = None) -> str | None:
+    meta = meta if meta is not None else read_gguf_metadata(path)
+    if "general.file_type" in meta:
+        return FILE_TYPES.get(meta["general.file_type"], str(meta["general.file_type"]))
+    match = _QUANT_RE.search(path.stem)
+    return match.group(1).upper() if match else None
+
+
+class ModelStats:
+    """Running latency and throughput counters for one model."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.seconds = 0.0
+        self.tokens = 0
+        self.warmup_seconds: float | None = None
+        self.load_seconds: float | None = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "avg_latency": self.seconds / self.requests if self.requests else None,
+            "tokens_per_second": self.tokens / self.seconds if self.seconds else None,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+        }
+
+
+class _ManagedServer:
+    """A ``llama-server`` process started by the registry."""
+
+    def __init__(self, model: Path, port: int) -> None:
+        self.model = model
+        self.port = port
+        self.url = f"http://{settings.llama_standby_host}:{port}/v1/chat/completions"
+        cmd = [
+            settings.llama_server_bin,
+            "--model", str(model),
+            "--host", settings.llama_standby_host,
+            "--port", str(port),
+            *settings.llama_server_args.split(),
+        ]
+        logger.info("Starting standby llama.cpp: %s", " ".join(cmd))
+        self.process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    @property
+    def health_url(self) -> str:
+        return self.url.split("/v1/", 1)[0] + "/health"
+
+    def stop(self) -> None:
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class ModelRegistry:
+    """Discover local models and hot-swap the one serving traffic."""
+
+    def __init__(self, client: LLMClient | None = None, router: LLMRouter | None = None) -> None:
+        self.models_dir = Path(settings.models_dir)
+        self.client = client or llm_client
+        self.router = router or llm_router
+        self._lock = threading.Lock()  # Serialises activations
+        self._stats: Dict[str, ModelStats] = {}
+        self._active: _ManagedServer | None = None
+        self._ports = [int(p) for p in settings.llama_standby_ports.split(",") if p.strip()]
+        self._hash_cache_path = self.models_dir / ".registry.json"
+        self.router.observers.append(self._observe)
+
+    # ------------------------------------------------------------------
+    # Discovery
+    # ------------------------------------------------------------------
+    def _load_hashes(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return json.loads(self._hash_cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save_hashes(self, cache: Dict[str, Dict[str, Any]]) -> None:
+        self.models_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._hash_cache_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(cache, indent=2), encoding="utf-8")
+        tmp.replace(self._hash_cache_path)
+
+    def record_hash(self, path: Path, sha256: str) -> None:
+        """Store a hash computed elsewhere (e.g. while streaming an upload)."""
+        st = path.stat()
+        cache = self._load_hashes()
+        cache[path.name] = {"size": st.st_size, "mtime": st.st_mtime, "sha256": sha256}
+        self._save_hashes(cache)
+
+    @staticmethod
+    def _sha256(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def list_models(self, compute_hashes: bool = True) -> List[Dict[str, Any]]:
+        """Describe every ``.gguf`` file in the models directory."""
+        if not self.models_dir.exists():
+            return []
+        cache, dirty = self._load_hashes(), False
+        active = Path(self.client.model).name
+        models = []
+        for path in sorted(self.models_dir.glob("*.gguf")):
+            st = path.stat()
+            cached = cache.get(path.name, {})
+            sha = cached.get("sha256") if cached.get("size") == st.st_size and cached.get("mtime") == st.st_mtime else None
+            if sha is None and compute_hashes:
+                sha = self._sha256(path)
+                cache[path.name] = {"size": st.st_size, "mtime": st.st_mtime, "sha256": sha}
+                dirty = True
+            meta = read_gguf_metadata(path)
+            models.append(
+                {
+                    "name": path.name,
+                    "path": str(path),
+                    "size": st.st_size,
+                    "quantization": quantization_of(path, meta),
+                    "architecture": meta.get("general.architecture"),
+                    "sha256": sha,
+                    "active": path.name == active,
+                    "stats": self._stats_for(path.name).as_dict(),
+                }
+            )
+        if dirty:
+            self._save_hashes(cache)
+        return models
+
+    def resolve(self, name: str) -> Path:
+        path = self.models_dir / Path(name).name
+        if path.suffix != ".gguf" or not path.exists():
+            raise ValueError("Model not found")
+        return path
+
+    # ------------------------------------------------------------------
+    # Activation
+    # ------------------------------------------------------------------
+    def activate(self, name: str) -> Dict[str, Any]:
+        """Load ``name`` on a standby server, warm it up and switch traffic."""
+        path = self.resolve(name)
+        with self._lock:
+            stats = self._stats_for(path.name)
+            if not self._ports or shutil.which(settings.llama_server_bin) is None:
+                # No binary to manage: switch the model name on the shared server
+                # once it has answered a probe, so a failed load changes nothing
+                stats.warmup_seconds = self._warm_up(self.client.endpoint, str(path))
+                self.client.update_config(model=str(path))
+                return {"model": path.name, "endpoint": self.client.endpoint, "managed": False}
+
+            port = next((p for p in self._ports if not self._active or p != self._active.port), self._ports[0])
+            standby = _ManagedServer(path, port)
+            start = time.perf_counter()
+            try:
+                self._wait_ready(standby)
+                stats.load_seconds = time.perf_counter() - start
+                stats.warmup_seconds = self._warm_up(standby.url, str(path))
+            except Exception:
+                standby.stop()
+                raise
+
+            previous, self._active = self._active, standby
+            # The shared server and LLM_ENDPOINTS replicas still serve the old
+            # model, so the standby takes all traffic
+            retired = self.router.route_only(standby.url)
+            self.client.update_config(model=str(path), endpoint=standby.url)
+            if previous is not None:
+                threading.Thread(target=self._drain, args=(previous, retired), daemon=True).start()
+            return {"model": path.name, "endpoint": standby.url, "managed": True}
+
+    def _wait_ready(self, server: _ManagedServer) -> None:
+        deadline = time.monotonic() + settings.llama_load_timeout
+        while time.monotonic() < deadline:
+            if server.process.poll() is not None:
+                raise RuntimeError("llama-server exited while loading the model")
+            try:
+                if httpx.get(server.health_url, timeout=2.0).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        raise TimeoutError("Model load timed out")
+
+    @staticmethod
+    def _warm_up(url: str, model: str) -> float:
+        """Send a tiny probe so weights are paged in and the KV cache allocated."""
+        start = time.perf_counter()
+        resp = httpx.post(
+            url,
+            json={"model": model, "messages": _PROBE, "max_tokens": 8},
+            timeout=settings.llama_load_timeout,
+        )
+        resp.raise_for_status()
+        return time.perf_counter() - start
+
+    def _drain(self, server: _ManagedServer, retired: List[Endpoint], grace: float = 30.0) -> None:
+        """Stop ``server`` once the requests routed to the retired endpoints finish."""
+        deadline = time.monotonic() + grace
+        while any(ep.in_flight for ep in retired) and time.monotonic() < deadline:
+            time.sleep(0.2)
+        server.stop()
+
+    def shutdown(self) -> None:
+        if self._active is not None:
+            self._active.stop()
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+    def _stats_for(self, name: str) -> ModelStats:
+        return self._stats.setdefault(name, ModelStats())
+
+    def _observe(self, model: str, seconds: float, tokens: int) -> None:
+        stats = self._stats_for(Path(model).name)
+        stats.requests += 1
+        stats.seconds += seconds
+        stats.tokens += tokens
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: s.as_dict() for name, s in self._stats.items()}
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,56 @@
+"""Bookkeeping for background business-plan generation jobs.
+
+Generated plans are cached in Redis by normalised topic so repeated requests
+return immediately, and cancellation is cooperative: the API sets a flag that
+the worker checks after every group-chat round.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import unicodedata
+
+from .config import settings
+from .metrics import record_cache
+from .progress import redis_client
+from .schemas import ImplementationPlan
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+class PlanCancelled(Exception):
+    """Raised inside the worker when a job was cancelled by the user."""
+
+
+def normalize_topic(topic: str) -> str:
+    """Lowercase, strip accents and punctuation and collapse whitespace."""
+    text = unicodedata.normalize("NFKD", topic)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", text)).strip()
+
+
+def _cache_key(topic: str) -> str:
+    digest = hashlib.sha256(normalize_topic(topic).encode("utf-8")).hexdigest()
+    return f"plan-cache:{digest}"
+
+
+def cached_plan(topic: str) -> ImplementationPlan | None:
+    raw = redis_client().get(_cache_key(topic))
+    record_cache("plan", raw is not None)
+    if raw is None:
+        return None
+    return ImplementationPlan.model_validate(json.loads(raw))
+
+
+def cache_plan(topic: str, plan: ImplementationPlan) -> None:
+    redis_client().set(_cache_key(topic), plan.model_dump_json(), ex=settings.plan_cache_ttl)
+
+
+def request_cancel(job_id: str) -> None:
+    redis_client().set(f"plan-job:{job_id}:cancel", "1", ex=settings.plan_cache_ttl)
+
+
+def is_cancelled(job_id: str) -> bool:
+    return bool(redis_client().exists(f"plan-job:{job_id}:cancel"))
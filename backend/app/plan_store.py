@@ -0,0 +1,211 @@
+"""SQLite repository for implementation plans.
+
+Plans get collision-free UUID ids, steps live in their own table so reporting
+progress updates a single row, and an index on ``(status, created_at)`` backs
+paginated listing. The database runs in WAL mode with one connection per
+thread, which sustains thousands of step updates per second.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from .config import settings
+from .schemas import ImplementationPlan, PlanStep
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    objectives TEXT NOT NULL,
+    cost TEXT NOT NULL,
+    roi TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    step_count INTEGER NOT NULL DEFAULT 0,
+    completed_steps INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_plans_status_created ON plans (status, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_plans_created ON plans (created_at DESC);
+CREATE TABLE IF NOT EXISTS plan_steps (
+    plan_id TEXT NOT NULL REFERENCES plans (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    assigned_agent TEXT,
+    completed INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    PRIMARY KEY (plan_id, idx)
+) WITHOUT ROWID;
+"""
+
+PLAN_STATUSES = ("pending", "in_progress", "completed", "error")
+
+
+class PlanRepository:
+    """Thread-safe store for plans and their steps."""
+
+    def __init__(self, db_path: str | Path | None = None) -> None:
+        self.db_path = Path(db_path or settings.plans_db)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+        self._import_legacy_files()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def create(self, plan: ImplementationPlan, plan_id: str | None = None) -> ImplementationPlan:
+        plan_id = plan_id or uuid.uuid4().hex
+        now = time.time()
+        steps = plan.steps
+        completed = sum(1 for s in steps if s.completed)
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO plans (id, title, objectives, cost, roi, status, created_at,"
+                " updated_at, step_count, completed_steps) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    plan_id, plan.title, plan.objectives, plan.cost, plan.roi,
+                    _status(completed, len(steps)), now, now, len(steps), completed,
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO plan_steps (plan_id, idx, description, assigned_agent, completed, result)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (plan_id, i, s.description, s.assigned_agent, int(s.completed), s.result)
+                    for i, s in enumerate(steps)
+                ],
+            )
+        return self.get(plan_id)  # type: ignore[return-value]
+
+    def update_step(
+        self, plan_id: str, step_index: int, success: bool, details: str | None
+    ) -> Tuple[int, str]:
+        """Set one step's outcome; return the plan's step count and new status."""
+        conn = self._conn()
+        with conn:
+            row = conn.execute(
+                "SELECT step_count FROM plans WHERE id = ?", (plan_id,)
+            ).fetchone()
+            if row is None:
+                raise ValueError("Plan not found")
+            step_count = row["step_count"]
+            if step_index < 0 or step_index >= step_count:
+                raise ValueError("Invalid step index")
+            conn.execute(
+                "UPDATE plan_steps SET completed = ?, result = ? WHERE plan_id = ? AND idx = ?",
+                (int(success), details, plan_id, step_index),
+            )
+            completed = conn.execute(
+                "SELECT COUNT(*) FROM plan_steps WHERE plan_id = ? AND completed = 1", (plan_id,)
+            ).fetchone()[0]
+            status = _status(completed, step_count) if success else "error"
+            conn.execute(
+                "UPDATE plans SET completed_steps = ?, status = ?, updated_at = ? WHERE id = ?",
+                (completed, status, time.time(), plan_id),
+            )
+        return step_count, status
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def get(self, plan_id: str) -> ImplementationPlan | None:
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM plans WHERE id = ?", (plan_id,)).fetchone()
+        if row is None:
+            return None
+        steps = conn.execute(
+            "SELECT description, assigned_agent, completed, result FROM plan_steps"
+            " WHERE plan_id = ? ORDER BY idx",
+            (plan_id,),
+        ).fetchall()
+        return ImplementationPlan(
+            id=row["id"],
+            title=row["title"],
+            objectives=row["objectives"],
+            cost=row["cost"],
+            roi=row["roi"],
+            status=row["status"],
+            created_at=_to_datetime(row["created_at"]),
+            steps=[
+                PlanStep(
+                    description=s["description"],
+                    assigned_agent=s["assigned_agent"],
+                    completed=bool(s["completed"]),
+                    result=s["result"],
+                )
+                for s in steps
+            ],
+        )
+
+    def list_plans(
+        self, status: str | None = None, limit: int = 50, offset: int = 0
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Return a page of plan summaries, newest first, and the total count."""
+        where, params = "", ()
+        if status:
+            where, params = "WHERE status = ?", (status,)
+        conn = self._conn()
+        total = conn.execute(f"SELECT COUNT(*) FROM plans {where}", params).fetchone()[0]
+        rows = conn.execute(
+            "SELECT id, title, status, created_at, updated_at, step_count, completed_steps"
+            f" FROM plans {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+            params + (limit, offset),
+        ).fetchall()
+        items = [
+            {
+                **dict(r),
+                "created_at": _to_datetime(r["created_at"]),
+                "updated_at": _to_datetime(r["updated_at"]),
+            }
+            for r in rows
+        ]
+        return items, total
+
+    # ------------------------------------------------------------------
+    # Migration
+    # ------------------------------------------------------------------
+    def _import_legacy_files(self) -> None:
+        """Import ``plan_<timestamp>.json`` files written by earlier versions."""
+        audit_dir = Path(settings.audit_dir)
+        for path in sorted(audit_dir.glob("plan_*.json")):
+            plan_id = path.stem[len("plan_"):]
+            if self._conn().execute("SELECT 1 FROM plans WHERE id = ?", (plan_id,)).fetchone():
+                continue
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+                self.create(ImplementationPlan.model_validate(data), plan_id=plan_id)
+            except (OSError, ValueError, sqlite3.IntegrityError):
+                continue
+
+
+def _status(completed: int, total: int) -> str:
+    if total and completed >= total:
+        return "completed"
+    return "in_progress" if completed else "pending"
+
+
+def _to_datetime(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+plan_repository = PlanRepository()
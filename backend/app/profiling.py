@@ -0,0 +1,263 @@
+"""Opt-in per-request profiling with slow-request capture.
+
+With ``PROFILING_ENABLED`` set, :class:`ProfilingMiddleware` profiles a request
+when it carries the ``PROFILE_HEADER`` header or is picked at
+``PROFILE_SAMPLE_RATE``. The endpoint body runs under ``cProfile`` (the
+:class:`ProfiledRoute` wrapper, also inside the threadpool for sync
+endpoints), and every metrics ``span`` it enters adds to a per-stage breakdown.
+Sampled requests are kept only if they take at least ``PROFILE_SLOW_MS``;
+header-triggered ones are always kept and answer with ``X-Profile-Id``.
+
+Kept profiles go to ``PROFILE_DIR`` as a ``.prof`` file (``pstats``,
+``snakeviz``) plus a JSON summary. Only the newest ``PROFILE_KEEP`` are kept.
+"""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import functools
+import io
+import json
+import logging
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+from fastapi.routing import APIRoute
+
+from .config import settings
+from .metrics import request_stages, route_template
+
+logger = logging.getLogger(__name__)
+
+_PROFILE_ID_RE = re.compile(r"[0-9a-f]{32}")
+TOP_FUNCTIONS = 40
+
+
+class ProfileNotFound(KeyError):
+    """No stored profile has the requested id."""
+
+
+class RequestProfile:
+    """cProfile segments and stage timings collected for one request."""
+
+    def __init__(self, profile_id: str, trigger: str) -> None:
+        self.id = profile_id
+        self.trigger = trigger
+        self.stages: Dict[str, List[float]] = {}  # Filled by metrics spans
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def segment(self) -> Iterator[None]:
+        """Profile the current thread; one request may run on several threads."""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # Another profiler is active (process-wide since Python 3.12)
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                self._profiles.append(profile)
+
+    def stats(self) -> pstats.Stats | None:
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+
+_current: ContextVar[RequestProfile | None] = ContextVar("request_profile", default=None)
+
+
+def _profiled(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    if asyncio.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            profile = _current.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            # Other requests' coroutines that run meanwhile are attributed too
+            with profile.segment():
+                return await endpoint(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        profile = _current.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        with profile.segment():
+            return endpoint(*args, **kwargs)
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """Route whose endpoint runs under the request's profiler when there is one."""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+class ProfileStore:
+    """``<id>.prof`` and ``<id>.json`` pairs in a directory, newest ``keep`` retained."""
+
+    def __init__(self, directory: str | Path | None = None, keep: int | None = None) -> None:
+        self.directory = Path(directory or settings.profile_dir)
+        self.keep = settings.profile_keep if keep is None else keep
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id: str, suffix: str) -> Path:
+        if not _PROFILE_ID_RE.fullmatch(profile_id):
+            raise ProfileNotFound(profile_id)
+        return self.directory / f"{profile_id}{suffix}"
+
+    def save(self, profile: RequestProfile, meta: Dict[str, Any]) -> Dict[str, Any]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stats = profile.stats()
+        record = {
+            "id": profile.id,
+            "trigger": profile.trigger,
+            **meta,
+            "stages": {
+                name: {"calls": int(calls), "ms": round(1000 * seconds, 3)}
+                for name, (calls, seconds) in sorted(profile.stages.items(), key=lambda kv: -kv[1][1])
+            },
+            "has_profile": stats is not None,
+            "top": _top_functions(stats) if stats is not None else "",
+        }
+        if stats is not None:
+            stats.dump_stats(str(self._path(profile.id, ".prof")))
+        # The summary is written last: list() only sees complete profiles
+        tmp = self._path(profile.id, ".json.tmp")
+        tmp.write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self._path(profile.id, ".json"))
+        self._apply_retention()
+        return record
+
+    def _apply_retention(self) -> None:
+        with self._lock:
+            summaries = sorted(self.directory.glob("*.json"), key=_mtime, reverse=True)
+            for path in summaries[self.keep:]:
+                path.unlink(missing_ok=True)
+                path.with_suffix(".prof").unlink(missing_ok=True)
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest summaries first, without the function listing."""
+        out = []
+        for path in sorted(self.directory.glob("*.json"), key=_mtime, reverse=True)[:limit]:
+            try:
+                record = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):  # Removed by retention meanwhile
+                continue
+            record.pop("top", None)
+            out.append(record)
+        return out
+
+    def get(self, profile_id: str) -> Dict[str, Any]:
+        try:
+            return json.loads(self._path(profile_id, ".json").read_text(encoding="utf-8"))
+        except FileNotFoundError as exc:
+            raise ProfileNotFound(profile_id) from exc
+
+    def profile_path(self, profile_id: str) -> Path:
+        path = self._path(profile_id, ".prof")
+        if not path.exists():
+            raise ProfileNotFound(profile_id)
+        return path
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def _top_functions(stats: pstats.Stats) -> str:
+    out = io.StringIO()
+    stats.stream = out  # type: ignore[attr-defined]
+    stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    return out.getvalue()
+
+
+profile_store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware deciding which requests to profile and storing slow ones."""
+
+    def __init__(self, app: Any, store: ProfileStore | None = None) -> None:
+        self.app = app
+        self.store = store or profile_store
+        self.header = settings.profile_header.lower().encode("latin-1")
+
+    def _trigger(self, scope: Dict[str, Any]) -> str | None:
+        for name, value in scope.get("headers", ()):
+            if name == self.header and value not in (b"", b"0", b"false"):
+                return "header"
+        if settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile(uuid.uuid4().hex, trigger)
+        status = 500
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if trigger == "header":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-id", profile.id.encode("ascii")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current.set(profile)
+        stages_token = request_stages.set(profile.stages)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stages.reset(stages_token)
+            _current.reset(token)
+            elapsed_ms = 1000 * (time.perf_counter() - start)
+            if trigger == "header" or elapsed_ms >= settings.profile_slow_ms:
+                meta = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": route_template(scope),
+                    "status": status,
+                    "duration_ms": round(elapsed_ms, 3),
+                    "timestamp": time.time(),
+                }
+                try:
+                    await asyncio.to_thread(self.store.save, profile, meta)
+                    logger.info(
+                        "Profiled %s %s in %.0f ms: %s", meta["method"], meta["path"], elapsed_ms, profile.id
+                    )
+                except Exception as exc:  # pragma: no cover - disk full, permissions
+                    logger.warning("Could not store request profile: %s", exc)
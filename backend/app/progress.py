@@ -0,0 +1,77 @@
+"""Cross-process progress events for ``/ws/progress``.
+
+Celery workers and other API replicas cannot reach a replica's WebSocket
+connections directly, so events are published as ``{"topic", "message"}``
+envelopes on a Redis channel; every API replica relays that channel to the
+clients subscribed to the topic. A replica has already delivered its own events
+locally, so envelopes carry an ``origin`` and the relay skips its own.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Dict
+
+from .config import settings
+from .ws_manager import BROADCAST, ws_manager
+
+logger = logging.getLogger(__name__)
+
+_redis = None
+
+# Identifies this process in the envelopes it publishes
+REPLICA = uuid.uuid4().hex
+
+
+def redis_client() -> Any:
+    global _redis
+    if _redis is None:
+        import redis
+
+        _redis = redis.Redis.from_url(settings.redis_url)
+    return _redis
+
+
+def publish_progress(
+    event: Dict[str, Any] | str, topic: str = BROADCAST, origin: str | None = None
+) -> None:
+    """Publish a progress event for ``topic`` from any process; failures are only logged.
+
+    ``origin`` marks an event this replica has already delivered to its own
+    clients.
+    """
+    envelope = {"topic": topic, "message": event, "origin": origin}
+    try:
+        redis_client().publish(
+            settings.progress_channel, json.dumps(envelope, ensure_ascii=False, default=str)
+        )
+    except Exception as exc:  # pragma: no cover - broker unavailable
+        logger.warning("Could not publish progress event: %s", exc)
+
+
+async def relay_progress() -> None:  # pragma: no cover - long-running network loop
+    """Forward events from the Redis channel to this replica's subscribers."""
+    import redis.asyncio as aioredis
+
+    while True:
+        try:
+            client = aioredis.Redis.from_url(settings.redis_url)
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(settings.progress_channel)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        envelope = json.loads(message["data"])
+                        if envelope.get("origin") == REPLICA:
+                            continue
+                        ws_manager.publish(envelope["topic"], envelope["message"])
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning("Dropping malformed progress envelope")
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Progress relay disconnected: %s", exc)
+            await asyncio.sleep(2.0)
@@ -0,0 +1,394 @@
+"""Retention policies for backup, chat, voice, log and cache directories.
+
+Every policy owns a directory tree and limits it by age, total bytes and/or
+file count. Files are tracked in a SQLite index ordered by mtime, so a run
+selects exactly the files that expire without stat-ing the rest. The index is
+refreshed incrementally: a directory is only re-listed when its own mtime
+changed (a file was created, renamed or removed in it), and each candidate is
+re-stat-ed before deletion so a file rewritten in place is kept. A file that
+grows in place leaves its directory's mtime alone, so policies with a byte
+limit also re-stat their indexed files on each refresh. Deletions are applied
+and committed in batches together with the policy's lifetime totals;
+``dry_run`` reports what would go.
+"""
+from __future__ import annotations
+
+import fnmatch
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS retention_files (
+    policy TEXT NOT NULL,
+    path TEXT NOT NULL,
+    dir TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    PRIMARY KEY (policy, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS retention_files_mtime ON retention_files (policy, mtime);
+CREATE INDEX IF NOT EXISTS retention_files_dir ON retention_files (policy, dir);
+CREATE TABLE IF NOT EXISTS retention_dirs (
+    policy TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    subdirs TEXT NOT NULL,
+    PRIMARY KEY (policy, path)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS retention_totals (
+    policy TEXT PRIMARY KEY,
+    runs INTEGER NOT NULL DEFAULT 0,
+    files_deleted INTEGER NOT NULL DEFAULT 0,
+    bytes_reclaimed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Lifetime totals are shared by every process using the database (the API and
+# the maintenance worker) and survive restarts
+_ADD_TOTALS = """
+INSERT INTO retention_totals (policy, runs, files_deleted, bytes_reclaimed) VALUES (?, ?, ?, ?)
+ON CONFLICT (policy) DO UPDATE SET
+    runs = runs + excluded.runs,
+    files_deleted = files_deleted + excluded.files_deleted,
+    bytes_reclaimed = bytes_reclaimed + excluded.bytes_reclaimed
+"""
+
+_DAY = 86400.0
+
+
+@dataclass
+class RetentionPolicy:
+    """Limits for one directory tree; unset limits are not enforced."""
+
+    name: str
+    root: str
+    include: List[str] = field(default_factory=lambda: ["*"])
+    recursive: bool = True
+    max_age_days: float | None = None
+    max_bytes: int | None = None
+    max_files: int | None = None
+
+
+def default_policies() -> List[RetentionPolicy]:
+    """Built-in policies, or ``RETENTION_POLICIES`` (a JSON list) when set."""
+    if settings.retention_policies:
+        return [RetentionPolicy(**p) for p in json.loads(settings.retention_policies)]
+    backup = Path(settings.frontend_backup_dir)
+    return [
+        # Files synced from the frontend; nested stores have their own policies
+        RetentionPolicy("backups", str(backup), recursive=False, max_age_days=7),
+        # Attachments in chat/<project>/ and the summary cache; histories are kept
+        RetentionPolicy(
+            "chat-attachments", str(backup / "chat"), include=["*/*"],
+            max_age_days=30, max_bytes=1024 ** 3,
+        ),
+        RetentionPolicy(
+            "voice-attachments", str(Path(settings.voice_agent_dir)), include=["*.zip"],
+            max_age_days=30,
+        ),
+        # Plain logs from before the sandbox log store, which retains its own jobs
+        RetentionPolicy(
+            "sandbox-logs", str(Path(settings.logs_dir) / "sandbox"), include=["*.log"],
+            recursive=False, max_age_days=14, max_files=5000,
+        ),
+        RetentionPolicy("crawl-cache", settings.crawl_cache_dir, max_bytes=256 * 1024 ** 2),
+    ]
+
+
+class RetentionEngine:
+    """Apply retention policies against an incrementally maintained index."""
+
+    def __init__(
+        self,
+        policies: List[RetentionPolicy] | None = None,
+        db_path: str | Path | None = None,
+    ) -> None:
+        self.policies = {p.name: p for p in (policies or default_policies())}
+        self.db_path = Path(db_path or settings.retention_db)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    # ------------------------------------------------------------------
+    # Index maintenance
+    # ------------------------------------------------------------------
+    def refresh(self, policy: RetentionPolicy) -> int:
+        """Re-list directories whose mtime changed; return how many were listed.
+
+        With ``max_bytes`` set, files in the other directories are re-stat-ed
+        too, so the byte total reflects files rewritten in place.
+        """
+        root = Path(policy.root).resolve()
+        # Roots of other policies inside this tree belong to those policies
+        nested = {
+            str(Path(p.root).resolve()) for p in self.policies.values() if p.name != policy.name
+        }
+        known = {
+            path: (mtime_ns, json.loads(subdirs))
+            for path, mtime_ns, subdirs in self._db.execute(
+                "SELECT path, mtime_ns, subdirs FROM retention_dirs WHERE policy = ?",
+                (policy.name,),
+            )
+        }
+        seen: set[str] = set()
+        relisted: set[str] = set()
+        stack = [str(root)]
+        with self._db:
+            while stack:
+                directory = stack.pop()
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except OSError:
+                    continue
+                seen.add(directory)
+                previous = known.get(directory)
+                if previous and previous[0] == mtime_ns:
+                    subdirs = previous[1]
+                else:
+                    subdirs = self._list(policy, root, directory, mtime_ns)
+                    relisted.add(directory)
+                if policy.recursive:
+                    stack.extend(d for d in subdirs if d not in nested)
+            gone = [(policy.name, d) for d in known if d not in seen]
+            if gone:
+                self._db.executemany(
+                    "DELETE FROM retention_dirs WHERE policy = ? AND path = ?", gone
+                )
+                self._db.executemany(
+                    "DELETE FROM retention_files WHERE policy = ? AND dir = ?", gone
+                )
+            if policy.max_bytes is not None:
+                self._restat(policy, relisted)
+        return len(relisted)
+
+    def _restat(self, policy: RetentionPolicy, relisted: set[str]) -> None:
+        """Update size and mtime of indexed files outside the re-listed directories."""
+        rows = self._db.execute(
+            "SELECT path, dir, size, mtime FROM retention_files WHERE policy = ?", (policy.name,)
+        ).fetchall()
+        changed: List[Tuple[int, float, str, str]] = []
+        gone: List[Tuple[str, str]] = []
+        for path, directory, size, mtime in rows:
+            if directory in relisted:
+                continue
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                gone.append((policy.name, path))
+                continue
+            except OSError:
+                continue
+            if st.st_size != size or st.st_mtime != mtime:
+                changed.append((st.st_size, st.st_mtime, policy.name, path))
+        self._db.executemany(
+            "UPDATE retention_files SET size = ?, mtime = ? WHERE policy = ? AND path = ?", changed
+        )
+        self._db.executemany("DELETE FROM retention_files WHERE policy = ? AND path = ?", gone)
+
+    def _list(
+        self, policy: RetentionPolicy, root: Path, directory: str, mtime_ns: int
+    ) -> List[str]:
+        rows: List[Tuple[str, str, str, int, float]] = []
+        subdirs: List[str] = []
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            entries = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    rel = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                    if any(fnmatch.fnmatchcase(rel, pat) for pat in policy.include):
+                        st = entry.stat(follow_symlinks=False)
+                        rows.append((policy.name, entry.path, directory, st.st_size, st.st_mtime))
+            except OSError:
+                continue
+        self._db.execute(
+            "DELETE FROM retention_files WHERE policy = ? AND dir = ?", (policy.name, directory)
+        )
+        self._db.executemany(
+            "INSERT OR REPLACE INTO retention_files (policy, path, dir, size, mtime) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        self._db.execute(
+            "INSERT OR REPLACE INTO retention_dirs (policy, path, mtime_ns, subdirs) "
+            "VALUES (?, ?, ?, ?)",
+            (policy.name, directory, mtime_ns, json.dumps(subdirs)),
+        )
+        return subdirs
+
+    # ------------------------------------------------------------------
+    # Selection and deletion
+    # ------------------------------------------------------------------
+    def _expiring(
+        self, policy: RetentionPolicy, max_age_days: float | None
+    ) -> Iterator[Tuple[str, int, float]]:
+        """Oldest-first files that break any limit; stops at the first one that doesn't."""
+        count, total = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM retention_files WHERE policy = ?",
+            (policy.name,),
+        ).fetchone()
+        cutoff = time.time() - max_age_days * _DAY if max_age_days is not None else None
+        cursor = self._db.execute(
+            "SELECT path, size, mtime FROM retention_files WHERE policy = ? ORDER BY mtime",
+            (policy.name,),
+        )
+        for path, size, mtime in cursor:
+            expired = (
+                (cutoff is not None and mtime < cutoff)
+                or (policy.max_files is not None and count > policy.max_files)
+                or (policy.max_bytes is not None and total > policy.max_bytes)
+            )
+            if not expired:
+                return
+            count -= 1
+            total -= size
+            yield path, size, mtime
+
+    def apply(
+        self,
+        policy: RetentionPolicy,
+        dry_run: bool = False,
+        max_age_days: float | None = None,
+    ) -> Dict[str, Any]:
+        """Refresh the index for ``policy`` and delete (or list) what expires.
+
+        ``max_age_days`` replaces the policy's age limit when it has one.
+        """
+        start = time.perf_counter()
+        age = policy.max_age_days
+        if age is not None and max_age_days is not None:
+            age = max_age_days
+        with self._lock:
+            listed = self.refresh(policy)
+            candidates = list(self._expiring(policy, age))
+            deleted = reclaimed = 0
+            kept: List[Tuple[str, str]] = []
+            batch_size = max(settings.retention_batch_size, 1)
+            for offset in range(0, len(candidates), batch_size):
+                batch = candidates[offset:offset + batch_size]
+                removed: List[Tuple[str, str]] = []
+                batch_deleted = batch_reclaimed = 0
+                for path, size, mtime in batch:
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        removed.append((policy.name, path))
+                        continue
+                    if st.st_mtime != mtime:
+                        # Rewritten since indexed: re-evaluate on the next run
+                        kept.append((policy.name, os.path.dirname(path)))
+                        continue
+                    if not dry_run:
+                        try:
+                            os.unlink(path)
+                        except OSError as exc:
+                            logger.warning("Retention could not delete %s: %s", path, exc)
+                            continue
+                        removed.append((policy.name, path))
+                    batch_deleted += 1
+                    batch_reclaimed += st.st_size
+                deleted += batch_deleted
+                reclaimed += batch_reclaimed
+                if removed:
+                    with self._db:
+                        self._db.executemany(
+                            "DELETE FROM retention_files WHERE policy = ? AND path = ?", removed
+                        )
+                        if batch_deleted:
+                            self._db.execute(
+                                _ADD_TOTALS, (policy.name, 0, batch_deleted, batch_reclaimed)
+                            )
+            if kept:
+                # Force a re-list of their directories so size and mtime are current
+                with self._db:
+                    self._db.executemany(
+                        "UPDATE retention_dirs SET mtime_ns = -1 WHERE policy = ? AND path = ?",
+                        kept,
+                    )
+            if not dry_run:
+                with self._db:
+                    self._db.execute(_ADD_TOTALS, (policy.name, 1, 0, 0))
+        return {
+            "policy": policy.name,
+            "dry_run": dry_run,
+            "files_deleted": deleted,
+            "bytes_reclaimed": reclaimed,
+            "dirs_listed": listed,
+            "elapsed_ms": round(1000 * (time.perf_counter() - start), 3),
+        }
+
+    def run(
+        self,
+        names: List[str] | None = None,
+        dry_run: bool = False,
+        max_age_days: float | None = None,
+    ) -> List[Dict[str, Any]]:
+        """Apply the named policies (all by default) and return one report each."""
+        unknown = set(names or []) - set(self.policies)
+        if unknown:
+            raise ValueError(f"Unknown retention policies: {', '.join(sorted(unknown))}")
+        reports = []
+        for name in names or list(self.policies):
+            report = self.apply(self.policies[name], dry_run, max_age_days)
+            logger.info(
+                "Retention %s: %d files, %d bytes%s",
+                name, report["files_deleted"], report["bytes_reclaimed"],
+                " (dry run)" if dry_run else "",
+            )
+            reports.append(report)
+        return reports
+
+    def stats(self) -> Dict[str, Any]:
+        """Current footprint and lifetime totals per policy."""
+        usage = {
+            policy: {"files": files, "bytes": size}
+            for policy, files, size in self._db.execute(
+                "SELECT policy, COUNT(*), COALESCE(SUM(size), 0) "
+                "FROM retention_files GROUP BY policy"
+            )
+        }
+        totals = {
+            policy: {"runs": runs, "files_deleted": files, "bytes_reclaimed": size}
+            for policy, runs, files, size in self._db.execute(
+                "SELECT policy, runs, files_deleted, bytes_reclaimed FROM retention_totals"
+            )
+        }
+        return {
+            name: {
+                **asdict(policy),
+                **usage.get(name, {"files": 0, "bytes": 0}),
+                **totals.get(name, {"runs": 0, "files_deleted": 0, "bytes_reclaimed": 0}),
+            }
+            for name, policy in self.policies.items()
+        }
+
+
+_engine: RetentionEngine | None = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> RetentionEngine:
+    """Process-wide engine, created on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RetentionEngine()
+        return _engine
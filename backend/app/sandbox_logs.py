@@ -0,0 +1,329 @@
+"""Compressed, job-indexed storage for sandbox container logs.
+
+Logs are written while the container runs: output is buffered up to
+``SANDBOX_LOG_CHUNK_SIZE`` bytes, compressed as an independent zstd frame
+(when ``zstandard`` is installed) or gzip member and appended to
+``<job_id>.log.zst`` / ``<job_id>.log.gz``. Concatenated frames are still a
+valid stream, so ``zstdcat`` / ``zcat`` read a whole log. A SQLite index
+records the raw and compressed offsets and newline count of every chunk, so a
+tail or byte-range read decompresses only the chunks it touches. Each job is
+capped at ``SANDBOX_LOG_MAX_BYTES`` and the store keeps at most
+``SANDBOX_LOG_KEEP_JOBS`` jobs, ``SANDBOX_LOG_MAX_TOTAL_BYTES`` on disk and
+``SANDBOX_LOG_MAX_AGE_DAYS`` of history.
+"""
+from __future__ import annotations
+
+import gzip
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Callable, Dict, List, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sandbox_logs (
+    job_id TEXT PRIMARY KEY,
+    task TEXT,
+    codec TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL,
+    raw_bytes INTEGER NOT NULL DEFAULT 0,
+    stored_bytes INTEGER NOT NULL DEFAULT 0,
+    lines INTEGER NOT NULL DEFAULT 0,
+    truncated_bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sandbox_logs_started ON sandbox_logs (started);
+CREATE TABLE IF NOT EXISTS sandbox_log_chunks (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    raw_offset INTEGER NOT NULL,
+    raw_len INTEGER NOT NULL,
+    file_offset INTEGER NOT NULL,
+    stored_len INTEGER NOT NULL,
+    lines INTEGER NOT NULL,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+"""
+
+_JOB_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Largest decompressed span a single range read may return
+MAX_READ = 4 * 1024 * 1024
+
+
+class LogNotFound(KeyError):
+    """No log is stored for the job id."""
+
+
+def _codec(name: str) -> Tuple[str, Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    """``(name, compress, decompress)``; ``auto`` prefers zstd when installed."""
+    if name in ("auto", "zstd"):
+        try:
+            import zstandard
+        except ImportError:
+            if name == "zstd":
+                raise RuntimeError("SANDBOX_LOG_CODEC=zstd requires the zstandard package") from None
+        else:
+            compressor = zstandard.ZstdCompressor(level=3)
+            decompressor = zstandard.ZstdDecompressor()
+            return "zstd", compressor.compress, decompressor.decompress
+    return "gzip", lambda data: gzip.compress(data, compresslevel=6, mtime=0), gzip.decompress
+
+
+class LogWriter:
+    """Chunked, compressed writer for one job; use as a context manager."""
+
+    def __init__(
+        self, store: "SandboxLogStore", job_id: str, path: Path, compress: Callable[[bytes], bytes]
+    ) -> None:
+        self.store = store
+        self.job_id = job_id
+        self._compress = compress
+        self._file = open(path, "ab")
+        self._buffer = bytearray()
+        self._seq = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.lines = 0
+        self.truncated_bytes = 0
+        self.status = "completed"
+
+    def write(self, data: bytes | str) -> None:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        room = settings.sandbox_log_max_bytes - self.raw_bytes - len(self._buffer)
+        if len(data) > room:
+            self.truncated_bytes += len(data) - max(room, 0)
+            data = data[:max(room, 0)]
+        self._buffer += data
+        if len(self._buffer) >= settings.sandbox_log_chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        raw = bytes(self._buffer)
+        self._buffer.clear()
+        stored = self._compress(raw)
+        offset = self._file.tell()
+        self._file.write(stored)
+        self._file.flush()
+        lines = raw.count(b"\n")
+        self.store._add_chunk(
+            self.job_id,
+            (self._seq, self.raw_bytes, len(raw), offset, len(stored), lines),
+        )
+        self._seq += 1
+        self.raw_bytes += len(raw)
+        self.stored_bytes += len(stored)
+        self.lines += lines
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+            self.store._finish(self)
+
+    def __enter__(self) -> "LogWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if exc_type is not None:
+            self.status = "failed"
+        self.close()
+
+
+class SandboxLogStore:
+    """Per-job compressed logs with an offset index and bounded retention."""
+
+    def __init__(self, root: str | Path | None = None, db_path: str | Path | None = None) -> None:
+        self.root = Path(root or Path(settings.logs_dir) / "sandbox")
+        self.root.mkdir(parents=True, exist_ok=True)
+        db_path = Path(db_path or settings.sandbox_logs_db)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.codec, self._compress, self._decompress = _codec(settings.sandbox_log_codec)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def open(self, job_id: str, task: str | None = None) -> LogWriter:
+        """Start the log of ``job_id``; an existing log of that job is replaced."""
+        if not _JOB_RE.match(job_id):
+            raise ValueError("Invalid job id")
+        self.delete(job_id)
+        suffix = "zst" if self.codec == "zstd" else "gz"
+        path = self.root / f"{job_id}.log.{suffix}"
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO sandbox_logs (job_id, task, codec, path, status, started) "
+                "VALUES (?, ?, ?, ?, 'running', ?)",
+                (job_id, task, self.codec, str(path), time.time()),
+            )
+        return LogWriter(self, job_id, path, self._compress)
+
+    def _add_chunk(self, job_id: str, row: Tuple[int, int, int, int, int, int]) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO sandbox_log_chunks "
+                "(job_id, seq, raw_offset, raw_len, file_offset, stored_len, lines) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, *row),
+            )
+
+    def _finish(self, writer: LogWriter) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE sandbox_logs SET status = ?, finished = ?, raw_bytes = ?, "
+                "stored_bytes = ?, lines = ?, truncated_bytes = ? WHERE job_id = ?",
+                (
+                    writer.status,
+                    time.time(),
+                    writer.raw_bytes,
+                    writer.stored_bytes,
+                    writer.lines,
+                    writer.truncated_bytes,
+                    writer.job_id,
+                ),
+            )
+        self.apply_retention()
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def info(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM sandbox_logs WHERE job_id = ?", (job_id,))
+            row = cursor.fetchone()
+            if row is None:
+                raise LogNotFound(job_id)
+            names = [c[0] for c in cursor.description]
+        info = dict(zip(names, row))
+        info.pop("path")
+        return info
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            cursor = self._db.execute(
+                "SELECT job_id, task, status, started, finished, raw_bytes, stored_bytes, lines "
+                "FROM sandbox_logs ORDER BY started DESC LIMIT ?",
+                (limit,),
+            )
+            names = [c[0] for c in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def _chunks(
+        self, job_id: str, where: str = "", params: Tuple = ()
+    ) -> Tuple[Path, str, List[Tuple]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, codec FROM sandbox_logs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                raise LogNotFound(job_id)
+            chunks = self._db.execute(
+                "SELECT raw_offset, raw_len, file_offset, stored_len, lines "
+                f"FROM sandbox_log_chunks WHERE job_id = ? {where} ORDER BY seq",
+                (job_id, *params),
+            ).fetchall()
+        return Path(row[0]), row[1], chunks
+
+    def _inflate(self, path: Path, codec: str, chunks: List[Tuple]) -> bytes:
+        decompress = self._decompress if codec == self.codec else _codec(codec)[2]
+        parts = []
+        with open(path, "rb") as f:
+            for _raw_offset, _raw_len, file_offset, stored_len, _lines in chunks:
+                f.seek(file_offset)
+                parts.append(decompress(f.read(stored_len)))
+        return b"".join(parts)
+
+    def read_range(self, job_id: str, start: int = 0, end: int | None = None) -> bytes:
+        """Raw log bytes ``[start, end)``; only overlapping chunks are decompressed."""
+        end = start + MAX_READ if end is None else min(end, start + MAX_READ)
+        if start < 0 or end <= start:
+            return b""
+        path, codec, chunks = self._chunks(
+            job_id, "AND raw_offset < ? AND raw_offset + raw_len > ?", (end, start)
+        )
+        if not chunks:
+            return b""
+        data = self._inflate(path, codec, chunks)
+        base = chunks[0][0]
+        return data[start - base:end - base]
+
+    def tail(self, job_id: str, lines: int = 100) -> List[str]:
+        """Last ``lines`` lines, decompressing chunks from the end until enough are found."""
+        path, codec, chunks = self._chunks(job_id)
+        needed: List[Tuple] = []
+        newlines = 0
+        for chunk in reversed(chunks):
+            needed.append(chunk)
+            newlines += chunk[4]
+            # One extra newline marks where the first wanted line starts
+            if newlines > lines or sum(c[1] for c in needed) >= MAX_READ:
+                break
+        needed.reverse()
+        text = self._inflate(path, codec, needed).decode("utf-8", errors="replace")
+        return text.splitlines()[-lines:] if lines > 0 else []
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+    def delete(self, job_id: str) -> bool:
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT path FROM sandbox_logs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            self._db.execute("DELETE FROM sandbox_log_chunks WHERE job_id = ?", (job_id,))
+            self._db.execute("DELETE FROM sandbox_logs WHERE job_id = ?", (job_id,))
+        if row is None:
+            return False
+        Path(row[0]).unlink(missing_ok=True)
+        return True
+
+    def apply_retention(self) -> int:
+        """Drop the oldest finished jobs beyond the count, size and age limits."""
+        cutoff = time.time() - settings.sandbox_log_max_age_days * 86400
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT job_id, started, stored_bytes FROM sandbox_logs "
+                "WHERE status != 'running' ORDER BY started DESC"
+            ).fetchall()
+        expired = []
+        total = 0
+        for kept, (job_id, started, stored) in enumerate(rows):
+            total += stored
+            if (
+                kept >= settings.sandbox_log_keep_jobs
+                or total > settings.sandbox_log_max_total_bytes
+                or started < cutoff
+            ):
+                expired.append(job_id)
+        for job_id in expired:
+            self.delete(job_id)
+        if expired:
+            logger.info("Sandbox log retention removed %d jobs", len(expired))
+        return len(expired)
+
+
+sandbox_logs = SandboxLogStore()
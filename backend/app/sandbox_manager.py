@@ -1,16 +1,13 @@
 """Sandbox manager to execute tasks in ephemeral Docker containers."""
 from __future__ import annotations
 
-from datetime import datetime
 import uuid
-from pathlib import Path
 import logging
-import asyncio
-
-import docker
 
 from .config import settings
-from .ws_manager import ws_manager
+from .event_bus import event_bus
+from .metrics import timed
+from .sandbox_logs import sandbox_logs
 
 logger = logging.getLogger(__name__)
 
@@ -19,23 +16,38 @@ class SandboxManager:
     """Launches ephemeral containers to run tasks in isolation."""
 
     def __init__(self) -> None:
+        import docker  # Deferred: only processes that run sandboxes pay the import
+
         self.client = docker.from_env()
         self.image = settings.sandbox_image
-        self.logs_dir = Path(settings.logs_dir) / "sandbox"
-        self.logs_dir.mkdir(parents=True, exist_ok=True)
 
-    def run_task(self, task: str) -> list[str]:
+    @timed("sandbox")
+    def run_task(self, task: str, job_id: str | None = None) -> list[str]:
         """Run a simple script inside a temporary container.
 
+        Container output is streamed into :data:`sandbox_logs` under ``job_id``
+        (a new id when omitted) while the container runs.
+
         Parameters
         ----------
         task: str
             High-level task description that will be echoed inside the container.
+        job_id: str | None
+            Key of the stored log, e.g. the id returned to the API caller.
         """
+        from docker.errors import DockerException
+
         progress: list[str] = []
-        log_file = self.logs_dir / f"{datetime.utcnow().isoformat()}_{uuid.uuid4().hex}.log"
-        progress.append("🧪 Iniciando entorno de pruebas...")
-        asyncio.run(ws_manager.broadcast("🧪 Iniciando entorno de pruebas..."))
+        run_id = job_id or uuid.uuid4().hex
+
+        def report(message: str) -> None:
+            progress.append(message)
+            event_bus.publish(
+                f"sandbox:{run_id}",
+                {"type": "sandbox_progress", "sandbox_id": run_id, "message": message},
+            )
+
+        report("🧪 Iniciando entorno de pruebas...")
         container = None
         try:
             container = self.client.containers.run(
@@ -44,17 +56,17 @@ class SandboxManager:
                 detach=True,
                 tty=True,
             )
-            progress.append("🔧 Ejecutando tarea en sandbox...")
-            asyncio.run(ws_manager.broadcast("🔧 Ejecutando tarea en sandbox..."))
-            result = container.wait()
-            logs = container.logs().decode()
-            log_file.write_text(logs)
-            progress.append("✅ Tarea completada")
-            asyncio.run(ws_manager.broadcast("✅ Tarea completada"))
-        except docker.errors.DockerException as exc:
+            report("🔧 Ejecutando tarea en sandbox...")
+            with sandbox_logs.open(run_id, task) as log:
+                for chunk in container.logs(stream=True, follow=True):
+                    log.write(chunk)
+                result = container.wait()
+                if result.get("StatusCode"):
+                    log.status = "failed"
+            report("✅ Tarea completada")
+        except DockerException as exc:
             msg = f"Error de sandbox: {exc}"
-            progress.append(f"❌ {msg}")
-            asyncio.run(ws_manager.broadcast(f"❌ {msg}"))
+            report(f"❌ {msg}")
             logger.error(msg)
         finally:
             if container is not None:
@@ -1,25 +1,241 @@
-from __future__ import annotations
+"""Agent activation scheduler.
 
-from datetime import datetime
+Upcoming activations live in a min-heap keyed by due time and a single thread
+sleeps on a condition variable until exactly the earliest one is due, so an
+activation fires on time and each tick only touches due entries. Schedules are
+persisted in SQLite and reloaded on start. Every uvicorn worker keeps its own
+heap over the shared database, so a due entry is claimed by deleting its row
+with the expected time first: only the worker whose delete succeeds fires it,
+and entries that were rescheduled or cancelled elsewhere are skipped. With
+``SCHEDULER_MODE=celery`` no
+thread runs: every activation is sent as a Celery task with an ETA and the
+task id is kept so rescheduling can revoke it.
+"""
+from __future__ import annotations
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+import heapq
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
 
 from .agent_manager import manager
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agent_schedules (
+    name TEXT PRIMARY KEY,
+    run_at REAL NOT NULL,
+    task_id TEXT
+) WITHOUT ROWID;
+"""
+
+
+def _timestamp(when: datetime) -> float:
+    """Epoch seconds for ``when``; naive datetimes are taken as UTC."""
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when.timestamp()
+
+
+def _activate(name: str) -> None:
+    manager.update(name, active=True, scheduled=None)
+
+
+class ActivationScheduler:
+    """Fire ``on_due(name)`` for each agent when its activation time arrives."""
+
+    def __init__(
+        self,
+        db_path: str | Path | None = None,
+        on_due: Callable[[str], None] = _activate,
+        mode: str | None = None,
+    ) -> None:
+        self.db_path = Path(db_path or settings.schedules_db)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.on_due = on_due
+        self.mode = mode or settings.scheduler_mode
+        self._heap: List[Tuple[float, int, str]] = []
+        # name -> sequence number of its live heap entry; older entries are stale
+        self._live: Dict[str, int] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self._db = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self.fired = 0
+        self.lateness_max = 0.0
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+    def schedule(self, name: str, when: datetime) -> None:
+        """Schedule (or reschedule) the activation of ``name``."""
+        self.schedule_many([(name, when)])
+
+    def schedule_many(self, items: Iterable[Tuple[str, datetime]]) -> None:
+        rows = [(name, _timestamp(when)) for name, when in items]
+        self.cancel_many([name for name, _ in rows])
+        if self.mode == "celery":
+            with self._cond:
+                self._dispatch_celery(rows)
+            return
+        with self._cond:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO agent_schedules (name, run_at) VALUES (?, ?)", rows
+                )
+            earliest = self._heap[0][0] if self._heap else float("inf")
+            for name, run_at in rows:
+                self._push(name, run_at)
+            if rows and min(r[1] for r in rows) < earliest:
+                self._cond.notify()
 
-scheduler = AsyncIOScheduler()
+    def cancel(self, name: str) -> None:
+        """Drop the pending activation of ``name``, if any."""
+        self.cancel_many([name])
 
+    def cancel_many(self, names: List[str]) -> None:
+        task_ids: List[str] = []
+        with self._cond:
+            with self._db:
+                for name in names:
+                    row = self._db.execute(
+                        "SELECT task_id FROM agent_schedules WHERE name = ?", (name,)
+                    ).fetchone()
+                    if row and row[0]:
+                        task_ids.append(row[0])
+                self._db.executemany(
+                    "DELETE FROM agent_schedules WHERE name = ?", [(name,) for name in names]
+                )
+            for name in names:
+                self._live.pop(name, None)
+        for task_id in task_ids:
+            self._revoke(task_id)
 
-def _check_schedules() -> None:
-    """Activate agents whose scheduled time has arrived."""
-    now = datetime.utcnow()
-    for agent in manager._agents.values():
-        if agent.scheduled and not agent.active and agent.scheduled <= now:
-            agent.active = True
-            agent.scheduled = None
+    def pending(self) -> int:
+        return len(self._live)
+
+    def _push(self, name: str, run_at: float) -> None:
+        seq = next(self._seq)
+        self._live[name] = seq
+        heapq.heappush(self._heap, (run_at, seq, name))
+        # Rebuild once stale entries dominate so rescheduling cannot grow the heap unboundedly
+        if len(self._heap) > 2 * len(self._live) + 1024:
+            self._heap = [e for e in self._heap if self._live.get(e[2]) == e[1]]
+            heapq.heapify(self._heap)
+
+    # ------------------------------------------------------------------
+    # Celery mode
+    # ------------------------------------------------------------------
+    def _dispatch_celery(self, rows: List[Tuple[str, float]]) -> None:
+        from .celery_app import activate_agent
+
+        for name, run_at in rows:
+            eta = datetime.fromtimestamp(run_at, tz=timezone.utc)
+            result = activate_agent.apply_async(args=[name], eta=eta)
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO agent_schedules (name, run_at, task_id) VALUES (?, ?, ?)",
+                    (name, run_at, result.id),
+                )
+
+    @staticmethod
+    def _revoke(task_id: str) -> None:
+        from .celery_app import celery_app
+
+        try:
+            celery_app.control.revoke(task_id)
+        except Exception as exc:  # pragma: no cover - broker unavailable
+            logger.warning("Could not revoke activation task %s: %s", task_id, exc)
+
+    # ------------------------------------------------------------------
+    # In-process mode
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """Reload persisted schedules and start the wake-up thread."""
+        if self.mode == "celery" or self._thread is not None:
+            return
+        with self._cond:
+            rows = self._db.execute("SELECT name, run_at FROM agent_schedules").fetchall()
+            self._live = {}
+            self._heap = []
+            for name, run_at in rows:
+                seq = next(self._seq)
+                self._live[name] = seq
+                self._heap.append((run_at, seq, name))
+            heapq.heapify(self._heap)
+            self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="agent-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                due = self._pop_due()
+                while not due and not self._stopping:
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._cond.wait(timeout)
+                    due = self._pop_due()
+                if self._stopping:
+                    return
+                # Claim each entry: another worker may have fired, moved or
+                # cancelled it, in which case its row no longer matches
+                with self._db:
+                    due = [
+                        (run_at, name)
+                        for run_at, name in due
+                        if self._db.execute(
+                            "DELETE FROM agent_schedules WHERE name = ? AND run_at = ?",
+                            (name, run_at),
+                        ).rowcount
+                        == 1
+                    ]
+            now = time.time()
+            for run_at, name in due:
+                self.lateness_max = max(self.lateness_max, now - run_at)
+                try:
+                    self.on_due(name)
+                except Exception:
+                    logger.exception("Scheduled activation of %s failed", name)
+            self.fired += len(due)
+
+    def _pop_due(self) -> List[Tuple[float, str]]:
+        """Pop every live entry whose time has come; caller holds the lock."""
+        now = time.time()
+        due: List[Tuple[float, str]] = []
+        while self._heap and self._heap[0][0] <= now:
+            run_at, seq, name = heapq.heappop(self._heap)
+            if self._live.get(name) == seq:
+                del self._live[name]
+                due.append((run_at, name))
+        return due
+
+
+activation_scheduler = ActivationScheduler()
 
 
 def start_scheduler() -> None:
     """Start the background scheduler."""
-    scheduler.add_job(_check_schedules, "interval", seconds=60, id="agent_scheduler")
-    scheduler.start()
+    activation_scheduler.start()
+
 
+def stop_scheduler() -> None:
+    activation_scheduler.stop()
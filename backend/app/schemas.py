@@ -1,5 +1,6 @@
+import uuid
 from datetime import datetime
-from typing import Literal
+from typing import Any, Literal
 
 from pydantic import BaseModel, Field, EmailStr
 
@@ -16,6 +17,9 @@ class AgentToggle(BaseModel):
 
     name: str
     active: bool
+    version: int | None = Field(
+        None, description="Version last read by the client; the toggle fails with 409 if it changed"
+    )
 
 
 class AgentSchedule(BaseModel):
@@ -32,12 +36,40 @@ class AgentState(BaseModel):
     description: str = ""
     active: bool = True
     scheduled: datetime | None = None
+    version: int = 0
 
 
 class WebIntelligenceRequest(BaseModel):
     """Request schema for web intelligence module."""
 
     query: str
+    count: int = Field(3, ge=1, le=20)
+
+
+class WebIntelligenceBatchRequest(BaseModel):
+    """Several web intelligence queries answered concurrently."""
+
+    queries: list[str] = Field(..., min_length=1, max_length=20)
+    count: int = Field(3, ge=1, le=20)
+
+
+class CrawlRequest(BaseModel):
+    """Batch of pages to fetch and convert to text."""
+
+    urls: list[str] = Field(..., min_length=1, max_length=100)
+
+
+class FinancialModelRequest(BaseModel):
+    """Scenario analysis over parameter grids or Monte Carlo draws."""
+
+    parameters: dict[str, Any] = Field(
+        ..., description="Numbers, lists or distributions such as {'dist': 'normal', 'mean': 1, 'std': 0.1}"
+    )
+    years: int = Field(5, ge=1, le=100)
+    mode: Literal["grid", "monte_carlo"] | None = None
+    samples: int = Field(10_000, ge=1)
+    seed: int | None = None
+    percentiles: list[float] = Field(default_factory=lambda: [5, 25, 50, 75, 95])
 
 
 class FileSyncRequest(BaseModel):
@@ -49,13 +81,27 @@ class FileSyncRequest(BaseModel):
     )
 
 
+class RetentionRunRequest(BaseModel):
+    """Apply retention policies to the backup, chat, voice, log and cache trees."""
+
+    policies: list[str] | None = Field(None, description="Policy names; all when omitted")
+    dry_run: bool = Field(True, description="Report what would be deleted without deleting")
+    max_age_days: float | None = Field(
+        None, gt=0, description="Replace the age limit of policies that have one"
+    )
+
+
 class CloudFileRequest(BaseModel):
     """Interact with cloud storage providers."""
 
     action: Literal["upload", "list"]
     file_path: str | None = Field(
-        None, description="Local file path required for upload actions"
+        None, description="Local file or directory to upload; unchanged files are skipped"
+    )
+    paths: list[str] = Field(
+        default_factory=list, description="Further files or directories to upload"
     )
+    concurrency: int | None = Field(None, ge=1, le=32, description="Parallel uploads")
 
 
 class VoiceProcessRequest(BaseModel):
@@ -83,6 +129,10 @@ class VoiceNote(BaseModel):
     id: str
     content: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    status: Literal["pending", "transcribed", "completed", "failed"] | None = None
+    analysis_id: str | None = None
+    transcript: str | None = None
+    analysis: str | None = None
 
 
 class VoiceNoteCreate(BaseModel):
@@ -122,12 +172,17 @@ class AgendaItemUpdate(BaseModel):
 class ChatMessage(BaseModel):
     """Single chat message entry."""
 
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     role: str
     content: str
     media_url: str | None = Field(
         None, description="URL to audio or video media that should be transcribed",
     )
     transcript: str | None = None
+    transcript_id: str | None = Field(
+        None, description="Pending transcription id, also sent in the WebSocket event"
+    )
+    transcript_status: Literal["pending", "completed", "failed"] | None = None
     attachment_name: str | None = Field(
         None, description="Optional filename for an attached .zip file"
     )
@@ -162,6 +217,9 @@ class LLMChatRequest(BaseModel):
     """Request schema for the generic LLM chat endpoint."""
 
     messages: list[LLMChatMessage] = Field(..., min_items=1)
+    project_id: str | None = Field(
+        None, description="Project whose rolling conversation summary should be reused"
+    )
 
 
 class UserRegister(BaseModel):
@@ -183,12 +241,18 @@ class SandboxRunRequest(BaseModel):
     """Request to execute a task inside the sandbox.""" 
 
     task: str = Field(..., description="Descripción de la tarea a ejecutar")
+    sandbox_id: str | None = Field(
+        None,
+        pattern=r"^[A-Za-z0-9_-]{1,64}$",
+        description="Id chosen by the client so it can subscribe to sandbox:<id> before the run starts",
+    )
 
 
 class SandboxRunResponse(BaseModel):
     """Progress logs from the sandbox run."""
 
     logs: list[str] = Field(default_factory=list)
+    job_id: str | None = Field(None, description="Key of the stored container log")
 
 
 class PlanGenerateRequest(BaseModel):
@@ -215,6 +279,40 @@ class ImplementationPlan(BaseModel):
     cost: str
     roi: str
     steps: list[PlanStep]
+    status: str | None = Field(None, description="pending, in_progress, completed or error")
+    created_at: datetime | None = None
+
+
+class PlanSummary(BaseModel):
+    """Listing entry for a stored plan."""
+
+    id: str
+    title: str
+    status: str
+    created_at: datetime
+    updated_at: datetime
+    step_count: int
+    completed_steps: int
+
+
+class PlanListResponse(BaseModel):
+    """Page of stored plans, newest first."""
+
+    items: list[PlanSummary] = Field(default_factory=list)
+    total: int
+    limit: int
+    offset: int
+
+
+class PlanJob(BaseModel):
+    """Status of a background plan generation job."""
+
+    job_id: str | None = None
+    status: Literal["pending", "running", "completed", "failed", "cancelled"]
+    cached: bool = False
+    round: int | None = Field(None, description="Last group-chat round streamed")
+    plan: ImplementationPlan | None = None
+    error: str | None = None
 
 
 class StepUpdate(BaseModel):
@@ -246,3 +344,30 @@ class LLMUploadResponse(BaseModel):
     """Response after uploading a model file."""
 
     path: str
+
+
+class LocalModel(BaseModel):
+    """GGUF model file available in the models directory."""
+
+    name: str
+    path: str
+    size: int
+    quantization: str | None = None
+    architecture: str | None = None
+    sha256: str | None = None
+    active: bool = False
+    stats: dict[str, float | int | None] = Field(default_factory=dict)
+
+
+class ModelActivateRequest(BaseModel):
+    """Select the local model that should serve traffic."""
+
+    name: str = Field(..., description="File name of a .gguf model in the models directory")
+
+
+class ModelActivateResponse(BaseModel):
+    """Result of a model hot swap."""
+
+    model: str
+    endpoint: str
+    managed: bool
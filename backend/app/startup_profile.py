@@ -0,0 +1,97 @@
+"""Import-time breakdown of the backend entry points.
+
+Runs ``python -X importtime`` in a fresh interpreter and aggregates the
+per-module timings by top-level package, so regressions in cold start and
+worker respawn time are easy to spot::
+
+    python -m app.startup_profile                 # API (app.main)
+    python -m app.startup_profile app.celery_app  # Celery worker
+    python -m app.startup_profile --json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+_LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_import(module: str) -> Dict[str, Any]:
+    """Import ``module`` in a subprocess and return its import-time breakdown."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    modules: List[Dict[str, Any]] = []
+    packages: Dict[str, int] = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules.append(
+            {
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": len(indent) // 2,
+            }
+        )
+        packages[name.split(".", 1)[0]] += int(self_us)
+    errors = [l for l in proc.stderr.splitlines() if l and not l.startswith("import time:")]
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "wall_ms": round(wall * 1000, 1),
+        "import_ms": round(sum(m["self_ms"] for m in modules), 1),
+        "packages": sorted(
+            ({"package": k, "self_ms": v / 1000} for k, v in packages.items()),
+            key=lambda p: p["self_ms"],
+            reverse=True,
+        ),
+        "slowest": sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True),
+        "errors": errors[-5:],
+    }
+
+
+def _print_report(report: Dict[str, Any], top: int) -> None:
+    print(f"Import of {report['module']}: {report['import_ms']:.1f} ms imports, "
+          f"{report['wall_ms']:.1f} ms interpreter wall time")
+    if not report["ok"]:
+        print("Import failed:\n  " + "\n  ".join(report["errors"]))
+    print("\nBy top-level package (self time):")
+    for pkg in report["packages"][:top]:
+        print(f"  {pkg['self_ms']:9.1f} ms  {pkg['package']}")
+    print("\nSlowest modules (cumulative):")
+    for mod in report["slowest"][:top]:
+        print(f"  {mod['cumulative_ms']:9.1f} ms  {mod['module']}")
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=["app.main"])
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Emit the full report as JSON")
+    args = parser.parse_args(argv)
+    reports = [profile_import(m) for m in args.modules]
+    if args.json:
+        json.dump(reports, sys.stdout, indent=2)
+        print()
+    else:
+        for report in reports:
+            _print_report(report, args.top)
+            print()
+    return 0 if all(r["ok"] for r in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,14 @@
 import json
+import os
+import shutil
 import subprocess
 import tempfile
 from pathlib import Path
 
+import httpx
+
 from .config import settings
+from .metrics import timed
 
 AUDIO_VIDEO_EXTS = {
     ".wav",
@@ -17,26 +22,62 @@ AUDIO_VIDEO_EXTS = {
     ".webm",
 }
 
+@timed("transcription")
 def transcribe_file(path: Path) -> str:
     """Transcribe an audio or video file using whisper.cpp."""
     suffix = path.suffix.lower()
-    src = path
-    if suffix not in {".wav", ".mp3"}:
-        tmp_dir = tempfile.mkdtemp()
-        wav_path = Path(tmp_dir) / "audio.wav"
-        subprocess.run(
-            ["ffmpeg", "-y", "-i", str(path), str(wav_path)],
-            check=True,
-            capture_output=True,
-        )
-        src = wav_path
-    cmd = [
-        settings.whisper_cpp_bin,
-        "-m",
-        settings.whisper_cpp_model,
-        str(src),
-        "--output-json",
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    tmp_dir = tempfile.mkdtemp() if suffix not in {".wav", ".mp3"} else None
+    try:
+        src = path
+        if tmp_dir is not None:
+            wav_path = Path(tmp_dir) / "audio.wav"
+            subprocess.run(
+                ["ffmpeg", "-y", "-i", str(path), str(wav_path)],
+                check=True,
+                capture_output=True,
+            )
+            src = wav_path
+        cmd = [
+            settings.whisper_cpp_bin,
+            "-m",
+            settings.whisper_cpp_model,
+            "-t",
+            str(_threads()),
+            str(src),
+            "--output-json",
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
     data = json.loads(result.stdout)
     return " ".join(seg.get("text", "").strip() for seg in data.get("segments", []))
+
+
+def _threads() -> int:
+    """whisper.cpp threads: configured, else the CPUs this process is pinned to."""
+    if settings.whisper_threads > 0:
+        return settings.whisper_threads
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not Linux
+        return os.cpu_count() or 1
+
+
+def transcribe_source(source: str) -> str:
+    """Transcribe a local path or an http(s) URL, streaming downloads to disk."""
+    if not source.startswith(("http://", "https://")):
+        return transcribe_file(Path(source))
+    suffix = Path(httpx.URL(source).path).suffix
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        media = Path(tmp_dir) / f"media{suffix}"
+        received = 0
+        with httpx.stream("GET", source, timeout=30.0, follow_redirects=True) as resp:
+            resp.raise_for_status()
+            with open(media, "wb") as f:
+                for chunk in resp.iter_bytes(1 << 16):
+                    received += len(chunk)
+                    if received > settings.media_max_bytes:
+                        raise ValueError(f"Media larger than {settings.media_max_bytes} bytes")
+                    f.write(chunk)
+        return transcribe_file(media)
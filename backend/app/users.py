@@ -4,6 +4,7 @@ from pathlib import Path
 import bcrypt
 from pydantic import BaseModel, EmailStr
 
+from .audit import log_event
 from .config import settings
 
 
@@ -39,11 +40,14 @@ def register_user(email: str, nickname: str, password: str) -> None:
     hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
     users.append(User(email=email, nickname=nickname, password_hash=hashed))
     _save_users(users)
+    log_event("Usuario registrado", user=email)
 
 
 def authenticate_user(email: str, password: str) -> bool:
     users = _load_users()
     for user in users:
         if user.email == email and bcrypt.checkpw(password.encode(), user.password_hash.encode()):
+            log_event("Inicio de sesión", user=email)
             return True
+    log_event("Inicio de sesión fallido", user=email)
     return False
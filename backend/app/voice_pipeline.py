@@ -0,0 +1,118 @@
+"""Voice input processing offloaded to Celery workers.
+
+``start`` stores the inputs, creates a pending voice note and returns at once;
+the media is transcribed on the ``transcription`` queue, then the Business
+Advisor analysis and sandbox run happen on the ``llm`` queue. Each stage
+writes its result back into the note and publishes an event on the
+``voice:<note_id>`` WebSocket topic.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import uuid
+from pathlib import Path
+from typing import Any, Dict
+
+import httpx
+
+from .config import settings
+from .progress import publish_progress
+from .transcriber import AUDIO_VIDEO_EXTS
+from .voice_notes import add_note, update_note
+
+_AGENT_PROFILE = Path(__file__).resolve().parents[2] / "agents" / "experts" / "business-advisor.json"
+
+
+def start(
+    media_path: str | None = None,
+    media_url: str | None = None,
+    media_base64: str | None = None,
+    media_filename: str | None = None,
+    zip_name: str | None = None,
+    zip_base64: str | None = None,
+) -> Dict[str, Any]:
+    """Persist the inputs and queue transcription plus analysis; returns the pending ids."""
+    from celery import chain
+
+    from .celery_app import analyze_voice_note, transcribe_voice_note
+
+    voice_dir = Path(settings.voice_agent_dir)
+    voice_dir.mkdir(parents=True, exist_ok=True)
+    stored: Dict[str, Any] = {}
+    if zip_base64 and zip_name:
+        zip_path = voice_dir / Path(zip_name).name
+        zip_path.write_bytes(base64.b64decode(zip_base64))
+        stored["zip_path"] = str(zip_path)
+
+    source = None
+    remove_source = False
+    if media_base64 and media_filename:
+        if _is_media(media_filename):
+            # Written to the shared voice directory (not /tmp) so workers can read it
+            media_dir = voice_dir / "media"
+            media_dir.mkdir(exist_ok=True)
+            media = media_dir / f"{uuid.uuid4().hex}{Path(media_filename).suffix}"
+            media.write_bytes(base64.b64decode(media_base64))
+            source, remove_source = str(media), True
+    elif media_url:
+        if _is_media(httpx.URL(media_url).path):
+            source = media_url
+    elif media_path and _is_media(media_path):
+        source = media_path
+
+    analysis_id = uuid.uuid4().hex
+    note = add_note("", status="pending", analysis_id=analysis_id)
+    # The transcript is prepended to these arguments (by the chain, or below)
+    analyze = analyze_voice_note.s(note["id"], stored.get("zip_path")).set(task_id=analysis_id)
+    if source is not None:
+        chain(
+            transcribe_voice_note.s(note["id"], source, remove_source),
+            analyze,
+        ).apply_async()
+    else:
+        analyze.apply_async(("",))
+    return {"status": "pending", "analysis_id": analysis_id, "note_id": note["id"], **stored}
+
+
+def _is_media(name: str) -> bool:
+    return Path(name).suffix.lower() in AUDIO_VIDEO_EXTS
+
+
+def notify(note_id: str, event: Dict[str, Any]) -> None:
+    publish_progress({**event, "note_id": note_id}, f"voice:{note_id}")
+
+
+def transcribed(note_id: str, transcript: str) -> None:
+    update_note(note_id, content=transcript, transcript=transcript, status="transcribed")
+    notify(note_id, {"type": "voice_transcript", "transcript": transcript})
+
+
+def failed(note_id: str, stage: str, error: str) -> None:
+    update_note(note_id, status="failed")
+    notify(note_id, {"type": "voice_failed", "stage": stage, "error": error})
+
+
+def analyze(transcript: str, zip_path: str | None = None) -> Dict[str, Any]:
+    """Ask the local LFM2-VL model for the Business Advisor analysis, then run the sandbox."""
+    from .sandbox_manager import SandboxManager
+
+    with open(_AGENT_PROFILE, "r", encoding="utf-8") as f:
+        agent_cfg = json.load(f)
+    messages = [{"role": "system", "content": agent_cfg.get("prompt", "")}]
+    if transcript:
+        messages.append({"role": "user", "content": transcript})
+    if zip_path:
+        messages.append({"role": "user", "content": f"Analiza el archivo {zip_path}"})
+
+    llm_resp = httpx.post(
+        settings.llm_openai_endpoint,
+        json={"model": "lfm2-vl-1.6b", "messages": messages},
+        timeout=settings.voice_analysis_timeout,
+    )
+    llm_resp.raise_for_status()
+    analysis = llm_resp.json()["choices"][0]["message"]["content"]
+
+    sandbox_job = uuid.uuid4().hex
+    logs = SandboxManager().run_task("Procesar entrada de voz", sandbox_job)
+    return {"analysis": analysis, "logs": logs, "sandbox_job_id": sandbox_job}
@@ -0,0 +1,241 @@
+"""Brave web search shared by the API, Celery and the agent tool.
+
+One pooled HTTP client, a TTL cache keyed by normalised query and result
+count (in memory, optionally mirrored in Redis so replicas share hits),
+single-flight coalescing so concurrent identical queries cost one upstream
+call, and a token bucket sized to the Brave plan's requests-per-second quota.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Tuple
+
+import httpx
+
+from .config import settings
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+Results = List[Dict[str, Any]]
+
+
+class SearchError(Exception):
+    """A search could not be served; ``status_code`` maps it to HTTP."""
+
+    def __init__(self, message: str, status_code: int = 502) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float) -> float:
+        """Take one token, waiting up to ``timeout``; return the time waited."""
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return now - start
+                wait = (1 - self._tokens) / self.rate
+            if now + wait - start > timeout:
+                raise SearchError("Search rate limit exceeded", status_code=429)
+            time.sleep(wait)
+
+    def penalize(self, seconds: float) -> None:
+        """Withhold tokens for ``seconds``, e.g. after the API answered 429."""
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.casefold().split())
+
+
+class WebIntelligenceService:
+    """Cached, rate-limited Brave search client."""
+
+    def __init__(self) -> None:
+        self._client: httpx.Client | None = None
+        self._client_lock = threading.Lock()
+        self._cache: "OrderedDict[str, Tuple[float, Results]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.bucket = TokenBucket(settings.brave_rate_per_second, settings.brave_burst)
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="web-search")
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream = 0
+        self.throttled_s = 0.0
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        base_url=settings.brave_api_url,
+                        timeout=settings.web_search_timeout,
+                        headers={"Accept": "application/json", "Accept-Encoding": "gzip"},
+                    )
+        return self._client
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def search(self, query: str, count: int = 3) -> Results:
+        """Return ``[{"title", "url"}, ...]`` for ``query``; raise :class:`SearchError`."""
+        if not settings.brave_api_key:
+            raise SearchError("BRAVE_API_KEY not configured", status_code=503)
+        key = f"{count}:{normalize_query(query)}"
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return flight.result()
+        try:
+            results = self._fetch(query, count)
+            self._cache_set(key, results)
+            flight.set_result(results)
+            return results
+        except Exception as exc:
+            flight.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def search_many(self, queries: Iterable[str], count: int = 3) -> Dict[str, Dict[str, Any]]:
+        """Run several searches concurrently; each maps to results or an error."""
+        unique = list(dict.fromkeys(queries))
+        futures = {q: self._pool.submit(self.search, q, count) for q in unique}
+        out: Dict[str, Dict[str, Any]] = {}
+        for query, future in futures.items():
+            try:
+                out[query] = {"results": future.result()}
+            except SearchError as exc:
+                out[query] = {"error": str(exc), "status_code": exc.status_code}
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "upstream": self.upstream,
+            "cached": len(self._cache),
+            "throttled_s": round(self.throttled_s, 3),
+        }
+
+    # ------------------------------------------------------------------
+    # Upstream
+    # ------------------------------------------------------------------
+    def _fetch(self, query: str, count: int) -> Results:
+        self.throttled_s += self.bucket.acquire(timeout=settings.web_search_timeout)
+        self.upstream += 1
+        try:
+            resp = self.client.get(
+                "/web/search",
+                params={"q": query, "count": count},
+                headers={"X-Subscription-Token": settings.brave_api_key},
+            )
+        except httpx.HTTPError as exc:
+            raise SearchError(f"search failed: {exc}") from exc
+        if resp.status_code == 429:
+            try:
+                retry_after = float(resp.headers.get("Retry-After", 1))
+            except ValueError:  # HTTP-date form
+                retry_after = 1.0
+            self.bucket.penalize(retry_after)
+        if resp.status_code != 200:
+            raise SearchError(f"search failed: {resp.status_code}", status_code=resp.status_code)
+        try:
+            return [
+                {"title": item.get("title"), "url": item.get("url")}
+                for item in (resp.json().get("web") or {}).get("results") or []
+            ]
+        except (ValueError, AttributeError, TypeError) as exc:  # Not JSON or not the expected shape
+            raise SearchError(f"search failed: invalid response ({exc})") from exc
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+    def _cache_get(self, key: str) -> Results | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                record_cache("web_search", True)
+                return entry[1]
+        if settings.web_search_redis_cache:
+            raw = self._redis_call("get", _redis_key(key))
+            if raw:
+                results = json.loads(raw)
+                self._remember(key, results)
+                with self._lock:
+                    self.hits += 1
+                record_cache("web_search", True)
+                return results
+        with self._lock:
+            self.misses += 1
+        record_cache("web_search", False)
+        return None
+
+    def _cache_set(self, key: str, results: Results) -> None:
+        self._remember(key, results)
+        if settings.web_search_redis_cache:
+            self._redis_call(
+                "set", _redis_key(key), json.dumps(results), ex=settings.web_search_ttl
+            )
+
+    def _remember(self, key: str, results: Results) -> None:
+        with self._lock:
+            self._cache[key] = (time.monotonic() + settings.web_search_ttl, results)
+            self._cache.move_to_end(key)
+            while len(self._cache) > settings.web_search_cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _redis_call(method: str, *args: Any, **kwargs: Any) -> Any:
+        from .progress import redis_client
+
+        try:
+            return getattr(redis_client(), method)(*args, **kwargs)
+        except Exception as exc:  # pragma: no cover - cache is best effort
+            logger.warning("Web search Redis cache unavailable: %s", exc)
+            return None
+
+
+def _redis_key(key: str) -> str:
+    return "web-search:" + hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+web_intelligence = WebIntelligenceService()
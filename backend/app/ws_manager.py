@@ -1,31 +1,188 @@
 from __future__ import annotations
 
-from typing import List
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Set, Tuple
+
 from fastapi import WebSocket
-from starlette.websockets import WebSocketDisconnect
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+BROADCAST = "*"
+
+
+class Connection:
+    """A WebSocket with its own bounded send queue and sender task.
+
+    When the client cannot keep up and the queue is full, ``policy`` decides
+    what to discard: ``drop`` removes the oldest pending message, ``coalesce``
+    replaces the pending message of the same topic (falling back to the
+    oldest) so a lagging client still gets the latest state of every topic.
+    """
+
+    def __init__(self, websocket: WebSocket, maxsize: int, policy: str) -> None:
+        self.websocket = websocket
+        self.topics: Set[str] = set()
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._queue: Deque[Tuple[str, str]] = deque()
+        self._ready = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, topic: str, message: str) -> None:
+        if len(self._queue) >= self.maxsize:
+            self.dropped += 1
+            stale = None
+            if self.policy == "coalesce":
+                stale = next((item for item in self._queue if item[0] == topic), None)
+            if stale is not None:
+                self._queue.remove(stale)
+            else:
+                self._queue.popleft()
+        self._queue.append((topic, message))
+        self._ready.set()
+
+    def _pop(self) -> str | None:
+        return self._queue.popleft()[1] if self._queue else None
+
+    async def run(self, on_error: Any) -> None:
+        """Drain the queue onto the socket until it fails or is cancelled."""
+        while True:
+            await self._ready.wait()
+            message = self._pop()
+            if message is None:
+                self._ready.clear()
+                continue
+            try:
+                await self.websocket.send_text(message)
+            except Exception:  # Disconnects, closed transports, protocol errors
+                on_error(self.websocket)
+                return
 
 
 class WebSocketManager:
-    """Simple connection manager for broadcasting progress messages."""
+    """Topic-based fan-out of progress messages to WebSocket clients.
 
-    def __init__(self) -> None:
-        self.connections: List[WebSocket] = []
+    Clients subscribe to topics such as ``job:<id>``, ``project:<id>`` or
+    ``sandbox:<id>`` (a trailing ``*`` subscribes to a prefix). Every message
+    is queued per connection and sent by that connection's own task, so one
+    slow client never delays the others.
+    """
 
-    async def connect(self, websocket: WebSocket) -> None:
+    def __init__(self, queue_size: int | None = None, policy: str | None = None) -> None:
+        self.queue_size = queue_size or settings.ws_queue_size
+        self.policy = policy or settings.ws_slow_policy
+        self.connections: Dict[WebSocket, Connection] = {}
+        self._topics: Dict[str, Set[Connection]] = {}
+        self._prefixes: Dict[str, Set[Connection]] = {}
+
+    async def connect(self, websocket: WebSocket, topics: Iterable[str] = ()) -> Connection:
         await websocket.accept()
-        self.connections.append(websocket)
+        conn = Connection(websocket, self.queue_size, self.policy)
+        self.connections[websocket] = conn
+        for topic in topics:
+            self.subscribe(websocket, topic)
+        conn.task = asyncio.create_task(conn.run(self.disconnect))
+        return conn
 
     def disconnect(self, websocket: WebSocket) -> None:
-        if websocket in self.connections:
-            self.connections.remove(websocket)
+        conn = self.connections.pop(websocket, None)
+        if conn is None:
+            return
+        for topic in list(conn.topics):
+            self._remove(topic, conn)
+        if conn.task is not None and conn.task is not asyncio.current_task():
+            conn.task.cancel()
+
+    @staticmethod
+    def _key(topic: str) -> str:
+        return topic if topic == BROADCAST else topic.rstrip("*")
+
+    def _index(self, topic: str) -> Dict[str, Set[Connection]]:
+        return self._prefixes if topic.endswith("*") and topic != BROADCAST else self._topics
+
+    def _remove(self, topic: str, conn: Connection) -> None:
+        """Drop ``conn`` from ``topic``, forgetting topics nobody watches."""
+        index, key = self._index(topic), self._key(topic)
+        conns = index.get(key)
+        if conns is None:
+            return
+        conns.discard(conn)
+        if not conns:
+            del index[key]
+
+    def subscribe(self, websocket: WebSocket, topic: str) -> None:
+        conn = self.connections.get(websocket)
+        if conn is None or not topic:
+            return
+        conn.topics.add(topic)
+        self._index(topic).setdefault(self._key(topic), set()).add(conn)
+
+    def unsubscribe(self, websocket: WebSocket, topic: str) -> None:
+        conn = self.connections.get(websocket)
+        if conn is None:
+            return
+        conn.topics.discard(topic)
+        self._remove(topic, conn)
+
+    def _subscribers(self, topic: str) -> Set[Connection]:
+        if topic == BROADCAST:
+            return set(self.connections.values())
+        targets = set(self._topics.get(topic, ())) | set(self._topics.get(BROADCAST, ()))
+        for prefix, conns in self._prefixes.items():
+            if topic.startswith(prefix):
+                targets |= conns
+        return targets
+
+    def publish(self, topic: str, message: str | Dict[str, Any]) -> int:
+        """Queue ``message`` for every subscriber of ``topic``; never blocks.
+
+        Must be called from the event loop thread. Returns the number of
+        connections the message was queued for.
+        """
+        if not isinstance(message, str):
+            message = json.dumps({"topic": topic, **message}, ensure_ascii=False, default=str)
+        targets = self._subscribers(topic)
+        for conn in targets:
+            conn.enqueue(topic, message)
+        return len(targets)
 
     async def broadcast(self, message: str) -> None:
         """Send a message to all active connections."""
-        for ws in list(self.connections):
-            try:
-                await ws.send_text(message)
-            except WebSocketDisconnect:
-                self.disconnect(ws)
+        self.publish(BROADCAST, message)
+
+    async def handle_command(self, websocket: WebSocket, raw: str) -> None:
+        """Apply ``{"action": "subscribe"|"unsubscribe", "topic": ...}`` commands."""
+        try:
+            command = json.loads(raw)
+        except ValueError:
+            return
+        if not isinstance(command, dict):
+            return
+        topics = command.get("topics") or [command.get("topic", "")]
+        if not isinstance(topics, list) or not all(isinstance(t, str) for t in topics):
+            return
+        for topic in topics:
+            if command.get("action") == "subscribe":
+                self.subscribe(websocket, topic)
+            elif command.get("action") == "unsubscribe":
+                self.unsubscribe(websocket, topic)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self.connections),
+            "topics": len(self._topics) + len(self._prefixes),
+            "queued": sum(len(c) for c in self.connections.values()),
+            "dropped": sum(c.dropped for c in self.connections.values()),
+        }
 
 
 ws_manager = WebSocketManager()
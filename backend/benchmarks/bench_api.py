@@ -0,0 +1,352 @@
+"""Throughput and latency of the API's main endpoints, in-process.
+
+The FastAPI app is driven through ``TestClient`` with local stand-ins for its
+dependencies (see :mod:`benchmarks.standins`). These are a fake
+llama.cpp/OpenAI server, a fake ``whispercpp``, a Docker stub and a Brave
+mock. Celery runs eagerly, so a voice request times the whole
+transcribe -> analyse -> sandbox pipeline. Every file the app writes goes to
+a temporary directory, and the stores are pre-filled to each ``--sizes`` entry
+so the cost of growing data shows up::
+
+    python -m benchmarks.bench_api --sizes 100,1000,10000 --output results.json
+    python -m benchmarks.bench_api --compare results.json
+
+Results are JSON (``--output``). ``--compare`` prints the p50 and throughput
+change of every measurement against an earlier run.
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from benchmarks.standins import BraveMock, FakeLLM, install_docker_stub, write_fake_whisper
+
+SCENARIOS = ("chat", "notes", "auth", "llm", "voice", "sandbox", "web_search")
+API = "/api/v1"
+
+
+def configure(workdir: Path, llm: FakeLLM, brave: BraveMock, whisper: Path) -> None:
+    """Point every setting at the stand-ins and ``workdir``; must run before ``app`` is imported."""
+    os.environ.update(
+        {
+            "LLM_OPENAI_ENDPOINT": llm.url,
+            "LLM_ENDPOINTS": "",
+            "LLM_FALLBACK_OPENAI": "false",
+            "LLM_PROVIDER": "local",
+            "BRAVE_API_KEY": "bench",
+            "BRAVE_API_URL": brave.url,
+            "BRAVE_RATE_PER_SECOND": "1000",
+            "WHISPER_CPP_BIN": str(whisper),
+            # Nothing listens on port 1, so progress events fail fast instead of hanging
+            "REDIS_URL": "redis://127.0.0.1:1/0",
+            "AGENT_STORE": "memory",
+            "FRONTEND_BACKUP_DIR": str(workdir / "frontend-backup"),
+            "VOICE_AGENT_DIR": str(workdir / "frontend-backup" / "voice-agent"),
+            "AUTH_DB": str(workdir / "auth" / "users.json"),
+            "AUDIT_DIR": str(workdir / "audit"),
+            "LOGS_DIR": str(workdir / "logs"),
+            "MODELS_DIR": str(workdir / "models"),
+            "CRAWL_CACHE_DIR": str(workdir / "crawl"),
+            "CLOUD_MANIFEST_DIR": str(workdir / "cloud"),
+            "SANDBOX_LOGS_DB": str(workdir / "sandbox_logs.sqlite3"),
+            "PLANS_DB": str(workdir / "plans.sqlite3"),
+            "AGENTS_DB": str(workdir / "agents.sqlite3"),
+            "SCHEDULES_DB": str(workdir / "schedules.sqlite3"),
+            "RETENTION_DB": str(workdir / "retention.sqlite3"),
+        }
+    )
+
+
+def measure(call: Callable[[int], Any], requests: int, concurrency: int) -> Dict[str, float]:
+    """Run ``call(i)`` for ``i < requests`` on ``concurrency`` threads; latency in ms."""
+    latencies: List[float] = []
+
+    def timed(i: int) -> None:
+        start = time.perf_counter()
+        call(i)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        for i in range(requests):
+            timed(i)
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(timed, range(requests)))
+    wall = time.perf_counter() - start
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(int(q * len(ordered)), len(ordered) - 1)]  # noqa: E731
+    return {
+        "requests": requests,
+        "throughput_rps": round(requests / wall, 2),
+        "p50_ms": round(1000 * statistics.median(ordered), 3),
+        "p95_ms": round(1000 * pick(0.95), 3),
+        "p99_ms": round(1000 * pick(0.99), 3),
+        "max_ms": round(1000 * ordered[-1], 3),
+    }
+
+
+class Suite:
+    """The scenarios; each returns ``{size or "-": {operation: stats}}``."""
+
+    def __init__(self, client: Any, sizes: List[int], requests: int, concurrency: int) -> None:
+        self.client = client
+        self.sizes = sizes
+        self.requests = requests
+        self.concurrency = concurrency
+
+    def _ok(self, response: Any) -> Any:
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.request.method} {response.request.url}: "
+                               f"{response.status_code} {response.text[:200]}")
+        return response.json()
+
+    def _measure(self, call: Callable[[int], Any], requests: int | None = None) -> Dict[str, float]:
+        return measure(call, requests or self.requests, self.concurrency)
+
+    def chat(self) -> Dict[str, Any]:
+        from app.chat_manager import _base
+        from app.json_store import write_json
+
+        results = {}
+        for size in self.sizes:
+            project = f"bench-{size}"
+            history = [
+                {"id": uuid.uuid4().hex, "role": "user" if i % 2 else "assistant",
+                 "content": f"message {i} " * 8, "timestamp": datetime.utcnow().isoformat()}
+                for i in range(size)
+            ]
+            write_json(_base / f"{project}.json", history)
+            results[str(size)] = {
+                "save": self._measure(lambda i: self._ok(self.client.post(
+                    f"{API}/chat/save",
+                    json={"project_id": project, "message": {"role": "user", "content": f"hello {i}"}},
+                ))),
+                "history": self._measure(
+                    lambda i: self._ok(self.client.get(f"{API}/chat/history/{project}"))
+                ),
+            }
+        return results
+
+    def notes(self) -> Dict[str, Any]:
+        from app import voice_notes
+        from app.json_store import write_json
+
+        results = {}
+        for size in self.sizes:
+            write_json(voice_notes._notes_file, [
+                {"id": uuid.uuid4().hex, "content": f"note {i}", "timestamp": datetime.utcnow().isoformat()}
+                for i in range(size)
+            ])
+            created: List[str] = []
+            create = self._measure(lambda i: created.append(self._ok(self.client.post(
+                f"{API}/voice-agent/notes", json={"content": f"new note {i}"}
+            ))["id"]))
+            update = self._measure(lambda i: self._ok(self.client.put(
+                f"{API}/voice-agent/notes/{created[i]}", json={"content": f"edited {i}"}
+            )))
+            listing = self._measure(lambda i: self._ok(self.client.get(f"{API}/voice-agent/notes")))
+            delete = self._measure(lambda i: self._ok(self.client.delete(
+                f"{API}/voice-agent/notes/{created[i]}"
+            )))
+            results[str(size)] = {"create": create, "update": update, "list": listing, "delete": delete}
+        return results
+
+    def auth(self) -> Dict[str, Any]:
+        import bcrypt
+
+        from app.config import settings
+
+        # One real hash shared by the pre-filled users: bcrypt only runs for the match
+        password_hash = bcrypt.hashpw(b"secret", bcrypt.gensalt()).decode()
+        results = {}
+        requests = max(1, self.requests // 10)  # each call pays a full bcrypt round
+        for size in self.sizes:
+            users = [
+                {"email": f"user{i}@example.com", "nickname": f"u{i}", "password_hash": password_hash}
+                for i in range(size)
+            ]
+            path = Path(settings.auth_db)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(users), encoding="utf-8")
+            run = uuid.uuid4().hex[:8]
+            results[str(size)] = {
+                "register": self._measure(lambda i: self._ok(self.client.post(f"{API}/auth/register", json={
+                    "email": f"new{i}-{run}@example.com", "nickname": f"n{i}", "password": "secret",
+                })), requests),
+                "login": self._measure(lambda i: self._ok(self.client.post(f"{API}/auth/login", json={
+                    "email": f"user{size - 1}@example.com", "password": "secret",
+                })), requests),
+            }
+        return results
+
+    def llm(self) -> Dict[str, Any]:
+        results = {}
+        for size in self.sizes:
+            # ``size`` earlier turns; long conversations exercise context fitting
+            messages = [
+                {"role": "user" if i % 2 else "assistant", "content": f"turn {i} " * 10}
+                for i in range(min(size, 2000))
+            ] + [{"role": "user", "content": "¿Qué sigue?"}]
+            results[str(size)] = {"chat": self._measure(lambda i: self._ok(
+                self.client.post(f"{API}/llm/chat", json={"messages": messages})
+            ))}
+        return results
+
+    def voice(self) -> Dict[str, Any]:
+        media = base64.b64encode(b"RIFF" + bytes(4096)).decode()
+        requests = max(1, self.requests // 5)
+        return {"-": {"process": self._measure(lambda i: self._ok(self.client.post(
+            f"{API}/voice-agent/process",
+            json={"media_base64": media, "media_filename": f"note{i}.wav"},
+        )), requests)}}
+
+    def sandbox(self) -> Dict[str, Any]:
+        return {"-": {"run": self._measure(lambda i: self._ok(
+            self.client.post(f"{API}/sandbox/run", json={"task": f"bench task {i}"})
+        ))}}
+
+    def web_search(self) -> Dict[str, Any]:
+        run = uuid.uuid4().hex[:8]
+        miss = self._measure(lambda i: self._ok(self.client.post(
+            f"{API}/web-intelligence", json={"query": f"query {run} {i}", "count": 5}
+        )))
+        hit = self._measure(lambda i: self._ok(self.client.post(
+            f"{API}/web-intelligence", json={"query": f"query {run} {i}", "count": 5}
+        )))
+        return {"-": {"cache_miss": miss, "cache_hit": hit}}
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    revision = _git_revision()
+    cwd = os.getcwd()
+    with ExitStack() as stack:
+        stack.callback(os.chdir, cwd)
+        workdir = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="bench-api-")))
+        llm = stack.enter_context(FakeLLM(args.llm_latency, args.llm_tokens_per_second, args.llm_tokens))
+        brave = stack.enter_context(BraveMock(args.brave_latency))
+        whisper = write_fake_whisper(workdir, args.whisper_seconds)
+        install_docker_stub(args.sandbox_lines, args.sandbox_seconds)
+        configure(workdir, llm, brave, whisper)
+        os.chdir(workdir)  # Relative paths the app still uses land here too
+        logging.getLogger("app").setLevel(logging.ERROR)
+
+        from fastapi.testclient import TestClient
+
+        from app.celery_app import celery_app
+        from app.main import app
+
+        celery_app.conf.update(task_always_eager=True, task_eager_propagates=True)
+        # Not entered as a context manager: startup hooks need Redis and the scheduler
+        client = TestClient(app)
+        suite = Suite(client, sizes, args.requests, args.concurrency)
+        results: Dict[str, Any] = {}
+        for name in scenarios:
+            started = time.perf_counter()
+            results[name] = getattr(suite, name)()
+            print(f"{name}: {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        upstream = {"llm_requests": llm.requests, "brave_requests": brave.requests}
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": revision,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "json")},
+            **upstream,
+        },
+        "results": results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """One line per measurement present in both runs: p50 and throughput change."""
+    lines = []
+    for scenario, sizes in report["results"].items():
+        for size, operations in sizes.items():
+            for operation, stats in operations.items():
+                before = baseline.get("results", {}).get(scenario, {}).get(size, {}).get(operation)
+                if not before:
+                    continue
+                p50 = (stats["p50_ms"] - before["p50_ms"]) / before["p50_ms"] if before["p50_ms"] else 0.0
+                rps = (
+                    (stats["throughput_rps"] - before["throughput_rps"]) / before["throughput_rps"]
+                    if before["throughput_rps"] else 0.0
+                )
+                lines.append(
+                    f"{scenario:>10} {size:>7} {operation:>10}: p50 {before['p50_ms']:.2f} -> "
+                    f"{stats['p50_ms']:.2f} ms ({p50:+.0%}), {rps:+.0%} throughput"
+                )
+    return lines
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset")
+    parser.add_argument("--sizes", default="100,1000,10000", help="Pre-filled records per store")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per measurement")
+    parser.add_argument("--concurrency", type=int, default=1, help="Client threads")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake LLM time to first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--llm-tokens", type=int, default=32, help="Tokens per fake completion")
+    parser.add_argument("--whisper-seconds", type=float, default=0.2, help="Fake transcription time")
+    parser.add_argument("--sandbox-lines", type=int, default=200, help="Log lines per sandbox run")
+    parser.add_argument("--sandbox-seconds", type=float, default=0.05, help="Sandbox run time")
+    parser.add_argument("--brave-latency", type=float, default=0.02)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    parser.add_argument("--json", action="store_true", help="Print the JSON report")
+    args = parser.parse_args(argv)
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+    output = Path(args.output).resolve() if args.output else None
+
+    report = run(args)
+    if output is not None:
+        output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        for scenario, sizes in report["results"].items():
+            for size, operations in sizes.items():
+                for operation, stats in operations.items():
+                    cells = "  ".join(f"{k}={v}" for k, v in stats.items())
+                    print(f"{scenario:>10} {size:>7} {operation:>10}: {cells}")
+    if baseline is not None:
+        print(f"\nAgainst {args.compare} ({baseline.get('meta', {}).get('revision')}):")
+        print("\n".join(compare(report, baseline)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
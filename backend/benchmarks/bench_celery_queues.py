@@ -0,0 +1,155 @@
+"""Queue latency of the Celery topology under a mixed workload.
+
+Simulated tasks take the queue and priority of the real task they stand in
+for and sleep for a typical duration. The same arrival schedule runs twice:
+once with every task on one shared queue served by a single pool (the old
+topology), once with per-queue workers. The report gives, per task kind, the
+wait between sending and a worker starting the task. Workers are in-process
+thread pools, on the in-memory transport by default; pass ``--broker`` to use
+Redis, which also applies task priorities::
+
+    python -m benchmarks.bench_celery_queues --seconds 10 --load 1.5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+from celery.contrib.testing.worker import start_worker
+
+from app.celery_app import (
+    INTERACTIVE,
+    LLM,
+    MAINTENANCE,
+    TRANSCRIPTION,
+    activate_agent,
+    celery_app,
+    cleanup_backups,
+    generate_plan_task,
+    transcribe_chat_media,
+)
+
+# kind -> (real task, queue, arrivals per second, simulated duration in seconds)
+WORKLOAD: Dict[str, Tuple[Any, str, float, float]] = {
+    "activate_agent": (activate_agent, INTERACTIVE, 20.0, 0.005),
+    "generate_plan": (generate_plan_task, LLM, 4.0, 0.6),
+    "transcription": (transcribe_chat_media, TRANSCRIPTION, 0.5, 1.5),
+    "cleanup_backups": (cleanup_backups, MAINTENANCE, 0.2, 2.0),
+}
+# Worker threads per queue in the routed topology; the shared pool gets the sum
+CONCURRENCY = {INTERACTIVE: 2, LLM: 3, TRANSCRIPTION: 1, MAINTENANCE: 1}
+# Thread-pool consumers stall with a multiplier of 1, so slow queues reserve two
+# messages per thread here; the shared pool keeps Celery's default of 4
+PREFETCH = {INTERACTIVE: 4, LLM: 2, TRANSCRIPTION: 2, MAINTENANCE: 2}
+SHARED_QUEUE = "bench-shared"
+
+
+@celery_app.task(name="bench.simulate")
+def simulate(sent: float, seconds: float) -> float:
+    """Sleep like the real task and return how long the message waited."""
+    waited = time.time() - sent
+    time.sleep(seconds)
+    return waited
+
+
+def _schedule(seconds: float, load: float, seed: int) -> List[Tuple[float, str]]:
+    """Poisson arrivals per kind, merged into one time-ordered list."""
+    rng = random.Random(seed)
+    arrivals = []
+    for kind, (_task, _queue, rate, _duration) in WORKLOAD.items():
+        rate *= load
+        t = rng.expovariate(rate)
+        while t < seconds:
+            arrivals.append((t, kind))
+            t += rng.expovariate(rate)
+    return sorted(arrivals)
+
+
+def _run(arrivals: List[Tuple[float, str]], routed: bool) -> Dict[str, Dict[str, float]]:
+    queues = CONCURRENCY if routed else {SHARED_QUEUE: sum(CONCURRENCY.values())}
+    workers = [
+        start_worker(
+            celery_app,
+            pool="threads",
+            concurrency=n,
+            queues=[queue],
+            prefetch_multiplier=PREFETCH.get(queue, 4),
+            perform_ping_check=False,
+            shutdown_timeout=30.0,
+        )
+        for queue, n in queues.items()
+    ]
+    for worker in workers:
+        worker.__enter__()
+    try:
+        pending = []
+        start = time.time()
+        for offset, kind in arrivals:
+            delay = start + offset - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            task, queue, _rate, duration = WORKLOAD[kind]
+            options: Dict[str, Any] = {"queue": queue if routed else SHARED_QUEUE}
+            if task is not None and task.priority is not None:
+                options["priority"] = task.priority
+            pending.append((kind, simulate.apply_async((time.time(), duration), **options)))
+        waits: Dict[str, List[float]] = {kind: [] for kind in WORKLOAD}
+        for kind, result in pending:
+            waits[kind].append(result.get(timeout=600))
+    finally:
+        for worker in reversed(workers):
+            worker.__exit__(None, None, None)
+    return {kind: _summary(values) for kind, values in waits.items() if values}
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    pick = lambda q: values[min(int(q * len(values)), len(values) - 1)]  # noqa: E731
+    return {
+        "tasks": len(values),
+        "p50_ms": round(1000 * statistics.median(values), 1),
+        "p95_ms": round(1000 * pick(0.95), 1),
+        "p99_ms": round(1000 * pick(0.99), 1),
+        "max_ms": round(1000 * values[-1], 1),
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0, help="Length of the arrival schedule")
+    parser.add_argument("--load", type=float, default=1.0, help="Multiplier for all arrival rates")
+    parser.add_argument("--broker", default="memory://")
+    parser.add_argument("--backend", default="cache+memory://")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+    celery_app.conf.update(broker_url=args.broker, result_backend=args.backend)
+    if args.broker.startswith("memory://"):
+        celery_app.conf.broker_transport_options = {"polling_interval": 0.01}
+    arrivals = _schedule(args.seconds, args.load, args.seed)
+    report = {
+        "tasks": len(arrivals),
+        "load": args.load,
+        "shared_queue": _run(arrivals, routed=False),
+        "routed_queues": _run(arrivals, routed=True),
+    }
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"{report['tasks']} tasks over {args.seconds:g}s at load {args.load:g}; wait before start:")
+        for topology in ("shared_queue", "routed_queues"):
+            print(f"  {topology}")
+            for kind, stats in report[topology].items():
+                cells = "  ".join(f"{k}={v}" for k, v in stats.items())
+                print(f"    {kind:>16}: {cells}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
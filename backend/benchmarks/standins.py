@@ -0,0 +1,197 @@
+"""Local stand-ins for the external services the API depends on.
+
+* :class:`FakeLLM` – an OpenAI-compatible ``/v1/chat/completions`` server
+  (llama.cpp's API) whose replies take ``latency`` plus ``tokens`` generated at
+  ``tokens_per_second``.
+* :class:`BraveMock` – the Brave ``/res/v1/web/search`` endpoint.
+* :func:`write_fake_whisper` – an executable that behaves like ``whispercpp
+  --output-json``.
+* :func:`install_docker_stub` – a ``docker`` module whose containers print a
+  fixed number of log lines.
+
+Everything runs locally on ephemeral ports, so a benchmark needs neither
+models nor network access nor a Docker daemon.
+"""
+from __future__ import annotations
+
+import json
+import stat
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+from urllib.parse import parse_qs, urlsplit
+
+
+class _Server:
+    """A threaded HTTP server on ``127.0.0.1`` with an ephemeral port."""
+
+    def __init__(self) -> None:
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:  # noqa: N802 - http.server naming
+                owner._respond(self, *owner.get(self.path))
+
+            def do_POST(self) -> None:  # noqa: N802
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                owner._respond(self, *owner.post(self.path, body))
+
+            def log_message(self, *_args: Any) -> None:
+                return None
+
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+
+    def get(self, path: str) -> tuple[int, Any]:
+        return 404, {"error": "not found"}
+
+    def post(self, path: str, body: Dict[str, Any]) -> tuple[int, Any]:
+        return 404, {"error": "not found"}
+
+    def _respond(self, handler: BaseHTTPRequestHandler, status: int, payload: Any) -> None:
+        self.requests += 1
+        data = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def __enter__(self) -> "_Server":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeLLM(_Server):
+    """OpenAI-compatible chat completions with a configurable speed."""
+
+    def __init__(self, latency: float = 0.05, tokens_per_second: float = 200.0, tokens: int = 32) -> None:
+        super().__init__()
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1/chat/completions"
+
+    def get(self, path: str) -> tuple[int, Any]:
+        if path == "/health":
+            return 200, {"status": "ok"}
+        return super().get(path)
+
+    def post(self, path: str, body: Dict[str, Any]) -> tuple[int, Any]:
+        if path != "/v1/chat/completions":
+            return super().post(path, body)
+        time.sleep(self.latency + self.tokens / self.tokens_per_second)
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        return 200, {
+            "object": "chat.completion",
+            "model": body.get("model", "fake"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(["token"] * self.tokens)},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": self.tokens,
+                "total_tokens": prompt_tokens + self.tokens,
+            },
+        }
+
+
+class BraveMock(_Server):
+    """Brave web search returning ``count`` synthetic results per query."""
+
+    def __init__(self, latency: float = 0.02) -> None:
+        super().__init__()
+        self.latency = latency
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/res/v1"
+
+    def get(self, path: str) -> tuple[int, Any]:
+        parts = urlsplit(path)
+        if parts.path != "/res/v1/web/search":
+            return super().get(path)
+        params = parse_qs(parts.query)
+        query = params.get("q", [""])[0]
+        count = int(params.get("count", ["3"])[0])
+        time.sleep(self.latency)
+        results = [
+            {"title": f"{query} #{i}", "url": f"https://example.com/{i}?q={query}"}
+            for i in range(count)
+        ]
+        return 200, {"web": {"results": results}}
+
+
+_WHISPER_SCRIPT = """#!{python}
+import json, sys, time
+time.sleep({seconds!r})
+print(json.dumps({{"segments": [{{"text": " transcribed %s" % sys.argv[-2]}}]}}))
+"""
+
+
+def write_fake_whisper(directory: Path, seconds: float = 0.2) -> Path:
+    """Write an executable that sleeps ``seconds`` and prints whisper.cpp JSON."""
+    path = Path(directory) / "whispercpp"
+    path.write_text(_WHISPER_SCRIPT.format(python=sys.executable, seconds=seconds), encoding="utf-8")
+    path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+class _Container:
+    def __init__(self, lines: int, seconds: float) -> None:
+        self.lines = lines
+        self.seconds = seconds
+
+    def logs(self, stream: bool = False, follow: bool = False) -> Iterator[bytes]:
+        delay = self.seconds / self.lines if self.lines else 0.0
+        for i in range(self.lines):
+            if delay:
+                time.sleep(delay)
+            yield f"step {i}: processing sandbox task output line\n".encode("utf-8")
+
+    def wait(self) -> Dict[str, int]:
+        return {"StatusCode": 0}
+
+    def remove(self, force: bool = False) -> None:
+        return None
+
+
+def install_docker_stub(lines: int = 200, seconds: float = 0.05) -> types.ModuleType:
+    """Register a ``docker`` module whose containers log ``lines`` lines over ``seconds``."""
+
+    class DockerException(Exception):
+        pass
+
+    class Containers:
+        def run(self, image: str, command: List[str], **_kwargs: Any) -> _Container:
+            return _Container(lines, seconds)
+
+    docker = types.ModuleType("docker")
+    errors = types.ModuleType("docker.errors")
+    errors.DockerException = DockerException  # type: ignore[attr-defined]
+    docker.errors = errors  # type: ignore[attr-defined]
+    docker.from_env = lambda: types.SimpleNamespace(containers=Containers())  # type: ignore[attr-defined]
+    sys.modules["docker"] = docker
+    sys.modules["docker.errors"] = errors
+    return docker
+
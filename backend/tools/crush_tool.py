@@ -1,20 +1,41 @@
-"""Secure wrapper around the `crush` filesystem utility."""
+"""Secure wrapper around the `crush` filesystem utility.
+
+Read-only commands (``ls``, ``info``, ``glob``, ``cat``, ``dupes``) are
+answered in Python without spawning ``crush``, under the same workspace
+confinement; ``ls``, ``info`` and ``glob`` are served from the per-project
+:mod:`workspace_index` rather than walking the filesystem. ``get``, ``put``
+and ``del`` still go through the CLI, with ``put`` content streamed over stdin
+rather than argv, and the index is refreshed for the touched path afterwards.
+``execute_crush_batch`` runs many operations against one workspace in order,
+resolving the workspace once.
+"""
 
 from __future__ import annotations
 
 import logging
+import re
 import shlex
 import subprocess
+import time
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Optional
 
 from pydantic import BaseModel, Field, field_validator
 
+from .workspace_index import WorkspaceIndex, get_index
+
 logger = logging.getLogger(__name__)
 
 
-ALLOWED_COMMANDS = {"ls", "get", "put", "del", "info", "glob", "cat"}
+ALLOWED_COMMANDS = {"ls", "get", "put", "del", "info", "glob", "cat", "dupes"}
+NATIVE_COMMANDS = {"ls", "info", "glob", "cat", "dupes"}
 BASE_WORKSPACE = Path("/workspaces")
+# Largest file ``cat`` returns natively; bigger reads are refused rather than buffered
+MAX_CAT_BYTES = 4 * 1024 * 1024
+MAX_BATCH = 500
+
+_PROJECT_RE = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.-]*$")
 
 
 class CrushCommandInput(BaseModel):
@@ -32,6 +53,28 @@ class CrushCommandInput(BaseModel):
         return v
 
 
+class CrushOperation(BaseModel):
+    """One operation of a batch; the workspace comes from the batch."""
+
+    command: str = Field(..., description="Crush subcommand")
+    path: Optional[str] = Field(None, description="Target path relative to project workspace")
+    content: Optional[str] = Field(None, description="Content for put operations")
+
+    @field_validator("command")
+    def validate_command(cls, v: str) -> str:
+        if v not in ALLOWED_COMMANDS:
+            raise ValueError("Command not allowed")
+        return v
+
+
+class CrushBatchInput(BaseModel):
+    """Several crush operations executed in order in one workspace."""
+
+    project_id: str = Field(..., description="Workspace identifier")
+    operations: List[CrushOperation] = Field(..., min_length=1, max_length=MAX_BATCH)
+    stop_on_error: bool = Field(False, description="Skip remaining operations after a failure")
+
+
 class CrushCommandOutput(BaseModel):
     """Result of a crush command."""
 
@@ -40,32 +83,121 @@ class CrushCommandOutput(BaseModel):
     returncode: int
 
 
-def execute_crush_command(data: CrushCommandInput) -> CrushCommandOutput:
-    """Execute a crush command in a safe, sandboxed workspace."""
+class CrushBatchOutput(BaseModel):
+    """Results of a batch, one per executed operation."""
+
+    results: List[CrushCommandOutput]
+
 
-    workspace = BASE_WORKSPACE / data.project_id
+@lru_cache(maxsize=1024)
+def _workspace(project_id: str) -> Path:
+    """Create and resolve a project's workspace once per process."""
+    if not _PROJECT_RE.match(project_id):
+        raise ValueError("Invalid project id")
+    workspace = BASE_WORKSPACE / project_id
     workspace.mkdir(parents=True, exist_ok=True)
+    return workspace.resolve()
+
+
+def _confine(workspace: Path, path: str) -> Path:
+    resolved = (workspace / path).resolve()
+    if workspace not in resolved.parents and resolved != workspace:
+        raise ValueError("Path escapes workspace")
+    return resolved
+
+
+def _ok(stdout: str) -> CrushCommandOutput:
+    return CrushCommandOutput(stdout=stdout, stderr="", returncode=0)
+
+
+def _fail(message: str) -> CrushCommandOutput:
+    return CrushCommandOutput(stdout="", stderr=message, returncode=1)
+
 
-    cmd: List[str] = ["crush", data.command]
-    if data.path:
-        resolved = (workspace / data.path).resolve()
-        if workspace not in resolved.parents and resolved != workspace:
-            raise ValueError("Path escapes workspace")
-        cmd.append(str(resolved.relative_to(workspace)))
-    if data.content is not None:
-        cmd.append(data.content)
+# ---------------------------------------------------------------------------
+# Native read-only commands
+# ---------------------------------------------------------------------------
 
+
+def _native(workspace: Path, command: str, path: Optional[str]) -> CrushCommandOutput:
+    index = get_index(workspace)
+    if command == "glob":
+        return _glob(index, path or "*")
+    if command == "dupes":
+        return _ok("\n".join("".join(p + "\n" for p in group) for group in index.duplicates()))
+    target = _confine(workspace, path or ".")
+    rel = target.relative_to(workspace).as_posix()
+    key = "" if rel == "." else rel
+    try:
+        if command == "ls":
+            if index.is_dir(key):
+                return _ok("".join(n + "\n" for n in index.listdir(key)))
+            if index.info(key) is None:
+                raise FileNotFoundError(rel)
+            return _ok(rel + "\n")
+        if command == "info":
+            entry = index.info(key)
+            if entry is not None:
+                modified = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(entry.mtime_ns / 1e9))
+                return _ok(
+                    f"path: {rel}\ntype: file\nsize: {entry.size}\nmodified: {modified}\n"
+                    f"hash: {index.digest(key)}\n"
+                )
+            # Not indexed (yet): a directory, or a file created since the last scan
+            st = target.stat()
+            kind = "directory" if target.is_dir() else "file"
+            modified = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(st.st_mtime))
+            return _ok(f"path: {rel}\ntype: {kind}\nsize: {st.st_size}\nmodified: {modified}\n")
+        # cat
+        if target.stat().st_size > MAX_CAT_BYTES:
+            return _fail(f"{rel}: file larger than {MAX_CAT_BYTES} bytes")
+        return _ok(target.read_text(encoding="utf-8", errors="replace"))
+    except FileNotFoundError:
+        return _fail(f"{rel}: no such file or directory")
+    except (IsADirectoryError, NotADirectoryError, PermissionError) as exc:
+        return _fail(f"{rel}: {exc.strerror}")
+
+
+def _glob(index: WorkspaceIndex, pattern: str) -> CrushCommandOutput:
+    """Files and directories matching ``pattern``.
+
+    The index only holds paths inside the workspace; symlinked directories are
+    matched but not descended into.
+    """
+    if pattern.startswith("/") or ".." in Path(pattern).parts:
+        raise ValueError("Path escapes workspace")
+    return _ok("".join(m + "\n" for m in index.glob(pattern)))
+
+
+# ---------------------------------------------------------------------------
+# CLI commands
+# ---------------------------------------------------------------------------
+
+
+def _run_cli(
+    workspace: Path, command: str, path: Optional[str], content: Optional[str]
+) -> CrushCommandOutput:
+    cmd: List[str] = ["crush", command]
+    rel = None
+    if path:
+        rel = _confine(workspace, path).relative_to(workspace).as_posix()
+        cmd.append(rel)
+    if content is not None:
+        cmd.append("-")  # Read content from stdin: no ARG_MAX limit, not visible in ps
     logger.info("Executing crush command: %s", shlex.join(cmd))
     try:
         result = subprocess.run(
             cmd,
             cwd=workspace,
+            input=content,
             capture_output=True,
             text=True,
             check=False,
         )
         logger.debug("stdout: %s", result.stdout)
         logger.debug("stderr: %s", result.stderr)
+        if rel and rel != ".":
+            get_index(workspace).refresh_path(rel)
         return CrushCommandOutput(
             stdout=result.stdout,
             stderr=result.stderr,
@@ -74,3 +206,32 @@ def execute_crush_command(data: CrushCommandInput) -> CrushCommandOutput:
     except Exception as exc:  # pragma: no cover - logging error path
         logger.exception("Crush command failed: %s", exc)
         raise
+
+
+def _execute(
+    workspace: Path, command: str, path: Optional[str], content: Optional[str]
+) -> CrushCommandOutput:
+    """Run one operation; a path escaping the workspace is a failed result."""
+    try:
+        if command in NATIVE_COMMANDS:
+            return _native(workspace, command, path)
+        return _run_cli(workspace, command, path, content)
+    except ValueError as exc:
+        return _fail(str(exc))
+
+
+def execute_crush_command(data: CrushCommandInput) -> CrushCommandOutput:
+    """Execute a crush command in a safe, sandboxed workspace."""
+    return _execute(_workspace(data.project_id), data.command, data.path, data.content)
+
+
+def execute_crush_batch(data: CrushBatchInput) -> CrushBatchOutput:
+    """Execute several crush operations in order; reads never spawn a process."""
+    workspace = _workspace(data.project_id)
+    results: List[CrushCommandOutput] = []
+    for op in data.operations:
+        result = _execute(workspace, op.command, op.path, op.content)
+        results.append(result)
+        if data.stop_on_error and result.returncode != 0:
+            break
+    return CrushBatchOutput(results=results)
@@ -0,0 +1,432 @@
+"""In-memory index of a project workspace for the crush read fast path.
+
+Every file is recorded with its size and mtime; content hashes are computed
+lazily and reused until the file changes. The index is kept current by
+inotify on Linux (through ``ctypes``, no extra dependency) and otherwise by a
+throttled stat scan before queries. Sorted paths make prefix and glob queries
+a bisect plus a scan of the matching range instead of a directory walk.
+"""
+
+from __future__ import annotations
+
+import bisect
+import ctypes
+import errno
+import hashlib
+import logging
+import os
+import re
+import select
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds between stat scans when inotify is unavailable
+SCAN_INTERVAL = 2.0
+MAX_INDEXES = 64
+
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_WATCH_MASK = (
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+    | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF
+)
+_EVENT = struct.Struct("iIII")
+
+
+@dataclass
+class FileEntry:
+    size: int
+    mtime_ns: int
+    digest: str | None = None
+
+
+def _glob_regex(pattern: str) -> re.Pattern[str]:
+    """Translate a glob with ``**`` support into an anchored regex."""
+    out, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape("["))
+                i += 1
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                out.append("[^" + body[1:] + "]" if body.startswith("!") else "[" + body + "]")
+                i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+class _Inotify:
+    """Minimal inotify binding; raises ``OSError`` where unsupported."""
+
+    def __init__(self) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify requires Linux")
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        return wd
+
+    def read(self, timeout: float) -> Iterator[Tuple[int, int, str]]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            yield wd, mask, os.fsdecode(name)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class WorkspaceIndex:
+    """Paths, sizes, mtimes and lazy hashes for every file under ``root``."""
+
+    def __init__(self, root: Path, watch: bool = True) -> None:
+        self.root = root
+        self._files: Dict[str, FileEntry] = {}
+        self._previous: Dict[str, FileEntry] = {}
+        self._paths: List[str] = []
+        self._children: Dict[str, Set[str]] = defaultdict(set)
+        # Symlinks to directories inside the workspace; listed, not descended into
+        self._links: Set[str] = set()
+        self._lock = threading.RLock()
+        self._scanned = 0.0
+        self._inotify: _Inotify | None = None
+        self._watches: Dict[int, str] = {}
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self._scan()
+        if watch:
+            self._start_watching()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def info(self, rel: str) -> FileEntry | None:
+        self._maybe_rescan()
+        with self._lock:
+            return self._files.get(rel)
+
+    def is_dir(self, rel: str) -> bool:
+        self._maybe_rescan()
+        with self._lock:
+            return rel in ("", ".") or rel in self._children
+
+    def listdir(self, rel: str) -> List[str]:
+        """Child names of a directory, directories suffixed with ``/``."""
+        self._maybe_rescan()
+        key = "" if rel in ("", ".") else rel
+        with self._lock:
+            names = self._children.get(key, set())
+            prefix = key + "/" if key else ""
+            return sorted(
+                n + "/" if prefix + n in self._children or prefix + n in self._links else n
+                for n in names
+            )
+
+    def prefix(self, prefix: str) -> List[str]:
+        self._maybe_rescan()
+        with self._lock:
+            start = bisect.bisect_left(self._paths, prefix)
+            end = bisect.bisect_left(self._paths, prefix + "\U0010ffff")
+            return self._paths[start:end]
+
+    def glob(self, pattern: str) -> List[str]:
+        """Files and directories matching ``pattern``, like ``Path.glob``.
+
+        The literal prefix narrows the file scan by bisect; directories are
+        few enough to filter directly. Symlinked directories match by their
+        own path, but their contents are not indexed.
+        """
+        literal = re.split(r"[*?\[]", pattern, maxsplit=1)[0]
+        regex = _glob_regex(pattern)
+        files = [p for p in self.prefix(literal) if regex.match(p)]
+        with self._lock:
+            dirs = [
+                d for d in (*self._children, *self._links)
+                if d and d.startswith(literal) and regex.match(d)
+            ]
+        return sorted(files + dirs)
+
+    def digest(self, rel: str) -> str | None:
+        """BLAKE2b of the file's content, cached until size or mtime change."""
+        entry = self.info(rel)
+        if entry is None:
+            return None
+        if entry.digest is None:
+            h = hashlib.blake2b(digest_size=20)
+            try:
+                with open(self.root / rel, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        h.update(chunk)
+            except OSError:
+                return None
+            entry.digest = h.hexdigest()
+        return entry.digest
+
+    def duplicates(self) -> List[List[str]]:
+        """Groups of identical files; only files sharing a size are hashed."""
+        self._maybe_rescan()
+        by_size: Dict[int, List[str]] = defaultdict(list)
+        with self._lock:
+            for path, entry in self._files.items():
+                by_size[entry.size].append(path)
+        groups: Dict[str, List[str]] = defaultdict(list)
+        for size, paths in by_size.items():
+            if len(paths) < 2:
+                continue
+            for path in paths:
+                digest = self.digest(path)
+                if digest is not None:
+                    groups[f"{size}:{digest}"].append(path)
+        return sorted(sorted(g) for g in groups.values() if len(g) > 1)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "root": str(self.root),
+            "files": len(self._files),
+            "directories": len(self._children),
+            "mode": "inotify" if self._inotify else "scan",
+        }
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+    def refresh_path(self, rel: str) -> None:
+        """Re-stat one path (and its subtree), e.g. right after writing it."""
+        with self._lock:
+            self._remove_tree(rel)
+            full = self.root / rel
+            if full.is_dir() and not full.is_symlink():
+                self._add_dir(rel)
+                self._walk(rel)
+            else:
+                self._stat_file(rel)
+
+    def close(self) -> None:
+        self._closed = True
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _maybe_rescan(self) -> None:
+        if self._inotify is None and time.monotonic() - self._scanned >= SCAN_INTERVAL:
+            self._scan()
+
+    def _scan(self) -> None:
+        with self._lock:
+            # Unchanged files keep their digest across rescans
+            self._previous, self._files = self._files, {}
+            self._paths.clear()
+            self._children.clear()
+            self._children[""] = set()
+            self._links.clear()
+            self._walk("")
+            self._previous = {}
+            self._scanned = time.monotonic()
+
+    def _walk(self, rel: str) -> None:
+        stack = [rel]
+        while stack:
+            current = stack.pop()
+            try:
+                entries = list(os.scandir(self.root / current if current else self.root))
+            except OSError:
+                continue
+            for entry in entries:
+                child = f"{current}/{entry.name}" if current else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        self._add_dir(child)
+                        stack.append(child)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        self._put(child, FileEntry(st.st_size, st.st_mtime_ns))
+                    elif entry.is_symlink():
+                        self._stat_file(child)
+                except OSError:
+                    continue
+
+    def _add_dir(self, rel: str) -> None:
+        self._children.setdefault(rel, set())
+        parent, _, name = rel.rpartition("/")
+        self._children[parent].add(name)
+        if self._inotify is not None:
+            self._watch(rel)
+
+    def _stat_file(self, rel: str) -> None:
+        full = self.root / rel
+        try:
+            if full.is_symlink():
+                # Symlinks are only indexed when they stay inside the workspace
+                target = full.resolve()
+                if self.root not in target.parents:
+                    return
+                if target.is_dir():
+                    self._links.add(rel)
+                    parent, _, name = rel.rpartition("/")
+                    self._children[parent].add(name)
+                    return
+                if not target.is_file():
+                    return
+            st = full.stat()
+        except OSError:
+            return
+        if not os.path.isdir(full):
+            self._put(rel, FileEntry(st.st_size, st.st_mtime_ns))
+
+    def _put(self, rel: str, entry: FileEntry) -> None:
+        old = self._files.get(rel)
+        if old is None:
+            bisect.insort(self._paths, rel)
+            old = self._previous.get(rel)
+        if old is not None and old.size == entry.size and old.mtime_ns == entry.mtime_ns:
+            entry.digest = old.digest
+        self._files[rel] = entry
+        parent, _, name = rel.rpartition("/")
+        self._children[parent].add(name)
+
+    def _remove_tree(self, rel: str) -> None:
+        if rel in self._files:
+            del self._files[rel]
+            i = bisect.bisect_left(self._paths, rel)
+            if i < len(self._paths) and self._paths[i] == rel:
+                del self._paths[i]
+        if rel in self._children:
+            prefix = rel + "/"
+            start = bisect.bisect_left(self._paths, prefix)
+            end = bisect.bisect_left(self._paths, prefix + "\U0010ffff")
+            for path in self._paths[start:end]:
+                self._files.pop(path, None)
+            del self._paths[start:end]
+            for d in [d for d in self._children if d == rel or d.startswith(prefix)]:
+                del self._children[d]
+            self._links.difference_update([l for l in self._links if l.startswith(prefix)])
+        self._links.discard(rel)
+        parent, _, name = rel.rpartition("/")
+        self._children.get(parent, set()).discard(name)
+
+    # ------------------------------------------------------------------
+    # inotify
+    # ------------------------------------------------------------------
+    def _start_watching(self) -> None:
+        try:
+            self._inotify = _Inotify()
+            with self._lock:
+                for rel in list(self._children):
+                    self._watch(rel)
+        except OSError as exc:
+            logger.info("inotify unavailable for %s, using stat scans: %s", self.root, exc)
+            if self._inotify is not None:
+                self._inotify.close()
+            self._inotify = None
+            return
+        self._thread = threading.Thread(target=self._run, name="workspace-index", daemon=True)
+        self._thread.start()
+
+    def _watch(self, rel: str) -> None:
+        assert self._inotify is not None
+        wd = self._inotify.add_watch(str(self.root / rel) if rel else str(self.root))
+        self._watches[wd] = rel
+
+    def _run(self) -> None:
+        while not self._closed and self._inotify is not None:
+            try:
+                events = list(self._inotify.read(timeout=0.5))
+            except OSError as exc:
+                logger.warning("inotify read failed for %s: %s", self.root, exc)
+                break
+            with self._lock:
+                for wd, mask, name in events:
+                    if mask & _IN_Q_OVERFLOW:
+                        self._scan()
+                        continue
+                    if mask & _IN_IGNORED:
+                        self._watches.pop(wd, None)
+                        continue
+                    base = self._watches.get(wd)
+                    if base is None or not name:
+                        continue
+                    rel = f"{base}/{name}" if base else name
+                    try:
+                        if mask & (_IN_DELETE | _IN_MOVED_FROM):
+                            self._remove_tree(rel)
+                        else:
+                            self.refresh_path(rel)
+                    except OSError as exc:  # e.g. ENOSPC from max_user_watches
+                        logger.warning("Falling back to stat scans for %s: %s", self.root, exc)
+                        self._inotify.close()
+                        self._inotify = None
+                        self._scan()
+                        return
+
+
+_indexes: "OrderedDict[Path, WorkspaceIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(root: Path) -> WorkspaceIndex:
+    """Return the (least-recently-used cached) index for a workspace root."""
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is not None:
+            _indexes.move_to_end(root)
+            return index
+    index = WorkspaceIndex(root)
+    with _indexes_lock:
+        existing = _indexes.get(root)
+        if existing is not None:
+            index.close()
+            return existing
+        _indexes[root] = index
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)[1].close()
+    return index